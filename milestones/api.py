@@ -12,8 +12,13 @@ consider the process for requiring the Milestone.
 
 Note the terminology difference at this layer vs. Data -- add/edit/get/remove
 """
+from . import archive
+from . import changefeed
 from . import data
 from . import exceptions
+from . import graph
+from . import memo
+from . import projections
 from . import validators
 
 
@@ -49,6 +54,13 @@ def _validate_milestone(milestone):
         )
 
 
+def _validate_namespace(namespace):
+    """ Validation helper """
+    _validate_milestone({
+        'namespace': namespace,
+    })
+
+
 def _validate_milestone_relationship_type(name):
     """ Validation helper """
     if not validators.milestone_relationship_type_is_valid(name):
@@ -70,6 +82,7 @@ def _validate_user(user):
 
 
 # PUBLIC FUNCTIONS
+@memo.invalidating
 def add_milestone(milestone):
     """
     Passes a new milestone to the data layer for storage
@@ -79,6 +92,7 @@ def add_milestone(milestone):
     return milestone
 
 
+@memo.invalidating
 def edit_milestone(milestone):
     """
     Passes an updated milestone to the data layer for storage
@@ -90,6 +104,7 @@ def edit_milestone(milestone):
         raise
 
 
+@memo.memoized
 def get_milestone(milestone_id):
     """
     Retrieves the specified milestone
@@ -103,6 +118,7 @@ def get_milestone(milestone_id):
     return milestones[0]
 
 
+@memo.memoized
 def get_milestones(namespace):
     """
     Retrieves the specified milestone by namespace
@@ -115,6 +131,7 @@ def get_milestones(namespace):
     return data.fetch_milestones(milestone)
 
 
+@memo.invalidating
 def remove_milestone(milestone_id):
     """
     Removes the specified milestone
@@ -125,6 +142,39 @@ def remove_milestone(milestone_id):
     data.delete_milestone(milestone)
 
 
+@memo.invalidating
+def deactivate_namespace_milestones(namespace):
+    """
+    Retires every milestone in the specified namespace (eg: all of an org's entrance exams)
+    Their links are kept, so the namespace can be reactivated later
+    Returns the number of milestones deactivated
+    """
+    _validate_namespace(namespace)
+    return data.deactivate_namespace_milestones(namespace)
+
+
+@memo.invalidating
+def reactivate_namespace_milestones(namespace):
+    """
+    Brings back every retired milestone in the specified namespace, along with
+    the user milestones archived while they were retired
+    Returns the number of milestones reactivated
+    """
+    _validate_namespace(namespace)
+    return data.reactivate_namespace_milestones(namespace)
+
+
+@memo.invalidating
+def remove_namespace_milestones(namespace):
+    """
+    Removes every milestone in the specified namespace, along with their links
+    Returns the number of milestones removed
+    """
+    _validate_namespace(namespace)
+    return data.delete_namespace_milestones(namespace)
+
+
+@memo.invalidating
 def add_course_milestone(course_key, relationship, milestone):
     """
     Adds a course-milestone link to the system
@@ -136,6 +186,7 @@ def add_course_milestone(course_key, relationship, milestone):
     data.create_course_milestone(course_key=course_key, relationship=relationship, milestone=milestone)
 
 
+@memo.memoized
 def get_course_milestones(course_key, relationship=None):
     """
     Retrieves the set of milestones for a given course
@@ -149,6 +200,7 @@ def get_course_milestones(course_key, relationship=None):
     return data.fetch_courses_milestones(course_keys=[course_key], relationship=relationship)
 
 
+@memo.memoized
 def get_course_required_milestones(course_key, user):
     """
     Retrieves the set of required milestones for a given course that a user has not yet collected
@@ -159,6 +211,52 @@ def get_course_required_milestones(course_key, user):
     return required_milestones
 
 
+@memo.memoized
+def get_course_required_milestones_count(course_key, user):
+    """
+    Retrieves the number of required milestones for a given course that a user has not yet collected
+    (zero means the user has met every requirement for the course)
+    """
+    _validate_course_key(course_key)
+    _validate_user(user)
+    return data.fetch_course_unmet_milestones_count(course_key, user)
+
+
+@memo.memoized
+def get_courses_unmet_milestone_ids(course_keys, user):
+    """
+    Retrieves, for each of the specified courses, the ids of the required milestones
+    that a user has not yet collected (catalog-style checks)
+    Returns a dict of course id -> list of milestone ids
+    """
+    [_validate_course_key(course_key) for course_key in course_keys]  # pylint: disable=expression-not-assigned
+    _validate_user(user)
+    return data.fetch_courses_unmet_milestone_ids(course_keys, user)
+
+
+def get_users_required_milestones_counts(course_key, users):
+    """
+    Retrieves, for each of the specified users, the number of required milestones for
+    a given course that they have not yet collected (roster-style checks)
+    Returns a dict of user id -> count
+    """
+    _validate_course_key(course_key)
+    [_validate_user(user) for user in users]  # pylint: disable=expression-not-assigned
+    return data.fetch_users_unmet_milestones_counts(course_key, users)
+
+
+def get_course_blocked_users(course_key, user_ids, chunk_size=data.BLOCKED_USERS_CHUNK_SIZE):
+    """
+    Streams the users, out of 'user_ids' (any iterable of user ids, eg: a course roster),
+    who have not yet collected every milestone required by a given course
+    Returns a generator of (user id, list of missing milestone ids) tuples, which checks
+    'chunk_size' users at a time
+    """
+    _validate_course_key(course_key)
+    return data.iter_course_blocked_users(course_key, user_ids, chunk_size)
+
+
+@memo.memoized
 def get_course_milestones_fulfillment_paths(course_key, user):
     """
     Returns a collection composed of the possible fulfillment/collection opportunites
@@ -169,20 +267,27 @@ def get_course_milestones_fulfillment_paths(course_key, user):
     # Retrieve the outstanding milestones for this course, for this user
     required_milestones = data.fetch_courses_milestones([course_key], 'requires', user)
 
-    # Build the set of fulfillment paths for the outstanding milestones
+    # Pull the fulfillers for all of the outstanding milestones at once
     fulfillment_paths = {}
-    for milestone in required_milestones:
-        dict_key = 'milestone_{}'.format(milestone['id'])
-        fulfillment_paths[dict_key] = {}
-        milestone_courses = data.fetch_milestone_courses(milestone, 'fulfills')
-        if len(milestone_courses):
-            fulfillment_paths[dict_key]['courses'] = milestone_courses
-        milestone_course_content = data.fetch_milestone_course_content(milestone, 'fulfills')
-        if len(milestone_course_content):
-            fulfillment_paths[dict_key]['content'] = milestone_course_content
+    for milestone_id, fulfillers in data.fetch_milestones_fulfillers(required_milestones).items():
+        fulfillment_paths['milestone_{}'.format(milestone_id)] = dict(
+            (key, value) for key, value in fulfillers.items() if value
+        )
     return fulfillment_paths
 
 
+@memo.memoized
+def get_course_prerequisites(course_key):
+    """
+    Retrieves the full prerequisite chain for a given course: every course
+    fulfilling a milestone it requires, directly or through other courses
+    Returns an array of dicts containing course ids and their distance ('depth'), nearest first
+    """
+    _validate_course_key(course_key)
+    return projections.fetch_course_prerequisites(course_key)
+
+
+@memo.memoized
 def get_courses_milestones(course_keys, relationship=None, user=None):
     """
     Retrieves the set of milestones for list of courses
@@ -200,6 +305,7 @@ def get_courses_milestones(course_keys, relationship=None, user=None):
         user=user)
 
 
+@memo.invalidating
 def remove_course_milestone(course_key, milestone):
     """
     Removes the specfied milestone from the specified course
@@ -209,6 +315,7 @@ def remove_course_milestone(course_key, milestone):
     return data.delete_course_milestone(course_key=course_key, milestone=milestone)
 
 
+@memo.invalidating
 def add_course_content_milestone(course_key, content_key, relationship, milestone):
     """
     Adds a course-content-milestone link to the system
@@ -225,6 +332,46 @@ def add_course_content_milestone(course_key, content_key, relationship, mileston
         milestone=milestone)
 
 
+@memo.invalidating
+def clone_course_milestones(source_course_key, target_course_key, map_content_key=None):
+    """
+    Copies a course's milestone configuration (its course and course content milestone
+    links) to another course, eg: when the course is rerun
+    'map_content_key': optional callable taking each content (usage) key and returning
+    the key to use in the target course, or None to leave the link out (by default
+    content keys are mapped into the target course)
+    Returns a dict of link type -> number of links created
+    """
+    _validate_course_key(source_course_key)
+    _validate_course_key(target_course_key)
+    return graph.clone_course_milestones(source_course_key, target_course_key, map_content_key)
+
+
+@memo.invalidating
+def sync_course_milestones(course_key, content_links, course_links=None):
+    """
+    Brings a course's milestone configuration in line with the complete desired set of
+    links, eg: when a course is saved in Studio, touching only the links which differ
+    'content_links': iterable of (content_key, relationship, milestone) tuples
+    'course_links': optional iterable of (relationship, milestone) tuples for the course
+    itself (when omitted, the course milestone links are left as they are)
+    Returns a dict with the number of links 'created', 'updated' and 'deleted'
+    """
+    _validate_course_key(course_key)
+    content_links = list(content_links)
+    for content_key, relationship, milestone in content_links:
+        _validate_content_key(content_key)
+        _validate_milestone_relationship_type(relationship)
+        _validate_milestone(milestone)
+    if course_links is not None:
+        course_links = list(course_links)
+        for relationship, milestone in course_links:
+            _validate_milestone_relationship_type(relationship)
+            _validate_milestone(milestone)
+    return graph.sync_course_milestones(course_key, content_links, course_links)
+
+
+@memo.memoized
 def get_course_content_milestones(course_key, content_key, relationship=None):
     """
     Retrieves the set of milestones for a given course content module
@@ -244,6 +391,27 @@ def get_course_content_milestones(course_key, content_key, relationship=None):
     )
 
 
+@memo.memoized
+def get_course_contents_milestones(content_pairs, relationship=None):
+    """
+    Retrieves the set of milestones for a list of (course_key, content_key) pairs
+    'relationship': optional filter on milestone relationship type (string, eg: 'requires')
+    Returns a dict of arrays of milestone dicts, keyed by content key
+    """
+    for course_key, content_key in content_pairs:
+        _validate_course_key(course_key)
+        _validate_content_key(content_key)
+
+    if relationship is not None:
+        _validate_milestone_relationship_type(relationship)
+
+    return data.fetch_course_contents_milestones(
+        content_pairs=content_pairs,
+        relationship=relationship
+    )
+
+
+@memo.invalidating
 def remove_course_content_milestone(course_key, content_key, milestone):
     """
     Removes the specified milestone from the specified course content module
@@ -258,6 +426,7 @@ def remove_course_content_milestone(course_key, content_key, milestone):
     )
 
 
+@memo.invalidating
 def add_user_milestone(user, milestone):
     """
     Adds a new User-Milestone relationship to the system
@@ -267,15 +436,18 @@ def add_user_milestone(user, milestone):
     data.create_user_milestone(user, milestone)
 
 
-def get_user_milestones(user):
+@memo.memoized
+def get_user_milestones(user, include_archived=False):
     """
     Retrieves the set of milestones for a given user
+    Archived user milestones are only included when 'include_archived' is set
     Returns an array of dicts
     """
     _validate_user(user)
-    return data.fetch_user_milestones(user)
+    return data.fetch_user_milestones(user, include_archived=include_archived)
 
 
+@memo.invalidating
 def remove_user_milestone(user, milestone):
     """
     Removes the specified User-Milestone link from the system
@@ -285,15 +457,91 @@ def remove_user_milestone(user, milestone):
     return data.delete_user_milestone(user, milestone)
 
 
-def user_has_milestone(user, milestone):
+@memo.invalidating
+def restore_user_milestones(user):
+    """
+    Moves the specified user's archived User-Milestone links back into the system,
+    for instance when an inactive user returns
+    Returns the number of links restored
+    """
+    _validate_user(user)
+    return archive.restore_user_milestones(user)
+
+
+@memo.memoized
+def user_has_milestone(user, milestone, include_archived=False):
     """
     A helper/convenience method to check for a specific user-milestone link
+    Archived user milestones are only considered when 'include_archived' is set
     """
     _validate_user(user)
     _validate_milestone(milestone)
-    return len(data.fetch_user_milestones(user, milestone))
+    return len(data.fetch_user_milestones(user, milestone, include_archived=include_archived))
+
+
+@memo.memoized
+def get_milestones_holder_counts(milestones):
+    """
+    Retrieves the number of users who have collected each of the specified milestones
+    Returns a dict of milestone id -> count
+    """
+    [_validate_milestone(milestone) for milestone in milestones]  # pylint: disable=expression-not-assigned
+    return projections.fetch_milestones_holder_counts(milestones)
+
+
+@memo.memoized
+def get_milestones_fulfillers(milestones):
+    """
+    Retrieves the courses and course content modules which fulfill each of the
+    specified milestones (eg: to show how a locked course can be unlocked)
+    Returns a dict of milestone id -> {'courses': [...], 'content': [...]}
+    """
+    [_validate_milestone(milestone) for milestone in milestones]  # pylint: disable=expression-not-assigned
+    return data.fetch_milestones_fulfillers(milestones)
+
+
+def get_milestone_changes(cursor=None, limit=1000):
+    """
+    Retrieves the user, course and course content milestone inserts, updates and
+    deletes made since 'cursor' (from the beginning when omitted), oldest first
+    Returns a dict containing the 'changes' (array of dicts) and the 'cursor' to
+    pass in for the next page
+    """
+    return changefeed.fetch_changes(cursor, limit)
+
+
+def export_milestone_graph(include_users=False, batch_size=graph.GRAPH_BATCH_SIZE):
+    """
+    Streams the active milestones and the course and course content links to them (along
+    with the user awards when 'include_users' is set), eg: to load into another environment
+    Returns a generator of dicts, each with a 'type' of 'milestone', 'course_milestone',
+    'course_content_milestone' or 'user_milestone' -- milestones are referenced by namespace and name
+    Rows are read 'batch_size' at a time
+    """
+    return graph.iter_graph_records(include_users, batch_size)
+
+
+@memo.invalidating
+def import_milestone_graph(records, batch_size=graph.GRAPH_BATCH_SIZE):
+    """
+    Loads milestone graph records (in the export_milestone_graph format, from any iterable),
+    creating the milestones and links which do not already exist, 'batch_size' records at a time
+    Returns a dict of record type -> number of rows created
+    """
+    def validated(records):
+        """ Validates the records as they are consumed """
+        for record in records:
+            if not validators.graph_record_is_valid(record):
+                exceptions.raise_exception(
+                    "milestone graph record",
+                    record,
+                    exceptions.InvalidGraphRecordException
+                )
+            yield record
+    return graph.import_graph_records(validated(records), batch_size)
 
 
+@memo.invalidating
 def remove_course_references(course_key):
     """
     Removes course references from application state
@@ -303,6 +551,7 @@ def remove_course_references(course_key):
     data.delete_course_references(course_key)
 
 
+@memo.invalidating
 def remove_content_references(content_key):
     """
     Removes content references from application state
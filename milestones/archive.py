@@ -0,0 +1,130 @@
+# pylint: disable=no-member
+"""
+Archive of the Milestones user awards.
+
+UserMilestone is by far the largest table.  archive_user_milestones moves the
+awards no gating check needs any more (inactive awards, those of inactive
+users and those of retired milestones) into the ArchivedUserMilestone table,
+and restore_user_milestones moves a user's archived awards back.  Awards
+archived because their milestones were retired come back by themselves when
+the milestones are reactivated (see restore_retired_links).
+"""
+from django.db.models import Q
+
+from . import models as internal
+from . import projections
+from . import routers
+from . import storage
+
+# Default number of UserMilestone rows moved per batch by archive_user_milestones
+ARCHIVE_BATCH_SIZE = 1000
+
+# Number of archived UserMilestone records restored per batch when their milestones are reactivated
+# (their user ids and milestone ids both being listed, this keeps the lookup of the awards collected
+# again within SQLite's limit of 999 parameters)
+RETIRED_RESTORE_BATCH_SIZE = 400
+
+
+def _archive_user_links(links, user_ids=()):
+    """
+    Moves a batch of UserMilestone records into the archive table -- the active records of users
+    other than the specified (inactive) ones were picked for their retired milestones alone
+    """
+    user_ids = set(user_ids)
+    internal.ArchivedUserMilestone.objects.bulk_create([
+        internal.ArchivedUserMilestone(
+            user_id=link.user_id,
+            milestone_id=link.milestone_id,
+            source=link.source,
+            active=link.active,
+            retired=link.active and link.user_id not in user_ids,
+            created=link.created,
+        )
+        for link in links
+    ])
+    internal.MilestoneTombstone.objects.bulk_create(storage.delete_loaded_links(internal.UserMilestone, links))
+    projections.after_bulk_link_changes(user_links=links, user_delta=-1)
+
+
+def archive_user_milestones(user_ids=(), retired_milestones=True, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Moves up to 'batch_size' UserMilestone records matching the archival policy into the archive
+    table: inactive records, those belonging to the specified (inactive) users and, with
+    'retired_milestones', those linked to inactive milestones
+    Archived users are no longer credited with their milestones until they are restored
+    Returns the number of records archived
+    """
+    routers.pin_everything()
+    policy = Q(active=False)
+    if user_ids:
+        policy |= Q(user_id__in=user_ids)
+    if retired_milestones:
+        policy |= Q(milestone__active=False)
+    links = list(internal.UserMilestone.objects.filter(policy).order_by('id')[:batch_size])
+    if links:
+        storage.atomically(_archive_user_links, links, user_ids)
+    return len(links)
+
+
+def _unarchive_user_links(archived, collected):
+    """
+    Moves a list of archived records back into the UserMilestone table, skipping those whose
+    (user id, milestone id) pair is in 'collected', ie: the milestones collected again since
+    Restored records are new rows created now, so the change feed reports them as inserts
+    """
+    collected = set(collected)
+    links = []
+    for record in archived:
+        if (record.user_id, record.milestone_id) not in collected:
+            collected.add((record.user_id, record.milestone_id))
+            links.append(internal.UserMilestone(
+                user_id=record.user_id,
+                milestone_id=record.milestone_id,
+                source=record.source,
+                active=record.active,
+            ))
+    internal.UserMilestone.objects.bulk_create(links)
+    internal.ArchivedUserMilestone.objects.filter(id__in=[record.id for record in archived]).delete()
+    projections.after_bulk_link_changes(user_links=links)
+    return links
+
+
+def _restore_user_links(user_id):
+    """
+    Moves a user's archived records back into the UserMilestone table, skipping the
+    milestones collected again since they were archived
+    """
+    archived = list(internal.ArchivedUserMilestone.objects.filter(user_id=user_id).order_by('-modified'))
+    if not archived:
+        return []
+    return _unarchive_user_links(
+        archived,
+        internal.UserMilestone.objects.filter(user_id=user_id).values_list('user_id', 'milestone'),
+    )
+
+
+def restore_retired_links(milestone_ids):
+    """
+    Moves the records archived because the specified milestones were retired back into
+    the UserMilestone table, a batch at a time, skipping the awards collected again since
+    """
+    while True:
+        archived = list(internal.ArchivedUserMilestone.objects.filter(
+            milestone_id__in=milestone_ids,
+            retired=True,
+        ).order_by('id')[:RETIRED_RESTORE_BATCH_SIZE])
+        if not archived:
+            return
+        _unarchive_user_links(archived, internal.UserMilestone.objects.filter(
+            user_id__in=set(record.user_id for record in archived),
+            milestone__in=set(record.milestone_id for record in archived),
+        ).values_list('user_id', 'milestone'))
+
+
+def restore_user_milestones(user):
+    """
+    Moves the user's archived UserMilestone records back into the hot table
+    Returns the number of records restored
+    """
+    routers.pin_user(user['id'])
+    return len(storage.atomically(_restore_user_links, user['id']))
@@ -0,0 +1,90 @@
+"""
+Compact set representation of milestone ids for batch gating checks.
+
+Unmet-requirement checks are set differences between the milestones a course
+requires and the milestones a user has earned.  Rather than comparing lists of
+dicts, a MilestoneUniverse maps the (sorted) milestone ids relevant to a batch
+onto dense bit positions, so each side becomes a single Python int and the
+checks become word-at-a-time bitwise operations:
+
+    universe = MilestoneUniverse(required_ids)
+    missing = difference(universe.bits(required_ids), universe.bits(earned_ids))
+    count(missing), universe.ids(missing)
+
+Only ids within the universe are represented, so a user's bitset costs one bit
+per relevant milestone however large the milestone ids themselves grow.
+"""
+
+
+class MilestoneUniverse(object):
+    """
+    Dense bit positions for a fixed set of milestone ids
+    """
+    __slots__ = ('_ids', '_positions')
+
+    def __init__(self, milestone_ids):
+        self._ids = tuple(sorted(set(milestone_ids)))
+        self._positions = dict((milestone_id, position) for position, milestone_id in enumerate(self._ids))
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def milestone_ids(self):
+        """
+        Sorted milestone ids making up the universe
+        """
+        return self._ids
+
+    def bits(self, milestone_ids):
+        """
+        Bitset of the specified milestone ids (ids outside the universe are ignored)
+        """
+        bits = 0
+        for milestone_id in milestone_ids:
+            position = self._positions.get(milestone_id)
+            if position is not None:
+                bits |= 1 << position
+        return bits
+
+    def ids(self, bits):
+        """
+        Sorted milestone ids contained in a bitset
+        """
+        milestone_ids = []
+        position = 0
+        while bits:
+            if bits & 1:
+                milestone_ids.append(self._ids[position])
+            bits >>= 1
+            position += 1
+        return milestone_ids
+
+
+def intersection(bits, other):
+    """
+    Milestones contained in both bitsets
+    """
+    return bits & other
+
+
+def difference(bits, other):
+    """
+    Milestones contained in 'bits' but not in 'other'
+    """
+    return bits & ~other
+
+
+def count(bits):
+    """
+    Number of milestones contained in a bitset
+    """
+    return bin(bits).count('1')
+
+
+def differences(bits, others):
+    """
+    Applies difference(bits, other) across a dict of bitsets, keeping the keys
+    (eg: a course's requirements against every learner's earned milestones)
+    """
+    return dict((key, bits & ~other) for key, other in others.items())
@@ -0,0 +1,381 @@
+"""
+Cache management for the Milestones data layer.  Responsible for:
+
+* Building cache keys for the course-requirement, course-content-gate and
+  relationship-type entries
+* Reading/writing those entries from the configured Django cache
+
+Entries are only stored when MILESTONES_CACHE_TIMEOUT is set (seconds).
+Relationship types never change once created, so they are then cached for a
+day regardless of that timeout.
+
+Course and content entries are filled single-flight: when an entry expires, one
+worker takes a short-lived lock and recomputes it while the others keep serving
+the previous value for up to MILESTONES_CACHE_STALE_TIMEOUT seconds.  Explicit
+invalidations remove the entry outright, so stale values are only ever served
+after a plain expiry.
+
+Milestone entries (by id and by namespace, including negative lookups) are also
+kept in a small per-process LRU in front of the shared cache for
+MILESTONES_LOCAL_CACHE_TIMEOUT seconds.  Invalidations clear both tiers in the
+writing process; other processes pick up the change once their local entry
+expires.
+"""
+from collections import OrderedDict
+import copy
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import get_cache
+
+KEY_PREFIX = 'milestones'
+
+# Relationship types are effectively immutable (see storage.get_relationship_type)
+RELATIONSHIP_TYPE_TIMEOUT = 60 * 60 * 24
+
+# Lifetime of the gating snapshot version marker -- should it expire, every worker reloads once
+GATING_VERSION_TIMEOUT = 60 * 60 * 24
+
+# Relationships cached for each course/content entry ('None' is the unfiltered set)
+RELATIONSHIPS = (None, 'requires', 'fulfills')
+
+# Per-process milestone entry defaults (entries, seconds)
+LOCAL_CACHE_SIZE = 1000
+LOCAL_CACHE_TIMEOUT = 5
+
+# Stampede protection defaults (seconds)
+STALE_TIMEOUT = 30
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 0.2
+LOCK_POLL_INTERVAL = 0.02
+
+
+# Cache backends by alias -- get_cache builds a new backend (and client) on every call
+_BACKENDS = {}
+_BACKENDS_LOCK = threading.Lock()
+
+
+def _cache():
+    """
+    Returns the cache backend configured for this app, building it on first use
+    """
+    alias = getattr(settings, 'MILESTONES_CACHE_ALIAS', 'default')
+    backend = _BACKENDS.get(alias)
+    if backend is None:
+        with _BACKENDS_LOCK:
+            backend = _BACKENDS.get(alias)
+            if backend is None:
+                backend = _BACKENDS[alias] = get_cache(alias)
+    return backend
+
+
+def _key(entity, *identifiers):
+    """
+    Builds a backend-safe key -- course and content ids may be long or contain
+    characters (such as spaces) which memcached will not accept
+    """
+    digest = hashlib.md5(u'|'.join(unicode(identifier) for identifier in identifiers).encode('utf-8'))
+    return '{}.{}.{}'.format(KEY_PREFIX, entity, digest.hexdigest())
+
+
+def is_enabled():
+    """
+    Course and content entries are only cached once a timeout has been configured
+    """
+    return bool(get_timeout())
+
+
+def get_timeout():
+    """
+    Returns the configured course/content entry timeout (seconds)
+    """
+    return getattr(settings, 'MILESTONES_CACHE_TIMEOUT', None)
+
+
+def course_milestones_key(course_id, relationship=None):
+    """
+    Key for the milestones linked to a course
+    """
+    return _key('course', course_id, relationship)
+
+
+def course_content_milestones_key(course_id, content_id, relationship=None):
+    """
+    Key for the milestones linked to a course content module
+    """
+    return _key('content', course_id, content_id, relationship)
+
+
+def milestone_key(milestone_id):
+    """
+    Key for a milestone looked up by id
+    """
+    return _key('milestone', milestone_id)
+
+
+def namespace_milestones_key(namespace):
+    """
+    Key for the milestones in a namespace
+    """
+    return _key('namespace', namespace)
+
+
+def milestone_keys(milestone_ids=(), namespaces=()):
+    """
+    Every milestone entry key for the specified milestone ids and namespaces
+    """
+    return (
+        [milestone_key(milestone_id) for milestone_id in milestone_ids] +
+        [namespace_milestones_key(namespace) for namespace in namespaces]
+    )
+
+
+def relationship_type_key(name):
+    """
+    Key for a milestone relationship type
+    """
+    return _key('relationship_type', name)
+
+
+def gating_version_key():
+    """
+    Key for the marker which moves whenever the gating configuration changes
+    """
+    return '{}.gating_version'.format(KEY_PREFIX)
+
+
+def course_keys(course_ids):
+    """
+    Every course entry key for the specified courses
+    """
+    return [
+        course_milestones_key(course_id, relationship)
+        for course_id in course_ids
+        for relationship in RELATIONSHIPS
+    ]
+
+
+def course_content_keys(content_pairs):
+    """
+    Every content entry key for the specified (course_id, content_id) pairs
+    """
+    return [
+        course_content_milestones_key(course_id, content_id, relationship)
+        for course_id, content_id in content_pairs
+        for relationship in RELATIONSHIPS
+    ]
+
+
+def _lock_key(key):
+    """
+    Key for the single-flight lock guarding an entry
+    """
+    return '{}.lock'.format(key)
+
+
+def _read_fresh(cache, keys):
+    """
+    Reads a set of entries, returning the values of those which are still fresh
+    """
+    now = time.time()
+    return dict(
+        (key, envelope['value'])
+        for key, envelope in cache.get_many(keys).items()
+        if envelope['fresh_until'] > now
+    )
+
+
+def get_or_build(keys, build):
+    """
+    Reads a set of entries, calling build(keys) -> {key: value} for those which are
+    missing or have expired.  Returns a dict of every requested key.
+
+    Only the worker holding an entry's lock rebuilds it; the others are served the
+    stale value if one is left, or otherwise wait briefly for the rebuilt entry
+    (building it themselves should the lock holder not finish in time).
+    """
+    keys = list(keys)
+    if not is_enabled():
+        return build(keys)
+    if not keys:
+        return {}
+
+    cache = _cache()
+    now = time.time()
+    lock_timeout = getattr(settings, 'MILESTONES_CACHE_LOCK_TIMEOUT', LOCK_TIMEOUT)
+    envelopes = cache.get_many(keys)
+    values = {}
+    locked = []
+    waiting = []
+    for key in keys:
+        envelope = envelopes.get(key)
+        if envelope is not None and envelope['fresh_until'] > now:
+            values[key] = envelope['value']
+        elif cache.add(_lock_key(key), True, lock_timeout):
+            locked.append(key)
+        elif envelope is not None:
+            values[key] = envelope['value']
+        else:
+            waiting.append(key)
+
+    # Give the lock holders a moment to fill the entries nobody has a value for
+    deadline = now + getattr(settings, 'MILESTONES_CACHE_LOCK_WAIT', LOCK_WAIT)
+    while waiting and time.time() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        filled = _read_fresh(cache, waiting)
+        values.update(filled)
+        waiting = [key for key in waiting if key not in filled]
+
+    if locked or waiting:
+        try:
+            built = build(locked + waiting)
+            set_many(built)
+        finally:
+            cache.delete_many([_lock_key(key) for key in locked])
+        values.update(built)
+    return values
+
+
+def set_many(entries, timeout=None):
+    """
+    Stores a dict of entries, which remain available as stale values for
+    MILESTONES_CACHE_STALE_TIMEOUT seconds after they expire
+    """
+    if not is_enabled() or not entries:
+        return
+    timeout = timeout or get_timeout()
+    stale_timeout = getattr(settings, 'MILESTONES_CACHE_STALE_TIMEOUT', STALE_TIMEOUT)
+    fresh_until = time.time() + timeout
+    _cache().set_many(
+        dict((key, {'value': value, 'fresh_until': fresh_until}) for key, value in entries.items()),
+        timeout + stale_timeout
+    )
+
+
+class LocalCache(object):
+    """
+    A thread-safe, size-bounded LRU of values which expire after a number of seconds
+    """
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """
+        Returns the values of those keys which are held and have not expired
+        """
+        now = time.time()
+        values = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None and entry[1] > now:
+                    values[key] = entry[0]
+                    self._entries[key] = entry
+        return values
+
+    def set_many(self, entries, timeout, max_size):
+        """
+        Stores a dict of entries, evicting the least recently used ones beyond 'max_size'
+        """
+        expires = time.time() + timeout
+        with self._lock:
+            for key, value in entries.items():
+                self._entries.pop(key, None)
+                self._entries[key] = (value, expires)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        """
+        Drops a set of entries
+        """
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Drops every entry
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+_LOCAL = LocalCache()
+
+
+def get_or_build_local(keys, build):
+    """
+    Reads a set of entries through the per-process LRU, falling back on
+    get_or_build (and so the shared cache) for those it does not hold
+    Values are copied on the way out, so callers cannot alter the cached ones
+    """
+    keys = list(keys)
+    local_timeout = getattr(settings, 'MILESTONES_LOCAL_CACHE_TIMEOUT', LOCAL_CACHE_TIMEOUT)
+    if not is_enabled() or not local_timeout:
+        return get_or_build(keys, build)
+    values = _LOCAL.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        built = get_or_build(missing, build)
+        _LOCAL.set_many(built, local_timeout, getattr(settings, 'MILESTONES_LOCAL_CACHE_SIZE', LOCAL_CACHE_SIZE))
+        values.update(built)
+    return copy.deepcopy(values)
+
+
+def clear_local():
+    """
+    Empties this process's LRU
+    """
+    _LOCAL.clear()
+
+
+def get_relationship_type(name):
+    """
+    Reads a cached relationship type
+    """
+    if not is_enabled():
+        return None
+    return _cache().get(relationship_type_key(name))
+
+
+def set_relationship_type(relationship_type):
+    """
+    Stores a relationship type
+    """
+    if not is_enabled():
+        return
+    _cache().set(relationship_type_key(relationship_type.name), relationship_type, RELATIONSHIP_TYPE_TIMEOUT)
+
+
+def delete_many(keys):
+    """
+    Invalidates a set of entries
+    """
+    if not is_enabled() or not keys:
+        return
+    _LOCAL.delete_many(keys)
+    _cache().delete_many(keys)
+
+
+def get_gating_version():
+    """
+    Reads the gating configuration version marker, starting a new one if it is missing
+    """
+    cache = _cache()
+    version = cache.get(gating_version_key())
+    if version is None:
+        cache.add(gating_version_key(), uuid.uuid4().hex, GATING_VERSION_TIMEOUT)
+        version = cache.get(gating_version_key())
+    return version
+
+
+def bump_gating_version():
+    """
+    Moves the gating configuration version marker on
+    """
+    _cache().set(gating_version_key(), uuid.uuid4().hex, GATING_VERSION_TIMEOUT)
@@ -0,0 +1,125 @@
+# pylint: disable=no-member
+"""
+Change feed of the Milestones links.
+
+fetch_changes pages through the UserMilestone, CourseMilestone and
+CourseContentMilestone inserts, updates and deletes (the latter read from the
+tombstones the removals leave behind, see storage.py) in the order of their
+'modified' stamps, so other systems can follow the gating configuration and
+the awards without polling every table.  The cursor it returns encodes the
+position of the last change reported.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import exceptions
+from . import models as internal
+from . import routers
+from . import serializers
+from . import storage
+
+# Feed rank of the tombstones, which follow the link records sharing their timestamp
+CHANGE_FEED_TOMBSTONE_RANK = len(storage.LINK_ENTITIES)
+CHANGE_FEED_CURSOR_FORMAT = '%Y%m%dT%H%M%S%f'
+
+# Seconds a change must have settled for before the feed reports it, so rows written by
+# transactions still in flight (which may commit with an earlier 'modified') are not skipped.
+# Rows are ordered by their 'modified' stamp rather than by commit, so a transaction committing
+# more than this long after stamping its rows may still land behind a reader's cursor and be
+# missed for good: keep MILESTONES_CHANGE_FEED_LAG above the longest transaction writing milestone links.
+CHANGE_FEED_LAG = 5
+
+
+def _parse_change_cursor(cursor):
+    """
+    Splits a change feed cursor into its (modified, rank, id) position
+    """
+    try:
+        timestamp, rank, row_id = cursor.split('_')
+        position = (datetime.strptime(timestamp, CHANGE_FEED_CURSOR_FORMAT), int(rank), int(row_id))
+    except (AttributeError, ValueError):
+        raise exceptions.InvalidChangeCursorException(
+            'The change feed cursor you have provided is not valid: {}'.format(cursor)
+        )
+    if settings.USE_TZ:
+        position = (timezone.make_aware(position[0], timezone.utc),) + position[1:]
+    return position
+
+
+def _format_change_cursor(modified, rank, row_id):
+    """
+    Builds the change feed cursor for a (modified, rank, id) position
+    """
+    if timezone.is_aware(modified):
+        modified = timezone.make_naive(modified, timezone.utc)
+    return '{}_{}_{}'.format(modified.strftime(CHANGE_FEED_CURSOR_FORMAT), rank, row_id)
+
+
+def _after_change_position(queryset, position, rank):
+    """
+    Narrows a change source down to the rows sorting after the cursor position
+    (rows sort by modified timestamp, then source rank, then id)
+    """
+    if position is None:
+        return queryset
+    modified, cursor_rank, row_id = position
+    if rank > cursor_rank:
+        return queryset.filter(modified__gte=modified)
+    if rank < cursor_rank:
+        return queryset.filter(modified__gt=modified)
+    return queryset.filter(Q(modified__gt=modified) | Q(modified=modified, id__gt=row_id))
+
+
+def _read_change_rows(position, limit, using=None):
+    """
+    Reads the first 'limit' change feed rows after the cursor position, as
+    (modified, rank, id, record) tuples in feed order
+    Each source is read with a keyset query over its (modified, id) index, so paging costs the
+    same however far into the feed the cursor is
+    """
+    settled = timezone.now() - timedelta(seconds=getattr(settings, 'MILESTONES_CHANGE_FEED_LAG', CHANGE_FEED_LAG))
+    sources = [(rank, model) for rank, (__, model) in enumerate(storage.LINK_ENTITIES)]
+    sources.append((CHANGE_FEED_TOMBSTONE_RANK, internal.MilestoneTombstone))
+    rows = []
+    for rank, model in sources:
+        queryset = _after_change_position(
+            model.objects.using(using).filter(modified__lte=settled), position, rank
+        ).order_by('modified', 'id')[:limit]
+        rows.extend((record.modified, rank, record.id, record) for record in queryset)
+    return sorted(rows, key=lambda row: row[:3])[:limit]
+
+
+def fetch_changes(cursor=None, limit=1000):
+    """
+    Retrieves the UserMilestone, CourseMilestone and CourseContentMilestone inserts, updates and
+    deletes made since the specified cursor (from the beginning when none is provided), oldest first
+    Returns a dict holding the 'changes' and the 'cursor' to pass in for the next page
+    Changes are ordered by their 'modified' stamp, not by commit: see CHANGE_FEED_LAG
+    """
+    position = _parse_change_cursor(cursor) if cursor is not None else None
+    using = routers.read_database()
+    rows = _read_change_rows(position, limit, using)
+
+    relationship_names = storage.relationship_names([row[3] for row in rows], using)
+    changes = []
+    for row in rows:
+        record = row[3]
+        if row[1] == CHANGE_FEED_TOMBSTONE_RANK:
+            change = serializers.serialize_change(
+                record.entity, 'delete', record.entity_id, record, relationship_names
+            )
+        else:
+            # Records created since the cursor are new to the reader, whatever has happened to them since
+            action = 'insert' if position is None or record.created > position[0] else 'update'
+            change = serializers.serialize_change(
+                storage.LINK_ENTITIES[row[1]][0], action, record.id, record, relationship_names
+            )
+            change['active'] = record.active
+        changes.append(change)
+
+    if rows:
+        cursor = _format_change_cursor(*rows[-1][:3])
+    return {'changes': changes, 'cursor': cursor}
@@ -18,35 +18,117 @@ for easy consumption and manipulation by callers -- the queryset stops here!
 
 Note the terminology difference at this layer vs. API -- create/fetch/update/delete/
 
+The rest of the data layer lives alongside this module: the storage primitives shared
+by the writes (storage.py), the derived gating state (projections.py), the archive of
+user awards (archive.py), the change feed (changefeed.py), the bulk graph operations
+(graph.py) and the slow call monitoring (monitoring.py).
+
 When the time comes for remote resources, import the module like so:
 if getattr(settings, 'TEST_MODE', False) or os.getenv('TRAVIS_MODE', False):
     import milestones.tests.mocks.resources as remote
 else:
     import milestones.resources as remote
 """
+from itertools import islice
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import archive
+from . import bitsets
+from . import caching
 from . import exceptions
 from . import models as internal
+from . import monitoring
+from . import projections
+from . import routers
 from . import serializers
+from . import snapshot
+from . import storage
+
+# Number of users whose earned milestones are read per query by the batch gating checks
+EARNED_BITSETS_BATCH_SIZE = 500
+
+# Default number of users checked per round trip by the blocked user report
+BLOCKED_USERS_CHUNK_SIZE = 500
+
+# Number of milestones (or link rows) changed per transaction by the namespace operations
+NAMESPACE_BATCH_SIZE = 500
+
+# Milestone fields which update_milestone changes when they are supplied
+MILESTONE_UPDATE_FIELDS = ('namespace', 'name', 'description', 'active')
 
 
 # PRIVATE/INTERNAL METHODS
-def _get_milestone_relationship_type(relationship):
+def _build_course_milestones_entries(course_ids, relationship_type=None):
     """
-    Retrieves milestone relationship type object from backend
+    Queries the milestones linked to a set of courses, returning the matching cache
+    entries -- without a relationship type, the entries for every relationship
+    are built from the same query
     """
-    try:
-        return internal.MilestoneRelationshipType.objects.get(
-            name=relationship,
-            active=True
-        )
-    except internal.MilestoneRelationshipType.DoesNotExist:
-        if relationship in ['requires', 'fulfills']:
-            return internal.MilestoneRelationshipType.objects.create(
-                name=relationship,
-                active=True
-            )
-        else:
-            raise exceptions.InvalidMilestoneRelationshipTypeException()
+    queryset = internal.CourseMilestone.objects.using(routers.read_database()).filter(
+        course_id__in=course_ids,
+        active=True,
+    )
+    if relationship_type is not None:
+        queryset = queryset.filter(milestone_relationship_type=relationship_type.id)
+        relationships = (relationship_type.name,)
+    else:
+        relationships = caching.RELATIONSHIPS
+
+    entries = dict(
+        (caching.course_milestones_key(course_id, relationship), [])
+        for course_id in course_ids
+        for relationship in relationships
+    )
+    for course_milestone in storage.load_links(queryset):
+        serialized = serializers.serialize_milestone_with_course(course_milestone)
+        for relationship in (None, course_milestone.milestone_relationship_type.name):
+            key = caching.course_milestones_key(course_milestone.course_id, relationship)
+            if key in entries:
+                entries[key].append(serialized)
+    return entries
+
+
+def _filter_course_content_milestones(queryset, relationship_type=None):
+    """
+    Reads the active links matched by a CourseContentMilestone queryset (see storage.load_links)
+    Optionally pass in 'relationship_type' to filter down the set
+    """
+    queryset = queryset.filter(active=True)
+    if relationship_type is not None:
+        queryset = queryset.filter(milestone_relationship_type=relationship_type.id)
+    return storage.load_links(queryset)
+
+
+def _build_course_content_milestones_entries(queryset, content_pairs=(), relationship_type=None):
+    """
+    Groups a CourseContentMilestone queryset into cache entries keyed by course content
+    (see _build_course_milestones_entries).  'content_pairs' lists the (course_id, content_id)
+    pairs which should yield an entry even when nothing is linked to them.
+    """
+    links = _filter_course_content_milestones(queryset, relationship_type)
+    if relationship_type is not None:
+        relationships = (relationship_type.name,)
+    else:
+        relationships = caching.RELATIONSHIPS
+
+    entries = dict(
+        (caching.course_content_milestones_key(course_id, content_id, relationship), [])
+        for course_id, content_id in content_pairs
+        for relationship in relationships
+    )
+    for course_content_milestone in links:
+        serialized = serializers.serialize_milestone(course_content_milestone.milestone)
+        for relationship in relationships:
+            if relationship in (None, course_content_milestone.milestone_relationship_type.name):
+                key = caching.course_content_milestones_key(
+                    course_content_milestone.course_id,
+                    course_content_milestone.content_id,
+                    relationship
+                )
+                entries.setdefault(key, []).append(serialized)
+    return entries
 
 
 # PUBLIC METHODS
@@ -55,8 +137,9 @@ def create_milestone(milestone):
     Inserts a new milestone into app/local state
     Returns a dictionary representation of the object
     """
+    routers.pin_everything()
     milestone_obj = serializers.deserialize_milestone(milestone)
-    milestone, __ = internal.Milestone.objects.get_or_create(  # pylint: disable=invalid-name
+    milestone, created = internal.Milestone.objects.get_or_create(  # pylint: disable=invalid-name
         namespace=milestone_obj.namespace,
         name=milestone_obj.name,
         active=True,
@@ -64,24 +147,52 @@ def create_milestone(milestone):
             'description': milestone_obj.description,
         }
     )
+    if created:
+        storage.invalidate_milestones([milestone.id], [milestone.namespace])
     return serializers.serialize_milestone(milestone)
 
 
+@storage.changes_gating
 def update_milestone(milestone):
     """
     Updates an existing milestone in app/local state
     Returns a dictionary representation of the object
     """
-    milestone_obj = serializers.deserialize_milestone(milestone)
+    routers.pin_everything()
     try:
-        milestone = internal.Milestone.objects.get(id=milestone_obj.id)
-        milestone.name = milestone_obj.name
-        milestone.namespace = milestone_obj.namespace
-        milestone.description = milestone_obj.description
-        milestone.active = milestone_obj.active
+        milestone_obj = internal.Milestone.objects.get(id=milestone.get('id'))
     except internal.Milestone.DoesNotExist:
         raise exceptions.InvalidMilestoneException()
-    return serializers.serialize_milestone(milestone)
+
+    # Only the fields supplied by the caller are changed
+    fields = dict((field, milestone[field]) for field in MILESTONE_UPDATE_FIELDS if field in milestone)
+    active_changed = 'active' in fields and bool(fields['active']) != milestone_obj.active
+    namespaces = set([milestone_obj.namespace])
+    for field, value in fields.items():
+        setattr(milestone_obj, field, value)
+    namespaces.add(milestone_obj.namespace)
+    internal.Milestone.objects.filter(id=milestone_obj.id).update(  # pylint: disable=star-args
+        modified=timezone.now(),
+        **fields
+    )
+    if fields:
+        storage.gating_changed()
+    if fields:
+        storage.update_milestone_fields(  # pylint: disable=star-args
+            [milestone_obj.id],
+            **dict(('milestone_{}'.format(field), value) for field, value in fields.items())
+        )
+    storage.invalidate_milestones([milestone_obj.id], namespaces)
+    storage.invalidate_milestone_links([milestone_obj.id])
+    if active_changed:
+        if milestone_obj.active:
+            archive.restore_retired_links([milestone_obj.id])
+        requiring_course_ids = projections.courses_requiring([milestone_obj.id])
+        if projections.course_access_projection_enabled():
+            # As with _set_milestones_active, affected rows are dropped and recomputed upon their next lookup
+            internal.UserCourseAccess.objects.filter(course_id__in=requiring_course_ids).delete()
+        projections.reindex_prerequisites(requiring_course_ids)
+    return serializers.serialize_milestone(milestone_obj)
 
 
 def delete_milestone(milestone):
@@ -93,21 +204,153 @@ def delete_milestone(milestone):
     _delete_milestone(milestone_obj)
 
 
+@storage.changes_gating
 def _delete_milestone(milestone):
     """
     Internal helper for milestone removals -- also removes defined dependencies
     """
+    routers.pin_everything()
+    storage.invalidate_milestone_links([milestone.id])
+    requiring_course_ids = []
+    if projections.prerequisite_index_enabled():
+        requiring_course_ids = [row['course_id'] for row in projections.requiring_course_ids(milestone.id)]
+    if projections.course_access_projection_enabled():
+        # Affected rows are simply dropped, and recomputed upon their next lookup
+        internal.UserCourseAccess.objects.filter(
+            course_id__in=projections.requiring_course_ids(milestone.id)
+        ).delete()
+
     # Remove related entities, and then remove the Milestone
-    internal.CourseMilestone.objects.filter(
-        milestone=milestone.id).delete()
-    internal.CourseContentMilestone.objects.filter(
-        milestone=milestone.id).delete()
-    internal.UserMilestone.objects.filter(
-        milestone=milestone.id).delete()
+    storage.delete_links(
+        internal.CourseMilestone.objects.filter(milestone=milestone.id),
+        internal.CourseContentMilestone.objects.filter(milestone=milestone.id),
+        internal.UserMilestone.objects.filter(milestone=milestone.id),
+    )
+    internal.ArchivedUserMilestone.objects.filter(milestone_id=milestone.id).delete()
+    internal.MilestoneHolderCount.objects.filter(milestone_id=milestone.id).delete()
+    namespaces = storage.cached_namespaces([milestone.id])
     internal.Milestone.objects.filter(
         id=milestone.id).delete()
+    storage.invalidate_milestones([milestone.id], namespaces)
+    projections.reindex_prerequisites(requiring_course_ids)
+
+
+@storage.changes_gating
+def _set_milestones_active(namespace, milestone_ids, active):
+    """
+    Deactivates or reactivates a batch of a namespace's milestones -- their links are left in
+    place, and are hidden from (or shown to) the readers along with the milestones, while the
+    awards archived because the milestones were retired come back when they are reactivated
+    """
+    storage.invalidate_milestone_links(milestone_ids)
+    if internal.Milestone.objects.filter(id__in=milestone_ids).update(active=active, modified=timezone.now()):
+        storage.gating_changed()
+    storage.update_milestone_fields(milestone_ids, milestone_active=active)
+    if active:
+        archive.restore_retired_links(milestone_ids)
+    storage.invalidate_milestones(milestone_ids, [namespace])
+    requiring_course_ids = projections.courses_requiring(milestone_ids)
+    if projections.course_access_projection_enabled():
+        # Affected rows are simply dropped, and recomputed upon their next lookup
+        internal.UserCourseAccess.objects.filter(course_id__in=requiring_course_ids).delete()
+    projections.reindex_prerequisites(requiring_course_ids)
+
+
+def _set_namespace_active(namespace, active, batch_size):
+    """
+    Flips the state of every milestone in the namespace, a batch of milestones per transaction
+    Returns the number of milestones changed
+    """
+    routers.pin_everything()
+    changed = 0
+    while True:
+        milestone_ids = list(internal.Milestone.objects.filter(
+            namespace=namespace,
+            active=not active,
+        ).order_by('id').values_list('id', flat=True)[:batch_size])
+        if milestone_ids:
+            _set_milestones_active(namespace, milestone_ids, active)
+            changed += len(milestone_ids)
+        if len(milestone_ids) < batch_size:
+            return changed
+
+
+def deactivate_namespace_milestones(namespace, batch_size=NAMESPACE_BATCH_SIZE):
+    """
+    Retires every milestone in the namespace, which stops them (and their links) being served
+    Returns the number of milestones deactivated
+    """
+    return _set_namespace_active(namespace, False, batch_size)
+
+
+def reactivate_namespace_milestones(namespace, batch_size=NAMESPACE_BATCH_SIZE):
+    """
+    Brings back every retired milestone in the namespace, along with their links and the
+    awards archive.archive_user_milestones archived because they were retired
+    Returns the number of milestones reactivated
+    """
+    return _set_namespace_active(namespace, True, batch_size)
+
+
+@storage.changes_gating
+def _delete_namespace_batch(namespace, batch_size):
+    """
+    Deletes up to 'batch_size' rows belonging to the namespace's milestones, starting with
+    their links and archived awards, and then moving on to the milestones themselves
+    Returns the number of rows deleted
+    """
+    deleted = {}
+    tombstones = []
+    for queryset in (
+            internal.CourseMilestone.objects.filter(milestone__namespace=namespace),
+            internal.CourseContentMilestone.objects.filter(milestone__namespace=namespace),
+            internal.UserMilestone.objects.filter(milestone__namespace=namespace),
+    ):
+        links = list(queryset.order_by('id')[:batch_size])
+        if links:
+            tombstones.extend(storage.delete_loaded_links(queryset.model, links))
+        deleted[queryset.model] = links
+        batch_size -= len(links)
+    internal.MilestoneTombstone.objects.bulk_create(tombstones)
+    projections.after_bulk_link_changes(
+        course_links=deleted[internal.CourseMilestone],
+        content_links=deleted[internal.CourseContentMilestone],
+        user_links=deleted[internal.UserMilestone],
+        user_delta=-1,
+    )
+    if batch_size <= 0:
+        return len(tombstones)
+
+    # Only milestones with no links left are removed
+    milestone_ids = list(internal.Milestone.objects.filter(
+        namespace=namespace,
+    ).order_by('id').values_list('id', flat=True)[:batch_size])
+    archived_ids = list(internal.ArchivedUserMilestone.objects.filter(
+        milestone_id__in=milestone_ids,
+    ).order_by('id').values_list('id', flat=True)[:batch_size])
+    if archived_ids:
+        internal.ArchivedUserMilestone.objects.filter(id__in=archived_ids).delete()
+        return len(tombstones) + len(archived_ids)
+    if milestone_ids:
+        internal.MilestoneHolderCount.objects.filter(milestone_id__in=milestone_ids).delete()
+        internal.Milestone.objects.filter(id__in=milestone_ids).delete()
+        storage.invalidate_milestones(milestone_ids, [namespace])
+    return len(tombstones) + len(milestone_ids)
+
+
+def delete_namespace_milestones(namespace, batch_size=NAMESPACE_BATCH_SIZE):
+    """
+    Deletes every milestone in the namespace along with their links, a batch of rows per transaction
+    Returns the number of milestones deleted
+    """
+    routers.pin_everything()
+    milestone_count = internal.Milestone.objects.filter(namespace=namespace).count()
+    while _delete_namespace_batch(namespace, batch_size):
+        pass
+    return milestone_count
 
 
+@monitoring.monitored
 def fetch_milestones(milestone):
     """
     Retrieves a set of matching milestones from app/local state
@@ -117,139 +360,255 @@ def fetch_milestones(milestone):
         raise exceptions.InvalidMilestoneException()
     milestone_obj = serializers.deserialize_milestone(milestone)
     if milestone_obj.id is not None:
-        return serializers.serialize_milestones(internal.Milestone.objects.filter(
+        key = caching.milestone_key(milestone_obj.id)
+        queryset = internal.Milestone.objects.using(routers.read_database()).filter(
             id=milestone_obj.id,
             active=True,
-        ))
-    if milestone_obj.namespace is not None:
-        return serializers.serialize_milestones(internal.Milestone.objects.filter(
+        )
+    elif milestone_obj.namespace is not None:
+        key = caching.namespace_milestones_key(milestone_obj.namespace)
+        queryset = internal.Milestone.objects.using(routers.read_database()).filter(
             namespace=milestone_obj.namespace,
             active=True
-        ))
-    return []
+        )
+    else:
+        return []
+    # Misses are cached too, as an empty list
+    return caching.get_or_build_local(
+        [key],
+        lambda missing_keys: {key: serializers.serialize_milestones(queryset)}
+    )[key]
 
 
+@storage.changes_gating
 def create_course_milestone(course_key, relationship, milestone):
     """
     Inserts a new course-milestone into app/local state
     No response currently defined for this operation
     """
-    relationship_type = _get_milestone_relationship_type(relationship)
+    routers.pin_everything()
+    relationship_type = storage.get_relationship_type(relationship)
     milestone_obj = serializers.deserialize_milestone(milestone)
-    internal.CourseMilestone.objects.get_or_create(
+    course_milestone, created = internal.CourseMilestone.objects.get_or_create(
         course_id=unicode(course_key),
         milestone=milestone_obj,
-        milestone_relationship_type=relationship_type,
-        active=True,
+        defaults=storage.link_defaults(milestone_obj.id, relationship_type),
     )
-
-
+    if not course_milestone.active:
+        created = storage.reactivate_link(course_milestone, relationship_type)
+    elif created:
+        storage.gating_changed()
+    if not created:
+        return
+    storage.invalidate_course_links(course_ids=[unicode(course_key)])
+    if relationship_type.name == 'requires':
+        projections.adjust_course_access(unicode(course_key), milestone_obj.id, 1)
+    projections.reindex_prerequisites_for_link(unicode(course_key), milestone_obj.id, relationship_type.name)
+
+
+@storage.changes_gating
 def delete_course_milestone(course_key, milestone):
     """
     Removes an existing course-milestone from app/local state
     No response currently defined for this operation
     """
+    routers.pin_everything()
     try:
-        internal.CourseMilestone.objects.get(
+        course_milestone = internal.CourseMilestone.objects.get(
             course_id=unicode(course_key),
             milestone=milestone['id'],
             active=True,
-        ).delete()
+        )
     except internal.CourseMilestone.DoesNotExist:
-        pass
+        return
+    storage.delete_link(course_milestone)
+    storage.invalidate_course_links(course_ids=[unicode(course_key)])
+    if course_milestone.milestone_relationship_type_id == storage.get_relationship_type('requires').id:
+        relationship = 'requires'
+        projections.adjust_course_access(unicode(course_key), milestone['id'], -1)
+    else:
+        relationship = 'fulfills'
+    projections.reindex_prerequisites_for_link(unicode(course_key), milestone['id'], relationship)
 
 
+@monitoring.monitored
 def fetch_courses_milestones(course_keys, relationship=None, user=None):
     """
     Retrieves the set of milestones currently linked to the specified courses
     Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
     """
-    queryset = internal.CourseMilestone.objects.filter(
-        course_id__in=course_keys,
-        active=True
-    ).select_related('milestone')
+    course_ids = []
+    for course_key in course_keys:
+        if unicode(course_key) not in course_ids:
+            course_ids.append(unicode(course_key))
 
     # if milestones relationship type found then apply the filter
+    relationship_type = None
     if relationship is not None:
-        mrt = _get_milestone_relationship_type(relationship)
-        queryset = queryset.filter(
-            milestone_relationship_type=mrt.id,
+        relationship_type = storage.get_relationship_type(relationship)
+
+    # Assemble the response container
+    course_milestones = []
+    gating = snapshot.current()
+    if gating is not None:
+        for course_id in course_ids:
+            course_milestones.extend(gating.course_milestones(course_id, relationship))
+    else:
+        # Serve what we can from the cache and query the remaining courses all at once
+        keys = dict((course_id, caching.course_milestones_key(course_id, relationship)) for course_id in course_ids)
+        entries = caching.get_or_build(
+            keys.values(),
+            lambda missing_keys: _build_course_milestones_entries(
+                [course_id for course_id in course_ids if keys[course_id] in missing_keys],
+                relationship_type
+            )
         )
+        for course_id in course_ids:
+            course_milestones.extend(entries[keys[course_id]])
 
     # To pull the list of milestones a user HAS, use get_user_milestones
     # Use fetch_courses_milestones to pull the list of milestones that a user does not yet
     # have for the specified course
-    if relationship == 'requires' and user and user.get('id', 0) > 0:
-        queryset = queryset.exclude(milestone__usermilestone__user_id=user['id'])
-
-    # Assemble the response container
-    course_milestones = []
-    if len(queryset):
-        for milestone in queryset:
-            course_milestones.append(serializers.serialize_milestone_with_course(milestone))
+    if relationship == 'requires' and user and user.get('id', 0) > 0 and course_milestones:
+        collected = set(internal.UserMilestone.objects.using(routers.read_database(user['id'])).filter(
+            user_id=user['id'],
+            milestone__in=set(milestone['id'] for milestone in course_milestones),
+        ).values_list('milestone', flat=True))
+        course_milestones = [
+            milestone for milestone in course_milestones if milestone['id'] not in collected
+        ]
 
     return course_milestones
 
 
+@storage.changes_gating
 def create_course_content_milestone(course_key, content_key, relationship, milestone):
     """
     Inserts a new course-content-milestone into app/local state
     No response currently defined for this operation
     """
-    relationship_type = _get_milestone_relationship_type(relationship)
+    routers.pin_everything()
+    relationship_type = storage.get_relationship_type(relationship)
     milestone_obj = serializers.deserialize_milestone(milestone)
-    internal.CourseContentMilestone.objects.get_or_create(
+    course_content_milestone, created = internal.CourseContentMilestone.objects.get_or_create(
         course_id=unicode(course_key),
         content_id=unicode(content_key),
         milestone=milestone_obj,
-        milestone_relationship_type=relationship_type,
-        active=True,
+        defaults=storage.link_defaults(milestone_obj.id, relationship_type),
     )
+    if not course_content_milestone.active:
+        created = storage.reactivate_link(course_content_milestone, relationship_type)
+    elif created:
+        storage.gating_changed()
+    if created:
+        storage.invalidate_course_links(content_pairs=[(unicode(course_key), unicode(content_key))])
 
 
+@storage.changes_gating
 def delete_course_content_milestone(course_key, content_key, milestone):
     """
     Removes an existing course-content-milestone from app/local state
     No response currently defined for this operation
     """
+    routers.pin_everything()
     try:
-        internal.CourseContentMilestone.objects.get(
+        course_content_milestone = internal.CourseContentMilestone.objects.get(
             course_id=unicode(course_key),
             content_id=unicode(content_key),
             milestone=milestone['id'],
             active=True,
-        ).delete()
+        )
     except internal.CourseContentMilestone.DoesNotExist:
-        pass
+        return
+    storage.delete_link(course_content_milestone)
+    storage.invalidate_course_links(content_pairs=[(unicode(course_key), unicode(content_key))])
 
 
+@monitoring.monitored
 def fetch_course_content_milestones(course_key, content_key, relationship=None):
     """
     Retrieves the set of milestones currently linked to the specified course content
     Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
-    Optionally pass in 'user' to further-filter the set (ex. for retrieving unfulfilled milestones)
+    Only lookups specifying both the course and the content are cached (or served from the gating snapshot)
     """
-    queryset = internal.Milestone.objects.filter(active=True)
-
-    if course_key:
-        queryset = queryset.filter(coursecontentmilestone__course_id=unicode(course_key))
+    relationship_type = None
+    if relationship:
+        relationship_type = storage.get_relationship_type(relationship)
+
+    queryset = internal.CourseContentMilestone.objects.using(routers.read_database())
+    if not (course_key and content_key):
+        if course_key:
+            queryset = queryset.filter(course_id=unicode(course_key))
+        if content_key:
+            queryset = queryset.filter(content_id=unicode(content_key))
+        return [
+            serializers.serialize_milestone(course_content_milestone.milestone)
+            for course_content_milestone in _filter_course_content_milestones(queryset, relationship_type)
+        ]
+
+    content_pair = (unicode(course_key), unicode(content_key))
+    gating = snapshot.current()
+    if gating is not None:
+        return gating.course_content_milestones(content_pair[0], content_pair[1], relationship)
+    key = caching.course_content_milestones_key(content_pair[0], content_pair[1], relationship)
+    entries = caching.get_or_build(
+        [key],
+        lambda missing_keys: _build_course_content_milestones_entries(
+            queryset.filter(course_id=content_pair[0], content_id=content_pair[1]),
+            content_pairs=[content_pair],
+            relationship_type=relationship_type
+        )
+    )
+    return entries[key]
 
-    if content_key:
-        queryset = queryset.filter(coursecontentmilestone__content_id=unicode(content_key))
 
+@monitoring.monitored
+def fetch_course_contents_milestones(content_pairs, relationship=None):
+    """
+    Retrieves the set of milestones currently linked to each of the specified
+    (course_key, content_key) pairs, as a dict keyed by the content keys provided
+    Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
+    Runs a single query regardless of the number of course content modules provided
+    """
+    relationship_type = None
     if relationship:
-        mrt = _get_milestone_relationship_type(relationship)
-        queryset = internal.Milestone.objects.filter(
-            coursecontentmilestone__milestone_relationship_type=mrt.id,
-            active=True,
+        relationship_type = storage.get_relationship_type(relationship)
+
+    keys = {}
+    for course_key, content_key in content_pairs:
+        keys[content_key] = (unicode(course_key), unicode(content_key))
+
+    gating = snapshot.current()
+    if gating is not None:
+        return dict(
+            (content_key, gating.course_content_milestones(course_id, content_id, relationship))
+            for content_key, (course_id, content_id) in keys.items()
         )
 
-    course_content_milestones = []
-    if len(queryset):
-        for milestone in queryset:
-            course_content_milestones.append(serializers.serialize_milestone(milestone))
+    cache_keys = dict(
+        (content_pair, caching.course_content_milestones_key(content_pair[0], content_pair[1], relationship))
+        for content_pair in keys.values()
+    )
 
-    return course_content_milestones
+    def build(missing_keys):
+        """
+        Queries the links of every missing course content module at once, keeping only the requested pairs
+        """
+        missing_pairs = [pair for pair, key in cache_keys.items() if key in missing_keys]
+        entries = _build_course_content_milestones_entries(
+            internal.CourseContentMilestone.objects.using(routers.read_database()).filter(
+                content_id__in=set(content_id for __, content_id in missing_pairs),
+            ),
+            content_pairs=missing_pairs,
+            relationship_type=relationship_type
+        )
+        return dict((key, entries[key]) for key in missing_keys)
+
+    entries = caching.get_or_build(cache_keys.values(), build)
+    return dict(
+        (content_key, list(entries[cache_keys[content_pair]]))
+        for content_key, content_pair in keys.items()
+    )
 
 
 def fetch_milestone_courses(milestone, relationship=None):
@@ -257,24 +616,32 @@ def fetch_milestone_courses(milestone, relationship=None):
     Retrieves the set of courses currently linked to the specified milestone
     Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
     """
-    milestone_obj = serializers.deserialize_milestone(milestone)
-    queryset = internal.CourseMilestone.objects.filter(
-        milestone=milestone_obj,
-        active=True
-    ).select_related('milestone')
+    return fetch_courses_for_milestones([milestone], relationship)
+
+
+@monitoring.monitored
+def fetch_courses_for_milestones(milestones, relationship=None):
+    """
+    Retrieves the set of courses currently linked to any of the specified milestones
+    Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
+    Runs a single query regardless of the number of milestones provided
+    """
+    queryset = internal.CourseMilestone.objects.using(routers.read_database()).filter(
+        milestone__in=[milestone['id'] for milestone in milestones],
+        active=True,
+    )
 
     # if milestones relationship type found then apply the filter
     if relationship is not None:
-        mrt = _get_milestone_relationship_type(relationship)
+        mrt = storage.get_relationship_type(relationship)
         queryset = queryset.filter(
             milestone_relationship_type=mrt.id,
         )
 
     # Assemble the response container
     milestone_courses = []
-    if len(queryset):
-        for milestone in queryset:
-            milestone_courses.append(serializers.serialize_milestone_with_course(milestone))
+    for milestone in storage.load_links(queryset):
+        milestone_courses.append(serializers.serialize_milestone_with_course(milestone))
 
     return milestone_courses
 
@@ -284,22 +651,31 @@ def fetch_milestone_course_content(milestone, relationship=None):
     Retrieves the set of course content modules currently linked to the specified milestone
     Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
     """
-    milestone_obj = serializers.deserialize_milestone(milestone)
-    queryset = internal.CourseContentMilestone.objects.filter(
-        milestone=milestone_obj,
+    return fetch_course_content_for_milestones([milestone], relationship)
+
+
+@monitoring.monitored
+def fetch_course_content_for_milestones(milestones, relationship=None):
+    """
+    Retrieves the set of course content modules currently linked to any of the specified milestones
+    Optionally pass in 'relationship' (ex. 'fulfills') to filter down the set
+    Runs a single query regardless of the number of milestones provided
+    """
+    queryset = internal.CourseContentMilestone.objects.using(routers.read_database()).filter(
+        milestone__in=[milestone['id'] for milestone in milestones],
         active=True
-    ).select_related('milestone')
+    )
 
     # if milestones relationship type found then apply the filter
     if relationship is not None:
-        mrt = _get_milestone_relationship_type(relationship)
+        mrt = storage.get_relationship_type(relationship)
         queryset = queryset.filter(
             milestone_relationship_type=mrt.id,
         )
 
     # Assemble the response container
     milestone_course_content = []
-    for milestone in queryset:
+    for milestone in storage.load_links(queryset):
         milestone_course_content.append(
             serializers.serialize_milestone_with_course_content(milestone)
         )
@@ -307,17 +683,63 @@ def fetch_milestone_course_content(milestone, relationship=None):
     return milestone_course_content
 
 
+@monitoring.monitored
+def fetch_milestones_fulfillers(milestones):
+    """
+    Retrieves the courses and course content modules fulfilling each of the specified milestones
+    Served from the gating snapshot when it is enabled, otherwise runs a single query
+    per link table regardless of the number of milestones provided
+    Returns a dict of milestone id -> {'courses': [...], 'content': [...]}
+    """
+    fulfillers = dict(
+        (milestone['id'], {'courses': [], 'content': []})
+        for milestone in milestones
+    )
+    if not fulfillers:
+        return fulfillers
+
+    gating = snapshot.current()
+    if gating is not None:
+        for milestone_id, milestone_fulfillers in fulfillers.items():
+            milestone_fulfillers['courses'] = gating.milestone_courses(milestone_id, 'fulfills')
+            milestone_fulfillers['content'] = gating.milestone_course_content(milestone_id, 'fulfills')
+        return fulfillers
+
+    relationship_type = storage.get_relationship_type('fulfills')
+    using = routers.read_database()
+    for queryset, key, serialize in (
+            (internal.CourseMilestone.objects.using(using), 'courses', serializers.serialize_milestone_with_course),
+            (
+                internal.CourseContentMilestone.objects.using(using),
+                'content',
+                serializers.serialize_milestone_with_course_content
+            ),
+    ):
+        links = storage.load_links(queryset.filter(
+            milestone__in=fulfillers.keys(),
+            milestone_relationship_type=relationship_type.id,
+            active=True,
+        ))
+        for link in links:
+            fulfillers[link.milestone_id][key].append(serialize(link))
+    return fulfillers
+
+
 def create_user_milestone(user, milestone):
     """
     Inserts a new user-milestone into app/local state
     No response currently defined for this operation
     """
+    routers.pin_user(user['id'])
     milestone_obj = serializers.deserialize_milestone(milestone)
-    internal.UserMilestone.objects.get_or_create(
+    created = internal.UserMilestone.objects.get_or_create(
         user_id=user['id'],
         milestone=milestone_obj,
         active=True,
-    )
+    )[1]
+    if created:
+        projections.adjust_user_course_access(user['id'], milestone_obj.id, -1)
+        projections.adjust_holder_count(user['id'], milestone_obj.id, 1)
 
 
 def delete_user_milestone(user, milestone):
@@ -325,49 +747,228 @@ def delete_user_milestone(user, milestone):
     Removes an existing user-milestone from app/local state
     No response currently defined for this operation
     """
+    routers.pin_user(user['id'])
     try:
-        internal.UserMilestone.objects.get(
+        user_milestone = internal.UserMilestone.objects.get(
             user_id=user['id'],
             milestone=milestone['id'],
             active=True,
-        ).delete()
+        )
     except internal.UserMilestone.DoesNotExist:
-        pass
+        return
+    storage.delete_link(user_milestone)
+    projections.adjust_user_course_access(user['id'], milestone['id'], 1)
+    projections.adjust_holder_count(user['id'], milestone['id'], -1)
 
 
-def fetch_user_milestones(user, milestone=None):
+@monitoring.monitored
+def fetch_user_milestones(user, milestone=None, include_archived=False):
     """
     Retrieves the set of milestones currently linked to the specified user
-    """
-    if milestone is None:
-        queryset = internal.Milestone.objects.filter(
+    Archived links (see archive.archive_user_milestones) are only consulted when 'include_archived' is set
+    """
+    using = routers.read_database(user['id'])
+    if include_archived:
+        queryset = internal.Milestone.objects.using(using).filter(
+            Q(id__in=internal.UserMilestone.objects.using(using).filter(
+                user_id=user['id'],
+            ).values('milestone')) |
+            Q(id__in=internal.ArchivedUserMilestone.objects.using(using).filter(
+                user_id=user['id'],
+            ).values('milestone_id')),
+            active=True,
+        )
+    elif milestone is None:
+        queryset = internal.Milestone.objects.using(using).filter(
             usermilestone__user_id=user['id'],
             active=True,
         )
     else:
-        queryset = internal.Milestone.objects.filter(
+        queryset = internal.Milestone.objects.using(using).filter(
             id=milestone['id'],
             usermilestone__user_id=user['id'],
             active=True,
         )
+    if include_archived and milestone is not None:
+        queryset = queryset.filter(id=milestone['id'])
     user_milestones = []
-    if len(queryset):
-        for milestone in queryset:
-            user_milestones.append(serializers.serialize_milestone(milestone))
+    for milestone in queryset:
+        user_milestones.append(serializers.serialize_milestone(milestone))
     return user_milestones
 
 
+@storage.changes_gating
 def delete_content_references(content_key):
     """
     Removes references to content keys within this app (ref: api.py)
     Supports the 'delete entrance exam' Studio use case, when Milestones is enabled
+    The links are only deactivated here, and physically removed later by storage.purge_inactive_links
     """
-    internal.CourseContentMilestone.objects.filter(content_id=unicode(content_key)).delete()
+    routers.pin_everything()
+    queryset = internal.CourseContentMilestone.objects.filter(content_id=unicode(content_key), active=True)
+    if storage.tracks_invalidations():
+        storage.invalidate_course_links(content_pairs=set(queryset.values_list('course_id', 'content_id')))
+    if queryset.update(active=False, modified=timezone.now()):
+        storage.gating_changed()
 
 
+@storage.changes_gating
 def delete_course_references(course_key):
     """
     Removes references to course keys within this app (ref: receivers.py and api.py)
+    The links are only deactivated here, and physically removed later by storage.purge_inactive_links
+    """
+    routers.pin_everything()
+    course_content_milestones = internal.CourseContentMilestone.objects.filter(
+        course_id=unicode(course_key),
+        active=True,
+    )
+    if storage.tracks_invalidations():
+        storage.invalidate_course_links(
+            course_ids=[unicode(course_key)],
+            content_pairs=set(course_content_milestones.values_list('course_id', 'content_id'))
+        )
+    deactivated = internal.CourseMilestone.objects.filter(
+        course_id=unicode(course_key),
+        active=True,
+    ).update(active=False, modified=timezone.now())
+    if deactivated + course_content_milestones.update(active=False, modified=timezone.now()):
+        storage.gating_changed()
+    if projections.course_access_projection_enabled():
+        internal.UserCourseAccess.objects.filter(course_id=unicode(course_key)).delete()
+    projections.reindex_prerequisites([unicode(course_key)])
+
+
+def fetch_course_unmet_milestones_count(course_key, user):
+    """
+    Retrieves the number of milestones required by the specified course which the user has not yet collected
+    With MILESTONES_COURSE_ACCESS_PROJECTION enabled this is a single UserCourseAccess lookup,
+    computed and stored upon the first request for each user and course
+    """
+    if not projections.course_access_projection_enabled():
+        return len(fetch_courses_milestones([course_key], 'requires', user))
+    try:
+        return internal.UserCourseAccess.objects.using(routers.read_database(user['id'])).get(
+            user_id=user['id'],
+            course_id=unicode(course_key),
+        ).unmet_count
+    except internal.UserCourseAccess.DoesNotExist:
+        return projections.create_course_access(unicode(course_key), user['id'])
+
+
+def _earned_bitsets(universe, user_ids, using=None):
+    """
+    Builds a bitset of the earned milestones (within the universe) for each of the specified users
+    """
+    earned = dict((user_id, 0) for user_id in user_ids)
+    if not len(universe):
+        return earned
+    user_ids = list(earned)
+    for start in range(0, len(user_ids), EARNED_BITSETS_BATCH_SIZE):
+        for user_id, milestone_id in internal.UserMilestone.objects.using(using).filter(
+                user_id__in=user_ids[start:start + EARNED_BITSETS_BATCH_SIZE],
+                milestone__in=universe.milestone_ids,
+        ).values_list('user_id', 'milestone'):
+            earned[user_id] |= universe.bits([milestone_id])
+    return earned
+
+
+@monitoring.monitored
+def fetch_courses_unmet_milestone_ids(course_keys, user):
+    """
+    Retrieves, for each of the specified courses, the ids of the required milestones the user has not yet collected
+    Built for catalog-style checks over many courses: two queries at most, whatever the number of courses
+    Returns a dict of course id -> sorted list of milestone ids
+    """
+    required = {}
+    for course_milestone in fetch_courses_milestones(course_keys, 'requires'):
+        required.setdefault(course_milestone['course_id'], []).append(course_milestone['id'])
+    universe = bitsets.MilestoneUniverse(
+        milestone_id for milestone_ids in required.values() for milestone_id in milestone_ids
+    )
+    earned = _earned_bitsets(universe, [user['id']], routers.read_database(user['id']))[user['id']]
+    return dict(
+        (unicode(course_key), universe.ids(bitsets.difference(
+            universe.bits(required.get(unicode(course_key), ())), earned
+        )))
+        for course_key in course_keys
+    )
+
+
+@monitoring.monitored
+def fetch_users_unmet_milestones_counts(course_key, users):
+    """
+    Retrieves, for each of the specified users, the number of milestones required by the course
+    which they have not yet collected
+    Built for roster-style checks over many users: each user's earned milestones are held as a
+    bitset over the course's requirements rather than a list of dicts
+    Returns a dict of user id -> count
+    """
+    required_ids = [milestone['id'] for milestone in fetch_courses_milestones([course_key], 'requires')]
+    universe = bitsets.MilestoneUniverse(required_ids)
+    required_bits = universe.bits(required_ids)
+    earned = _earned_bitsets(universe, [user['id'] for user in users], routers.read_database())
+    return dict(
+        (user_id, bitsets.count(missing))
+        for user_id, missing in bitsets.differences(required_bits, earned).items()
+    )
+
+
+def iter_course_blocked_users(course_key, user_ids, chunk_size=BLOCKED_USERS_CHUNK_SIZE):
+    """
+    Yields a (user id, sorted list of missing milestone ids) pair for each of the specified
+    users who has not yet collected every milestone required by the course, in the order given
+    'user_ids' may be any iterable (eg: a file of ids) -- it is consumed one chunk at a time, with
+    one query per chunk, so memory use does not depend upon the number of users
+    """
+    required_ids = [milestone['id'] for milestone in fetch_courses_milestones([course_key], 'requires')]
+    if not required_ids:
+        return
+    universe = bitsets.MilestoneUniverse(required_ids)
+    required_bits = universe.bits(required_ids)
+    user_ids = iter(user_ids)
+    while True:
+        chunk = list(islice(user_ids, chunk_size))
+        if not chunk:
+            return
+        earned = _earned_bitsets(universe, chunk, routers.read_database())
+        for user_id in chunk:
+            missing = bitsets.difference(required_bits, earned[user_id])
+            if missing:
+                yield user_id, universe.ids(missing)
+
+
+def fetch_active_course_ids():
+    """
+    Retrieves the ids of every course with an active milestone or content link
+    """
+    course_ids = set(internal.CourseMilestone.objects.using(routers.read_database()).filter(
+        active=True
+    ).values_list('course_id', flat=True).distinct())
+    course_ids.update(internal.CourseContentMilestone.objects.using(routers.read_database()).filter(
+        active=True
+    ).values_list('course_id', flat=True).distinct())
+    return sorted(course_ids)
+
+
+def warm_relationship_types():
+    """
+    Preloads the cached milestone relationship types
+    """
+    for relationship in ['requires', 'fulfills']:
+        storage.get_relationship_type(relationship)
+
+
+def warm_course_caches(course_keys):
+    """
+    Preloads the course and course content cache entries for a set of courses,
+    using one query per link table regardless of the number of courses
+    Returns the number of entries stored
     """
-    internal.CourseMilestone.objects.filter(course_id=unicode(course_key)).delete()
-    internal.CourseContentMilestone.objects.filter(course_id=unicode(course_key)).delete()
+    course_ids = [unicode(course_key) for course_key in course_keys]
+    entries = _build_course_milestones_entries(course_ids)
+    entries.update(_build_course_content_milestones_entries(
+        internal.CourseContentMilestone.objects.using(routers.read_database()).filter(course_id__in=course_ids)
+    ))
+    caching.set_many(entries)
+    return len(entries)
@@ -38,6 +38,20 @@ class InvalidUserException(Exception):
     pass
 
 
+class InvalidChangeCursorException(Exception):
+    """
+    Change feed cursor validation exception class
+    """
+    pass
+
+
+class InvalidGraphRecordException(Exception):
+    """
+    Milestone graph import record validation exception class
+    """
+    pass
+
+
 def raise_exception(entity_type, entity, exception):
     """ Exception helper """
     raise exception(
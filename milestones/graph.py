@@ -0,0 +1,392 @@
+# pylint: disable=no-member
+"""
+Bulk reads and writes of the Milestones graph.
+
+* iter_graph_records streams the milestones and their links (and optionally
+  the user awards) out as milestone graph records (see
+  serializers.GRAPH_FIELDS), and import_graph_records loads such records back
+  in with bulk inserts, matching milestones up by (namespace, name).
+* clone_course_milestones copies one course's links to another (eg: a course
+  rerun), and sync_course_milestones takes a course's links to a desired
+  state, applying only the inserts, updates and deletes needed.
+
+Each write runs in a single transaction per batch, and course and course
+content links left inactive by a references removal are reactivated rather
+than duplicated.
+"""
+from itertools import islice
+
+from django.utils import timezone
+from opaque_keys.edx.keys import CourseKey, UsageKey
+
+from . import exceptions
+from . import models as internal
+from . import projections
+from . import routers
+from . import serializers
+from . import storage
+
+# Milestone graph record types, in the order they are exported (links follow the milestones they name)
+GRAPH_RECORD_TYPES = ('milestone', 'course_milestone', 'course_content_milestone', 'user_milestone')
+
+# Default number of milestone graph records read/written per round trip
+GRAPH_BATCH_SIZE = 500
+
+# Number of rows written per statement when syncing a course's links to a desired state
+SYNC_BATCH_SIZE = 500
+
+
+def iter_graph_records(include_users=False, batch_size=GRAPH_BATCH_SIZE):
+    """
+    Yields the active milestones, then the course and course content links to them (and
+    optionally the user awards), as milestone graph records (see serializers.GRAPH_FIELDS)
+    Rows are read 'batch_size' at a time in id order, so the graph is streamed in constant memory
+    """
+    record_types = GRAPH_RECORD_TYPES if include_users else GRAPH_RECORD_TYPES[:-1]
+    querysets = {
+        'milestone': internal.Milestone.objects.filter(active=True),
+        'course_milestone': internal.CourseMilestone.objects.filter(milestone__active=True),
+        'course_content_milestone': internal.CourseContentMilestone.objects.filter(milestone__active=True),
+        'user_milestone': internal.UserMilestone.objects.filter(milestone__active=True),
+    }
+    for record_type in record_types:
+        columns = [column for __, column in serializers.GRAPH_FIELDS[record_type]]
+        queryset = querysets[record_type].using(routers.read_database()).order_by('id')
+        last_id = 0
+        while True:
+            rows = list(
+                queryset.filter(id__gt=last_id).values('id', *columns)[:batch_size]  # pylint: disable=star-args
+            )
+            for row in rows:
+                yield serializers.serialize_graph_record(record_type, row)
+            if len(rows) < batch_size:
+                break
+            last_id = rows[-1]['id']
+
+
+def _resolve_milestone_ids(keys, milestone_ids):
+    """
+    Adds the ids of the active milestones named by a set of (namespace, name) keys
+    to the 'milestone_ids' map, leaving out those which do not exist
+    """
+    unresolved = set(key for key in keys if key not in milestone_ids)
+    if not unresolved:
+        return
+    for namespace, name, milestone_id in internal.Milestone.objects.filter(
+            active=True,
+            namespace__in=set(namespace for namespace, __ in unresolved),
+            name__in=set(name for __, name in unresolved),
+    ).order_by('-id').values_list('namespace', 'name', 'id'):
+        if (namespace, name) in unresolved:
+            milestone_ids[(namespace, name)] = milestone_id
+
+
+def _missing_links(model, key_fields, records, milestone_ids):
+    """
+    Builds unsaved link records for those graph records which are not already linked
+    (links are identified by 'key_fields' along with the milestone), and reactivates the
+    course and course content links left inactive by a references removal which the
+    records hold as active
+    Returns the list of links to insert and the list of links reactivated
+    """
+    relationship_types = {}
+    if model is not internal.UserMilestone:
+        relationship_types = storage.get_relationship_types(record['relationship'] for record in records)
+    links = {}
+    for record in records:
+        milestone_id = milestone_ids[(record['namespace'], record['name'])]
+        key = tuple(record[field] for field in key_fields) + (milestone_id,)
+        if key not in links:
+            link = model(milestone_id=milestone_id, active=record.get('active', True))
+            for field in key_fields:
+                setattr(link, field, record[field])
+            if model is internal.UserMilestone:
+                link.source = record.get('source', '')
+            else:
+                link.milestone_relationship_type = relationship_types[record['relationship']]
+            links[key] = link
+    reactivated = []
+    if links:
+        for existing in model.objects.filter(**{  # pylint: disable=star-args
+                '{}__in'.format(key_fields[0]): set(key[0] for key in links),
+                'milestone__in': set(key[-1] for key in links),
+        }):
+            link = links.pop(tuple(getattr(existing, field) for field in key_fields) + (existing.milestone_id,), None)
+            if link is not None and link.active and not existing.active and model is not internal.UserMilestone:
+                existing.active = True
+                existing.milestone_relationship_type_id = link.milestone_relationship_type_id
+                reactivated.append(existing)
+    storage.reactivate_links(model, reactivated)
+    return links.values(), reactivated
+
+
+@storage.changes_gating
+def _import_graph_chunk(records, milestone_ids):
+    """
+    Imports a chunk of milestone graph records, returning the number of rows inserted for each record type
+    """
+    routers.pin_everything()
+    grouped = dict((record_type, []) for record_type in GRAPH_RECORD_TYPES)
+    for record in records:
+        grouped[record['type']].append(record)
+    _resolve_milestone_ids([(record['namespace'], record['name']) for record in records], milestone_ids)
+
+    milestones = {}
+    for record in grouped['milestone']:
+        key = (record['namespace'], record['name'])
+        if key not in milestone_ids and key not in milestones:
+            milestones[key] = internal.Milestone(
+                namespace=record['namespace'],
+                name=record['name'],
+                description=record.get('description', ''),
+            )
+    internal.Milestone.objects.bulk_create(milestones.values())
+    _resolve_milestone_ids(milestones, milestone_ids)
+    storage.invalidate_milestones(
+        [milestone_ids[key] for key in milestones],
+        set(namespace for namespace, __ in milestones),
+    )
+    for record in records:
+        if (record['namespace'], record['name']) not in milestone_ids:
+            exceptions.raise_exception("Milestone", record, exceptions.InvalidMilestoneException)
+
+    course_links, reactivated_course_links = _missing_links(
+        internal.CourseMilestone, ('course_id',), grouped['course_milestone'], milestone_ids
+    )
+    content_links, reactivated_content_links = _missing_links(
+        internal.CourseContentMilestone, ('course_id', 'content_id'), grouped['course_content_milestone'], milestone_ids
+    )
+    user_links = _missing_links(internal.UserMilestone, ('user_id',), grouped['user_milestone'], milestone_ids)[0]
+    storage.copy_milestone_fields(course_links + content_links)
+    internal.CourseMilestone.objects.bulk_create(course_links)
+    internal.CourseContentMilestone.objects.bulk_create(content_links)
+    internal.UserMilestone.objects.bulk_create(user_links)
+    course_links += reactivated_course_links
+    content_links += reactivated_content_links
+    projections.after_bulk_link_changes(course_links, content_links, user_links)
+    return {
+        'milestone': len(milestones),
+        'course_milestone': len(course_links),
+        'course_content_milestone': len(content_links),
+        'user_milestone': len(user_links),
+    }
+
+
+def import_graph_records(records, batch_size=GRAPH_BATCH_SIZE):
+    """
+    Imports milestone graph records (as yielded by iter_graph_records, from any iterable),
+    'batch_size' at a time with bulk inserts, one transaction per batch.  Milestones are matched
+    up by (namespace, name), and records for milestones or links which already exist are skipped,
+    other than course and course content links left inactive by a references removal, which
+    are reactivated.
+    Returns the number of rows inserted (or reactivated) for each record type
+    """
+    inserted = dict((record_type, 0) for record_type in GRAPH_RECORD_TYPES)
+    milestone_ids = {}
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            return inserted
+        for record_type, count in _import_graph_chunk(chunk, milestone_ids).items():
+            inserted[record_type] += count
+
+
+def _clone_links(model, key_fields, course_id, links):
+    """
+    Splits a list of unsaved link records cloned into a course between those the course does
+    not have yet, and its links left inactive by a references removal, which are reactivated
+    in their place (links are identified by 'key_fields')
+    Returns the list of links to insert and the list of links reactivated
+    """
+    existing = dict(
+        (tuple(getattr(link, field) for field in key_fields), link)
+        for link in model.objects.filter(course_id=course_id)
+    )
+    inserts = []
+    reactivated = []
+    for link in links:
+        key = tuple(getattr(link, field) for field in key_fields)
+        target_link = existing.get(key)
+        if target_link is None:
+            existing[key] = link
+            inserts.append(link)
+        elif not target_link.active:
+            target_link.active = True
+            target_link.milestone_relationship_type_id = link.milestone_relationship_type_id
+            reactivated.append(target_link)
+    storage.reactivate_links(model, reactivated)
+    return inserts, reactivated
+
+
+@storage.changes_gating
+def _clone_course_links(source_course_id, target_course_id, map_content_key):
+    """
+    Copies the source course's active links which the target course does not have yet, and
+    reactivates those the target course has left inactive
+    """
+    routers.pin_everything()
+    course_links, reactivated_course_links = _clone_links(
+        internal.CourseMilestone,
+        ('milestone_id',),
+        target_course_id,
+        [
+            internal.CourseMilestone(
+                course_id=target_course_id,
+                milestone_id=link.milestone_id,
+                milestone_relationship_type_id=link.milestone_relationship_type_id,
+            )
+            for link in internal.CourseMilestone.objects.filter(
+                course_id=source_course_id,
+                active=True,
+                milestone__active=True,
+            )
+        ],
+    )
+
+    content_links = []
+    for link in internal.CourseContentMilestone.objects.filter(
+            course_id=source_course_id,
+            active=True,
+            milestone__active=True,
+    ):
+        content_key = map_content_key(UsageKey.from_string(link.content_id))
+        if content_key is not None:
+            content_links.append(internal.CourseContentMilestone(
+                course_id=target_course_id,
+                content_id=unicode(content_key),
+                milestone_id=link.milestone_id,
+                milestone_relationship_type_id=link.milestone_relationship_type_id,
+            ))
+    content_links, reactivated_content_links = _clone_links(
+        internal.CourseContentMilestone, ('content_id', 'milestone_id'), target_course_id, content_links
+    )
+
+    storage.copy_milestone_fields(course_links + content_links)
+    internal.CourseMilestone.objects.bulk_create(course_links)
+    internal.CourseContentMilestone.objects.bulk_create(content_links)
+    course_links += reactivated_course_links
+    content_links += reactivated_content_links
+    projections.after_bulk_link_changes(course_links, content_links)
+    return {
+        'course_milestone': len(course_links),
+        'course_content_milestone': len(content_links),
+    }
+
+
+def clone_course_milestones(source_course_key, target_course_key, map_content_key=None):
+    """
+    Copies the course and course content milestone links of one course to another (eg: a
+    course rerun) in bulk, within a single transaction.  Content keys are passed through
+    map_content_key(usage_key), which returns the target content key or None to leave the
+    link out -- by default they are mapped into the target course.  Only active links to active
+    milestones are copied.  Links the target course already has are left as they are, other
+    than those left inactive by a references removal, which are reactivated.
+    Returns the number of rows created (or reactivated) for each link type
+    """
+    if map_content_key is None:
+        target_key = CourseKey.from_string(unicode(target_course_key))
+        map_content_key = lambda content_key: content_key.map_into_course(target_key)
+    return _clone_course_links(unicode(source_course_key), unicode(target_course_key), map_content_key)
+
+
+def _current_links(model, key_fields, course_id):
+    """
+    Reads a course's link records, keyed by 'key_fields' along with the milestone id
+    """
+    return dict(
+        (tuple(getattr(link, field) for field in key_fields) + (link.milestone_id,), link)
+        for link in model.objects.filter(course_id=course_id)
+    )
+
+
+def _new_link(model, key_fields, course_id, key, relationship_type_id):
+    """
+    Builds an unsaved link record from its key
+    """
+    link = model(course_id=course_id, milestone_id=key[-1], milestone_relationship_type_id=relationship_type_id)
+    for field, value in zip(key_fields, key):
+        setattr(link, field, value)
+    return link
+
+
+def _sync_links(model, key_fields, course_id, desired):
+    """
+    Applies the inserts, updates and deletes taking a course's link records to the desired
+    {key: relationship type id} state, in batches
+    Returns the changed links (updated links in both their previous and new states) and
+    a dict of change counts
+    """
+    current = _current_links(model, key_fields, course_id)
+    inserts = []
+    updates = {}
+    changed = []
+    for key, relationship_type_id in desired.items():
+        link = current.get(key)
+        if link is None:
+            inserts.append(_new_link(model, key_fields, course_id, key, relationship_type_id))
+        elif link.milestone_relationship_type_id != relationship_type_id or not link.active:
+            updates.setdefault(relationship_type_id, []).append(link.id)
+            changed.extend([link, _new_link(model, key_fields, course_id, key, relationship_type_id)])
+    deletes = [link for key, link in current.items() if key not in desired and link.active]
+    changed.extend(inserts + deletes)
+
+    storage.copy_milestone_fields(inserts)
+    model.objects.bulk_create(inserts, batch_size=SYNC_BATCH_SIZE)
+    for relationship_type_id, link_ids in updates.items():
+        for start in range(0, len(link_ids), SYNC_BATCH_SIZE):
+            model.objects.filter(id__in=link_ids[start:start + SYNC_BATCH_SIZE]).update(
+                milestone_relationship_type=relationship_type_id,
+                active=True,
+                modified=timezone.now(),
+            )
+    for start in range(0, len(deletes), SYNC_BATCH_SIZE):
+        internal.MilestoneTombstone.objects.bulk_create(
+            storage.delete_loaded_links(model, deletes[start:start + SYNC_BATCH_SIZE])
+        )
+    return changed, {
+        'created': len(inserts),
+        'updated': sum(len(link_ids) for link_ids in updates.values()),
+        'deleted': len(deletes),
+    }
+
+
+@storage.changes_gating
+def _sync_course_links(course_id, content_state, course_state):
+    """
+    Takes a course's course content (and optionally course) links to the desired state
+    """
+    routers.pin_everything()
+    content_changes, totals = _sync_links(internal.CourseContentMilestone, ('content_id',), course_id, content_state)
+    course_changes = []
+    if course_state is not None:
+        course_changes, counts = _sync_links(internal.CourseMilestone, (), course_id, course_state)
+        totals = dict((action, count + counts[action]) for action, count in totals.items())
+    projections.after_bulk_link_changes(course_changes, content_changes)
+    return totals
+
+
+def sync_course_milestones(course_key, content_links, course_links=None):
+    """
+    Takes the course content milestone links of a course to the desired set of
+    (content_key, relationship, milestone) links -- and its course milestone links to the
+    desired set of (relationship, milestone) links, unless course_links is None -- reading
+    the current links once and applying only the inserts, updates and deletes needed,
+    within a single transaction
+    Returns the number of links 'created', 'updated' and 'deleted'
+    """
+    relationship_types = storage.get_relationship_types(
+        [relationship for __, relationship, __ in content_links] +
+        [relationship for relationship, __ in course_links or []]
+    )
+    content_state = dict(
+        ((unicode(content_key), milestone['id']), relationship_types[relationship].id)
+        for content_key, relationship, milestone in content_links
+    )
+    course_state = None
+    if course_links is not None:
+        course_state = dict(
+            ((milestone['id'],), relationship_types[relationship].id)
+            for relationship, milestone in course_links
+        )
+    return _sync_course_links(unicode(course_key), content_state, course_state)
@@ -0,0 +1,88 @@
+"""
+Management command which moves UserMilestone rows matching the archival policy
+into the ArchivedUserMilestone table a batch at a time, keeping the table (and
+indexes) behind the gating queries small.  Inactive rows and, unless
+--keep-retired-milestones is given, rows linked to inactive milestones are
+always archived; the rows of inactive users are archived when their ids are
+listed, one per line, in the --users file.  Rows archived only because their
+milestone was retired are restored when the milestone is reactivated.
+
+    $ ./manage.py archive_user_milestones [--users=<file>] [--keep-retired-milestones] [--batch-size=1000] [--sleep=1]
+"""
+from itertools import islice
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from milestones import archive
+
+
+def _archive_in_batches(user_ids, options):
+    """
+    Archives batches of rows (including those of the specified users) until a short batch comes back
+    """
+    archived = 0
+    count = options['batch_size']
+    while count == options['batch_size']:
+        if archived:
+            time.sleep(options['sleep'])
+        count = archive.archive_user_milestones(user_ids, options['retired_milestones'], options['batch_size'])
+        archived += count
+    return archived
+
+
+class Command(BaseCommand):
+    """
+    Archives the UserMilestone rows no longer in use
+    """
+    help = 'Moves inactive, retired milestone and inactive user (from a file) UserMilestone rows to the archive'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--users',
+            default=None,
+            help='File holding the ids of the inactive users to archive, one per line'
+        ),
+        make_option(
+            '--keep-retired-milestones',
+            action='store_false',
+            dest='retired_milestones',
+            default=True,
+            help='Leave the rows linked to inactive milestones in place'
+        ),
+        make_option(
+            '--sleep',
+            default=1,
+            type='float',
+            help='Seconds to pause between batches, to leave room for the gating traffic'
+        ),
+        make_option(
+            '--batch-size',
+            type='int',
+            default=archive.ARCHIVE_BATCH_SIZE,
+            help='Number of rows moved per batch'
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if args:
+            raise CommandError('No arguments are accepted, list user ids with --users')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['sleep'] < 0:
+            raise CommandError('--sleep must not be negative')
+
+        archived = 0
+        if options['users'] is None:
+            archived = _archive_in_batches((), options)
+        else:
+            with open(options['users']) as users_file:
+                user_ids = (int(line) for line in users_file if line.strip())
+                try:
+                    chunk = list(islice(user_ids, options['batch_size']))
+                    while chunk:
+                        archived += _archive_in_batches(chunk, options)
+                        chunk = list(islice(user_ids, options['batch_size']))
+                except ValueError:
+                    raise CommandError('User ids must be integers')
+        self.stdout.write('Archived {} user milestones\n'.format(archived))
@@ -0,0 +1,34 @@
+"""
+Management command which copies each milestone's namespace, name, description
+and active flag onto its CourseMilestone and CourseContentMilestone links --
+run it once to fill in the links created before the copies were maintained,
+and to repair the copies should they drift.
+
+    $ ./manage.py backfill_milestone_link_fields [--batch-size=500]
+"""
+from optparse import make_option
+
+from django.core.management.base import CommandError, NoArgsCommand
+
+from milestones import storage
+
+
+class Command(NoArgsCommand):
+    """
+    Copies the milestone fields onto the course and course content links
+    """
+    help = 'Copies the milestone display fields onto their course and course content links'
+    option_list = NoArgsCommand.option_list + (
+        make_option(
+            '--batch-size',
+            type='int',
+            default=storage.BACKFILL_BATCH_SIZE,
+            help='Number of milestones read per batch'
+        ),
+    )
+
+    def handle_noargs(self, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        backfilled = storage.backfill_link_milestone_fields(options['batch_size'])
+        self.stdout.write('Backfilled the links of {} milestones\n'.format(backfilled))
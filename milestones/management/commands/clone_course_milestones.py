@@ -0,0 +1,31 @@
+"""
+Management command which copies a course's milestone configuration (its course
+and course content milestone links) to another course, eg: after a rerun.
+Content keys are mapped into the target course, and the copy is made in bulk
+within a single transaction.
+
+    $ ./manage.py clone_course_milestones <source_course_id> <target_course_id>
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from milestones import api
+from milestones import exceptions
+
+
+class Command(BaseCommand):
+    """
+    Clones a course's milestone configuration
+    """
+    args = '<source_course_id> <target_course_id>'
+    help = "Copies a course's course and course content milestone links to another course"
+
+    def handle(self, *args, **options):
+        if len(args) != 2:
+            raise CommandError('A source and a target course id are required')
+        try:
+            cloned = api.clone_course_milestones(args[0], args[1])
+        except exceptions.InvalidCourseKeyException as exception:
+            raise CommandError(unicode(exception))
+        self.stdout.write('Cloned {} course milestones and {} course content milestones to {}\n'.format(
+            cloned['course_milestone'], cloned['course_content_milestone'], args[1]
+        ))
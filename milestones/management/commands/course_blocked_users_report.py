@@ -0,0 +1,73 @@
+"""
+Management command which reports the learners still locked out of a course,
+and the required milestones each of them is missing, as CSV.  User ids are
+read one per line from a file, or from stdin when no file is given, and are
+checked a chunk at a time so any size of roster can be streamed through.
+
+    $ ./manage.py course_blocked_users_report <course_id> [--users=<file>] [--chunk-size=500] > blocked.csv
+"""
+import csv
+from optparse import make_option
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from milestones import api
+from milestones import data
+from milestones import validators
+
+
+def _read_user_ids(lines):
+    """
+    Parses one user id per line, skipping blank lines
+    """
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield int(line)
+        except ValueError:
+            raise CommandError('Invalid user id on line {}: {}'.format(line_number, line))
+
+
+class Command(BaseCommand):
+    """
+    Streams the blocked learner report for a course
+    """
+    args = '<course_id>'
+    help = 'Writes a CSV of the users (read from a file or stdin) missing required milestones for a course'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--chunk-size',
+            type='int',
+            default=data.BLOCKED_USERS_CHUNK_SIZE,
+            help='Number of users checked per query'
+        ),
+        make_option(
+            '--users',
+            default=None,
+            help='File holding one user id per line (defaults to stdin)'
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('A single course id is required')
+        if not validators.course_key_is_valid(args[0]):
+            raise CommandError('Invalid course id: {}'.format(args[0]))
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        users_file = sys.stdin if options['users'] is None else open(options['users'])
+        try:
+            writer = csv.writer(self.stdout)
+            writer.writerow(['user_id', 'missing_milestone_ids'])
+            for user_id, milestone_ids in api.get_course_blocked_users(
+                    args[0],
+                    _read_user_ids(users_file),
+                    options['chunk_size']
+            ):
+                writer.writerow([user_id, ' '.join(str(milestone_id) for milestone_id in milestone_ids)])
+        finally:
+            if users_file is not sys.stdin:
+                users_file.close()
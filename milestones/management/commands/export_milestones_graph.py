@@ -0,0 +1,43 @@
+"""
+Management command which streams the milestones, the course and course content
+links to them and, optionally, the user awards as JSON lines, for loading into
+another environment with import_milestones_graph.
+
+    $ ./manage.py export_milestones_graph [--include-users] [--batch-size=500] > graph.jsonl
+"""
+import json
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from milestones import api
+from milestones import graph
+
+
+class Command(BaseCommand):
+    """
+    Exports the milestone graph
+    """
+    help = 'Writes the milestones, their course/content links and optionally user awards as JSON lines'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--include-users',
+            action='store_true',
+            default=False,
+            help='Also export the milestones collected by each user'
+        ),
+        make_option(
+            '--batch-size',
+            type='int',
+            default=graph.GRAPH_BATCH_SIZE,
+            help='Number of rows read per query'
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if args:
+            raise CommandError('No arguments are accepted')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        for record in api.export_milestone_graph(options['include_users'], options['batch_size']):
+            self.stdout.write(json.dumps(record, sort_keys=True) + '\n')
@@ -0,0 +1,65 @@
+"""
+Management command which loads a milestone graph written by
+export_milestones_graph (JSON lines, from a file or stdin), creating the
+milestones and links which do not already exist.  Milestones are matched up
+by namespace and name, and records are inserted in bulk a batch at a time.
+Existing records are skipped, so an interrupted import can simply be rerun.
+
+    $ ./manage.py import_milestones_graph [graph.jsonl] [--batch-size=500]
+"""
+import json
+from optparse import make_option
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from milestones import api
+from milestones import exceptions
+from milestones import graph
+
+
+def _read_records(lines):
+    """
+    Parses one JSON record per line, skipping blank lines
+    """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise CommandError('Invalid JSON on line {}'.format(line_number))
+
+
+class Command(BaseCommand):
+    """
+    Imports a milestone graph
+    """
+    args = '<file>'
+    help = 'Loads milestones, course/content links and user awards from JSON lines (a file, or stdin)'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--batch-size',
+            type='int',
+            default=graph.GRAPH_BATCH_SIZE,
+            help='Number of records inserted per batch'
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) > 1:
+            raise CommandError('At most one file may be given')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        graph_file = open(args[0]) if args else sys.stdin
+        try:
+            inserted = api.import_milestone_graph(_read_records(graph_file), options['batch_size'])
+        except (exceptions.InvalidGraphRecordException, exceptions.InvalidMilestoneException) as exception:
+            raise CommandError(unicode(exception))
+        finally:
+            if graph_file is not sys.stdin:
+                graph_file.close()
+        self.stdout.write('Inserted {}\n'.format(', '.join(
+            '{} {} records'.format(inserted[record_type], record_type) for record_type in graph.GRAPH_RECORD_TYPES
+        )))
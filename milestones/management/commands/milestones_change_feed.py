@@ -0,0 +1,51 @@
+"""
+Management command which streams the user, course and course content milestone
+inserts, updates and deletes made since a cursor, one JSON object per line.  The
+last line holds the cursor to resume from on the next run.
+
+    $ ./manage.py milestones_change_feed [--cursor=<cursor>] [--page-size=1000]
+"""
+import json
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from milestones import changefeed
+from milestones import exceptions
+
+
+class Command(BaseCommand):
+    """
+    Streams the milestones change feed
+    """
+    help = 'Streams the milestone link changes made since a cursor as JSON lines'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--cursor',
+            default=None,
+            help='Cursor returned by a previous run (defaults to the beginning of the feed)'
+        ),
+        make_option(
+            '--page-size',
+            type='int',
+            default=1000,
+            help='Number of changes read per page'
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if options['page_size'] < 1:
+            raise CommandError('--page-size must be positive')
+        cursor = options['cursor']
+        while True:
+            try:
+                page = changefeed.fetch_changes(cursor, options['page_size'])
+            except exceptions.InvalidChangeCursorException as exception:
+                raise CommandError(unicode(exception))
+            for change in page['changes']:
+                change['modified'] = change['modified'].isoformat()
+                self.stdout.write(json.dumps(change, sort_keys=True) + '\n')
+            cursor = page['cursor']
+            if len(page['changes']) < options['page_size']:
+                break
+        self.stdout.write(json.dumps({'cursor': cursor}) + '\n')
@@ -0,0 +1,76 @@
+"""
+Management command which replaces the UserMilestone table with one hash
+partitioned by user id (PostgreSQL 11 or later, see milestones.partitioning),
+or with --reverse goes back to the single table.  The statements run in one
+transaction, blocking UserMilestone writes while the rows are copied; print
+them with --sql instead to review them or run them by hand.  The statements
+are untested against PostgreSQL, so try them on a copy of the database first.
+
+    $ ./manage.py partition_user_milestones [--partitions=16] [--reverse] [--sql]
+"""
+from optparse import make_option
+
+from django.core.management.base import CommandError, NoArgsCommand
+from django.db import connections, transaction
+
+from milestones import partitioning
+from milestones import routers
+
+
+class Command(NoArgsCommand):
+    """
+    Partitions the UserMilestone table by user id
+    """
+    help = (
+        'Splits the UserMilestone table into partitions by a hash of the user id (or merges it back). '
+        'The SQL is untested against PostgreSQL: review it with --sql and try it on a copy of the database first'
+    )
+    option_list = NoArgsCommand.option_list + (
+        make_option(
+            '--partitions',
+            type='int',
+            default=partitioning.DEFAULT_PARTITIONS,
+            help='Number of partitions to split the table into'
+        ),
+        make_option(
+            '--reverse',
+            action='store_true',
+            default=False,
+            help='Copy the rows back into the original, single table'
+        ),
+        make_option(
+            '--sql',
+            action='store_true',
+            default=False,
+            help='Print the statements rather than running them'
+        ),
+    )
+
+    def handle_noargs(self, **options):
+        if options['partitions'] < 2:
+            raise CommandError('--partitions must be at least 2')
+        if options['reverse']:
+            statements = partitioning.unpartition_statements()
+        else:
+            statements = partitioning.partition_statements(options['partitions'])
+        if options['sql']:
+            self.stdout.write(''.join('{};\n'.format(statement) for statement in statements))
+            return
+
+        using = routers.write_database()
+        connection = connections[using]
+        if not partitioning.is_supported(connection):
+            raise CommandError('Partitioning requires PostgreSQL 11 or later, print the statements with --sql')
+        if partitioning.is_partitioned(connection) != options['reverse']:
+            raise CommandError('The UserMilestone table is {} partitioned'.format(
+                'not' if options['reverse'] else 'already'
+            ))
+        with transaction.commit_on_success(using=using):
+            cursor = connection.cursor()
+            for statement in statements:
+                cursor.execute(statement)
+            transaction.set_dirty(using=using)
+        if options['reverse']:
+            self.stdout.write('Merged the UserMilestone partitions back into a single table\n')
+        else:
+            self.stdout.write('Split the UserMilestone table into {} partitions\n'.format(options['partitions']))
@@ -0,0 +1,75 @@
+"""
+Management command which physically removes the course and course content
+links deactivated by remove_course_references/remove_content_references.  Rows
+are deleted a batch at a time, pausing between batches so the purge does not
+starve the user-facing traffic.  With --tombstone-days, change feed tombstones
+older than that are then dropped in the same way.
+
+    $ ./manage.py purge_inactive_milestone_links [--batch-size=1000] [--sleep=0.5] [--tombstone-days=30]
+"""
+import datetime
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from milestones import storage
+
+
+def _purge_in_batches(purge, batch_size, pause):
+    """
+    Calls purge(batch_size) until a short batch comes back, returning the number of rows removed
+    """
+    purged = 0
+    while True:
+        count = purge(batch_size)
+        purged += count
+        if count < batch_size:
+            return purged
+        time.sleep(pause)
+
+
+class Command(BaseCommand):
+    """
+    Purges the inactive milestone links
+    """
+    help = 'Deletes the course and course content milestone links left inactive by reference removals'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--batch-size',
+            type='int',
+            default=storage.PURGE_BATCH_SIZE,
+            help='Number of rows deleted per batch'
+        ),
+        make_option(
+            '--sleep',
+            type='float',
+            default=0.5,
+            help='Seconds to wait between batches'
+        ),
+        make_option(
+            '--tombstone-days',
+            type='int',
+            default=None,
+            help='Also delete change feed tombstones older than this many days'
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['sleep'] < 0:
+            raise CommandError('--sleep must not be negative')
+        if options['tombstone_days'] is not None and options['tombstone_days'] < 0:
+            raise CommandError('--tombstone-days must not be negative')
+        purged = _purge_in_batches(storage.purge_inactive_links, options['batch_size'], options['sleep'])
+        self.stdout.write('Purged {} inactive milestone links\n'.format(purged))
+        if options['tombstone_days'] is not None:
+            before = timezone.now() - datetime.timedelta(days=options['tombstone_days'])
+            purged = _purge_in_batches(
+                lambda batch_size: storage.purge_tombstones(before, batch_size),
+                options['batch_size'],
+                options['sleep'],
+            )
+            self.stdout.write('Purged {} change feed tombstones\n'.format(purged))
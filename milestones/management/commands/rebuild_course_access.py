@@ -0,0 +1,37 @@
+"""
+Management command which recomputes the UserCourseAccess projection for all
+courses, or the courses provided, repairing any drift from its incremental
+maintenance.
+
+    $ ./manage.py rebuild_course_access [course_id ...] [--batch-size=1000]
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from milestones import projections
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the UserCourseAccess projection
+    """
+    args = '<course_id course_id ...>'
+    help = 'Recomputes the per-user course access projection for all courses, or the courses provided'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--batch-size',
+            type='int',
+            default=1000,
+            help='Number of projection rows checked per query'
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        checked, repaired = projections.rebuild_course_access(
+            course_keys=list(args) or None,
+            batch_size=options['batch_size']
+        )
+        self.stdout.write('Checked {} course access rows, repaired {}\n'.format(checked, repaired))
@@ -0,0 +1,21 @@
+"""
+Management command which recomputes the CoursePrerequisite closure index from
+the active course-milestone links -- run it once after enabling
+MILESTONES_PREREQUISITE_INDEX, and to repair the index should it drift.
+
+    $ ./manage.py rebuild_prerequisite_index
+"""
+from django.core.management.base import NoArgsCommand
+
+from milestones import projections
+
+
+class Command(NoArgsCommand):
+    """
+    Recomputes the CoursePrerequisite closure index
+    """
+    help = 'Recomputes the transitive course prerequisite index'
+
+    def handle_noargs(self, **options):
+        rows = projections.rebuild_prerequisite_index()
+        self.stdout.write('Indexed {} course prerequisites\n'.format(rows))
@@ -0,0 +1,26 @@
+"""
+Management command which recomputes the holder counts of all milestones, or
+the milestones provided, from the UserMilestone rows and corrects any drift in
+the maintained MilestoneHolderCount counters.
+
+    $ ./manage.py reconcile_milestone_holder_counts [milestone_id ...]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from milestones import projections
+
+
+class Command(BaseCommand):
+    """
+    Reconciles the MilestoneHolderCount counters
+    """
+    args = '<milestone_id milestone_id ...>'
+    help = 'Recomputes the holder counts of all milestones, or the milestones provided'
+
+    def handle(self, *args, **options):
+        try:
+            milestone_ids = [int(milestone_id) for milestone_id in args]
+        except ValueError:
+            raise CommandError('Milestone ids must be integers')
+        checked, repaired = projections.reconcile_holder_counts(milestone_ids or None)
+        self.stdout.write('Reconciled {} milestone holder counts, {} had drifted\n'.format(checked, repaired))
@@ -0,0 +1,55 @@
+"""
+Management command which relays the cache invalidation records written by
+gating writes (see milestones.outbox) to the invalidation handlers.  Runs
+until the outbox is drained, or keeps polling it with --follow.
+
+    $ ./manage.py relay_milestones_invalidations [--batch-size=100] [--follow] [--interval=1]
+"""
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from milestones import outbox
+
+
+class Command(BaseCommand):
+    """
+    Relays the cache invalidation outbox
+    """
+    help = 'Publishes pending Milestones cache invalidation records to the invalidation handlers'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--follow',
+            action='store_true',
+            default=False,
+            help='Keep polling the outbox once it has been drained'
+        ),
+        make_option(
+            '--interval',
+            type='float',
+            default=1,
+            help='Seconds to wait between polls of a drained outbox (with --follow)'
+        ),
+        make_option(
+            '--batch-size',
+            type='int',
+            default=100,
+            help='Number of records relayed per round trip'
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if options['interval'] < 0:
+            raise CommandError('--interval must not be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        relayed = 0
+        while True:
+            count = outbox.relay(options['batch_size'])
+            relayed += count
+            if count < options['batch_size']:
+                if not options['follow']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write('Relayed {} invalidation records\n'.format(relayed))
@@ -0,0 +1,86 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+archive_user_milestones Management Command Test Cases
+"""
+import os
+from tempfile import mkstemp
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+import milestones.api as api
+from milestones.management.commands.archive_user_milestones import Command
+from milestones.models import ArchivedUserMilestone, Milestone, UserMilestone
+import milestones.tests.utils as utils
+
+
+class ArchiveUserMilestonesTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the archive_user_milestones management command
+    """
+    def setUp(self):
+        """
+        Test case scaffolding
+        """
+        super(ArchiveUserMilestonesTestCase, self).setUp()
+        self.milestones = [
+            api.add_milestone({
+                'name': 'Archived Milestone {}'.format(index),
+                'namespace': 'archived.milestones',
+                'description': 'Archived Milestone Description',
+            })
+            for index in range(2)
+        ]
+        for user_id in range(1, 5):
+            for milestone in self.milestones:
+                api.add_user_milestone({'id': user_id}, milestone)
+        handle, self.users_path = mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        """
+        Remove the user id file
+        """
+        os.remove(self.users_path)
+        super(ArchiveUserMilestonesTestCase, self).tearDown()
+
+    def _write_users(self, *lines):
+        """
+        Fills the user id file
+        """
+        with open(self.users_path, 'w') as users_file:
+            users_file.write('\n'.join(lines))
+
+    def test_listed_users_are_archived(self):
+        """ Unit Test: test_listed_users_are_archived """
+        self._write_users('1', '', '3')
+        call_command('archive_user_milestones', users=self.users_path, batch_size=1, sleep=0)
+        self.assertEqual(sorted(set(UserMilestone.objects.values_list('user_id', flat=True))), [2, 4])
+        self.assertEqual(sorted(set(ArchivedUserMilestone.objects.values_list('user_id', flat=True))), [1, 3])
+
+    def test_retired_milestones_are_archived(self):
+        """ Unit Test: test_retired_milestones_are_archived """
+        Milestone.objects.filter(id=self.milestones[0]['id']).update(active=False)
+        call_command('archive_user_milestones', retired_milestones=False, sleep=0)
+        self.assertFalse(ArchivedUserMilestone.objects.exists())
+        call_command('archive_user_milestones', sleep=0)
+        self.assertEqual(
+            set(UserMilestone.objects.values_list('milestone', flat=True)),
+            set([self.milestones[1]['id']])
+        )
+        self.assertEqual(ArchivedUserMilestone.objects.count(), 4)
+
+    def test_invalid_options(self):
+        """ Unit Test: test_invalid_options """
+        options = {'users': None, 'retired_milestones': True, 'batch_size': 10, 'sleep': 0}
+        with self.assertRaises(CommandError):
+            Command().handle('1', **options)  # pylint: disable=star-args
+        with self.assertRaises(CommandError):
+            Command().handle(**dict(options, batch_size=0))  # pylint: disable=star-args
+        with self.assertRaises(CommandError):
+            Command().handle(**dict(options, sleep=-1))  # pylint: disable=star-args
+        self._write_users('first')
+        with self.assertRaises(CommandError):
+            Command().handle(**dict(options, users=self.users_path))  # pylint: disable=star-args
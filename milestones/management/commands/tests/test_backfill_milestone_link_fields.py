@@ -0,0 +1,55 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+backfill_milestone_link_fields Management Command Test Cases
+"""
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+
+import milestones.api as api
+from milestones.management.commands.backfill_milestone_link_fields import Command
+from milestones.models import CourseContentMilestone, CourseMilestone, Milestone
+import milestones.tests.utils as utils
+
+
+class BackfillMilestoneLinkFieldsTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the backfill_milestone_link_fields management command
+    """
+
+    def test_existing_links_are_backfilled(self):
+        """ Unit Test: test_existing_links_are_backfilled """
+        milestones = []
+        for index in range(3):
+            milestone = api.add_milestone({
+                'name': 'Backfilled Milestone {}'.format(index),
+                'namespace': 'backfilled.milestones',
+                'description': 'Backfilled Milestone Description',
+            })
+            api.add_course_milestone(self.test_course_key, 'requires', milestone)
+            api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', milestone)
+            milestones.append(milestone)
+        # Links created before the copies were maintained
+        for model in (CourseMilestone, CourseContentMilestone):
+            model.objects.update(milestone_namespace='', milestone_name='', milestone_description='')
+        Milestone.objects.filter(id=milestones[1]['id']).update(active=False)
+
+        # One UPDATE per link table and batch of milestones
+        with self.assertNumQueries(6):
+            call_command('backfill_milestone_link_fields', batch_size=2)
+        for model in (CourseMilestone, CourseContentMilestone):
+            self.assertEqual(
+                sorted(model.objects.values_list('milestone_name', 'milestone_namespace', 'milestone_active')),
+                [(milestone['name'], milestone['namespace'], index != 1) for index, milestone in enumerate(milestones)]
+            )
+        with override_settings(MILESTONES_DENORMALIZED_LINKS=True):
+            self.assertEqual(api.get_course_milestones(self.test_course_key)[0]['name'], 'Backfilled Milestone 0')
+
+    def test_invalid_options(self):
+        """ Unit Test: test_invalid_options """
+        with self.assertRaises(CommandError):
+            Command().handle('1', batch_size=10)
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=0)
@@ -0,0 +1,44 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+clone_course_milestones Management Command Test Cases
+"""
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from opaque_keys.edx.keys import CourseKey
+
+import milestones.api as api
+from milestones.management.commands.clone_course_milestones import Command
+import milestones.tests.utils as utils
+
+
+class CloneCourseMilestonesTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the clone_course_milestones management command
+    """
+    def test_course_is_cloned(self):
+        """ Unit Test: test_course_is_cloned """
+        milestone = api.add_milestone({
+            'name': 'Cloned Milestone',
+            'namespace': 'cloned.milestones',
+            'description': 'Cloned Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'fulfills', milestone)
+        rerun_key = CourseKey.from_string('the/course/rerun')
+        out = StringIO()
+        call_command('clone_course_milestones', unicode(self.test_course_key), unicode(rerun_key), stdout=out)
+        self.assertEqual(
+            out.getvalue(),
+            'Cloned 1 course milestones and 1 course content milestones to the/course/rerun\n'
+        )
+        self.assertEqual(len(api.get_course_milestones(rerun_key, 'requires')), 1)
+
+    def test_invalid_arguments(self):
+        """ Unit Test: test_invalid_arguments """
+        with self.assertRaises(CommandError):
+            Command().handle(unicode(self.test_course_key))
+        with self.assertRaises(CommandError):
+            Command().handle(unicode(self.test_course_key), 'not a course key')
@@ -0,0 +1,84 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+course_blocked_users_report Management Command Test Cases
+"""
+import os
+from StringIO import StringIO
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import mock
+
+import milestones.api as api
+from milestones.management.commands.course_blocked_users_report import Command
+import milestones.tests.utils as utils
+
+
+class CourseBlockedUsersReportTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the course_blocked_users_report management command
+    """
+    def setUp(self):
+        """
+        Test case scaffolding
+        """
+        super(CourseBlockedUsersReportTestCase, self).setUp()
+        self.milestones = [
+            api.add_milestone({
+                'name': 'Report Milestone {}'.format(index),
+                'namespace': 'report.milestones',
+                'description': 'Report Milestone Description',
+            })
+            for index in range(2)
+        ]
+        api.add_course_milestone(self.test_course_key, 'requires', self.milestones[0])
+        api.add_course_milestone(self.test_course_key, 'requires', self.milestones[1])
+        api.add_user_milestone({'id': 2}, self.milestones[0])
+        api.add_user_milestone({'id': 3}, self.milestones[0])
+        api.add_user_milestone({'id': 3}, self.milestones[1])
+
+    def _expected(self):
+        """
+        The report for users 1 to 3
+        """
+        return [
+            'user_id,missing_milestone_ids',
+            '1,{} {}'.format(self.milestones[0]['id'], self.milestones[1]['id']),
+            '2,{}'.format(self.milestones[1]['id']),
+        ]
+
+    def test_users_read_from_file(self):
+        """ Unit Test: test_users_read_from_file """
+        handle, path = tempfile.mkstemp()
+        os.write(handle, '1\n2\n\n3\n')
+        os.close(handle)
+        try:
+            out = StringIO()
+            call_command('course_blocked_users_report', unicode(self.test_course_key), users=path, chunk_size=2,
+                         stdout=out)
+        finally:
+            os.remove(path)
+        self.assertEqual(out.getvalue().splitlines(), self._expected())
+
+    def test_users_read_from_stdin(self):
+        """ Unit Test: test_users_read_from_stdin """
+        out = StringIO()
+        with mock.patch('sys.stdin', StringIO('1\n2\n3\n')):
+            call_command('course_blocked_users_report', unicode(self.test_course_key), stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), self._expected())
+
+    def test_invalid_arguments(self):
+        """ Unit Test: test_invalid_arguments """
+        with self.assertRaises(CommandError):
+            Command().handle()
+        with self.assertRaises(CommandError):
+            Command().handle('not a course key')
+        with self.assertRaises(CommandError):
+            Command().handle(unicode(self.test_course_key), chunk_size=0, users=None)
+        command = Command()
+        command.stdout = StringIO()
+        with mock.patch('sys.stdin', StringIO('1\nfirst\n')):
+            with self.assertRaises(CommandError):
+                command.handle(unicode(self.test_course_key), chunk_size=10, users=None)
@@ -0,0 +1,84 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+export_milestones_graph Management Command Test Cases
+"""
+import json
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+import milestones.api as api
+from milestones.management.commands.export_milestones_graph import Command
+import milestones.tests.utils as utils
+
+
+class ExportMilestonesGraphTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the export_milestones_graph management command
+    """
+    def setUp(self):
+        """
+        Test case scaffolding
+        """
+        super(ExportMilestonesGraphTestCase, self).setUp()
+        self.milestone = api.add_milestone({
+            'name': 'Exported Milestone',
+            'namespace': 'exported.milestones',
+            'description': 'Exported Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', self.milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'fulfills', self.milestone)
+        api.add_user_milestone(self.serialized_test_user, self.milestone)
+
+    @staticmethod
+    def _export(**options):
+        """
+        Runs the command, returning the records it wrote
+        """
+        out = StringIO()
+        call_command('export_milestones_graph', stdout=out, **options)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_graph_is_exported(self):
+        """ Unit Test: test_graph_is_exported """
+        records = self._export(batch_size=1)
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['milestone', 'course_milestone', 'course_content_milestone']
+        )
+        self.assertEqual(records[0], {
+            'type': 'milestone',
+            'namespace': 'exported.milestones',
+            'name': 'Exported Milestone',
+            'description': 'Exported Milestone Description',
+        })
+        self.assertEqual(records[2], {
+            'type': 'course_content_milestone',
+            'course_id': unicode(self.test_course_key),
+            'content_id': unicode(self.test_content_key),
+            'namespace': 'exported.milestones',
+            'name': 'Exported Milestone',
+            'relationship': 'fulfills',
+            'active': True,
+        })
+
+    def test_users_are_exported_on_request(self):
+        """ Unit Test: test_users_are_exported_on_request """
+        records = self._export(include_users=True)
+        self.assertEqual(records[-1], {
+            'type': 'user_milestone',
+            'user_id': self.serialized_test_user['id'],
+            'namespace': 'exported.milestones',
+            'name': 'Exported Milestone',
+            'source': '',
+            'active': True,
+        })
+
+    def test_invalid_arguments(self):
+        """ Unit Test: test_invalid_arguments """
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=0, include_users=False)
+        with self.assertRaises(CommandError):
+            Command().handle('graph.jsonl', batch_size=1, include_users=False)
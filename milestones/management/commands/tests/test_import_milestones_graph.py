@@ -0,0 +1,97 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+import_milestones_graph Management Command Test Cases
+"""
+import json
+import os
+from StringIO import StringIO
+from tempfile import mkstemp
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from mock import patch
+
+import milestones.api as api
+from milestones.management.commands.import_milestones_graph import Command
+from milestones.models import CourseContentMilestone, CourseMilestone, Milestone, UserMilestone
+import milestones.tests.utils as utils
+
+
+class ImportMilestonesGraphTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the import_milestones_graph management command
+    """
+    def setUp(self):
+        """
+        Test case scaffolding
+        """
+        super(ImportMilestonesGraphTestCase, self).setUp()
+        self.records = [
+            {
+                'type': 'milestone',
+                'namespace': 'imported.milestones',
+                'name': 'Imported Milestone',
+                'description': 'Imported Milestone Description',
+            },
+            {
+                'type': 'course_milestone',
+                'course_id': unicode(self.test_course_key),
+                'namespace': 'imported.milestones',
+                'name': 'Imported Milestone',
+                'relationship': 'requires',
+                'active': True,
+            },
+            {
+                'type': 'user_milestone',
+                'user_id': self.serialized_test_user['id'],
+                'namespace': 'imported.milestones',
+                'name': 'Imported Milestone',
+            },
+        ]
+
+    def _lines(self):
+        """
+        The test records as JSON lines
+        """
+        return ''.join(json.dumps(record) + '\n' for record in self.records)
+
+    def test_graph_is_imported_from_file(self):
+        """ Unit Test: test_graph_is_imported_from_file """
+        handle, path = mkstemp()
+        os.write(handle, self._lines())
+        os.close(handle)
+        try:
+            out = StringIO()
+            call_command('import_milestones_graph', path, batch_size=2, stdout=out)
+            call_command('import_milestones_graph', path, stdout=out)
+        finally:
+            os.remove(path)
+        self.assertEqual(out.getvalue().splitlines(), [
+            'Inserted 1 milestone records, 1 course_milestone records, 0 course_content_milestone records, '
+            '1 user_milestone records',
+            'Inserted 0 milestone records, 0 course_milestone records, 0 course_content_milestone records, '
+            '0 user_milestone records',
+        ])
+        milestone = Milestone.objects.get(namespace='imported.milestones')
+        self.assertTrue(CourseMilestone.objects.filter(milestone=milestone).exists())
+        self.assertTrue(UserMilestone.objects.filter(milestone=milestone).exists())
+
+    def test_graph_is_imported_from_stdin(self):
+        """ Unit Test: test_graph_is_imported_from_stdin """
+        with patch('sys.stdin', StringIO('\n' + self._lines())):
+            call_command('import_milestones_graph', stdout=StringIO())
+        self.assertEqual(len(api.get_course_required_milestones(self.test_course_key, {'id': 5})), 1)
+        self.assertFalse(CourseContentMilestone.objects.exists())
+
+    def test_invalid_input(self):
+        """ Unit Test: test_invalid_input """
+        with self.assertRaises(CommandError):
+            Command().handle('first', 'second', batch_size=1)
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=0)
+        for lines in ('{"type":', json.dumps({'type': 'badge'}), json.dumps(self.records[1])):
+            with patch('sys.stdin', StringIO(lines)):
+                with self.assertRaises(CommandError):
+                    Command().handle(batch_size=10)
@@ -0,0 +1,62 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+milestones_change_feed Management Command Test Cases
+"""
+import json
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+
+import milestones.api as api
+from milestones.management.commands.milestones_change_feed import Command
+import milestones.tests.utils as utils
+
+
+@override_settings(MILESTONES_CHANGE_FEED_LAG=0)
+class MilestonesChangeFeedTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the milestones_change_feed management command
+    """
+    def setUp(self):
+        """
+        Test case scaffolding
+        """
+        super(MilestonesChangeFeedTestCase, self).setUp()
+        self.milestone = api.add_milestone({
+            'name': 'Feed Milestone',
+            'namespace': 'feed.milestones',
+            'description': 'Feed Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', self.milestone)
+        api.add_user_milestone(self.serialized_test_user, self.milestone)
+
+    @staticmethod
+    def _run(**options):
+        """
+        Runs the command, returning the changes and the final cursor it printed
+        """
+        out = StringIO()
+        call_command('milestones_change_feed', stdout=out, **options)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        return lines[:-1], lines[-1]['cursor']
+
+    def test_changes_are_streamed_across_pages(self):
+        """ Unit Test: test_changes_are_streamed_across_pages """
+        changes, cursor = self._run(page_size=1)
+        self.assertEqual([change['entity'] for change in changes], ['course_milestone', 'user_milestone'])
+
+        api.remove_user_milestone(self.serialized_test_user, self.milestone)
+        changes, next_cursor = self._run(cursor=cursor)
+        self.assertEqual([(change['entity'], change['action']) for change in changes], [('user_milestone', 'delete')])
+        self.assertNotEqual(next_cursor, cursor)
+        self.assertEqual(self._run(cursor=next_cursor), ([], next_cursor))
+
+    def test_invalid_options(self):
+        """ Unit Test: test_invalid_options """
+        with self.assertRaises(CommandError):
+            Command().handle(cursor='garbage', page_size=10)
+        with self.assertRaises(CommandError):
+            Command().handle(cursor=None, page_size=0)
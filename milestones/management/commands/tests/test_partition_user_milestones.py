@@ -0,0 +1,64 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+partition_user_milestones Management Command Test Cases
+"""
+from StringIO import StringIO
+
+from django.core.management.base import CommandError
+
+from milestones.management.commands.partition_user_milestones import Command
+import milestones.tests.utils as utils
+
+
+class PartitionUserMilestonesTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the partition_user_milestones management command
+    """
+    options = {'partitions': 4, 'reverse': False, 'sql': True}
+
+    def _statements(self, **options):
+        """
+        Runs the command, returning the statements it prints
+        """
+        command = Command()
+        command.stdout = StringIO()
+        command.handle(**dict(self.options, **options))  # pylint: disable=star-args
+        return command.stdout.getvalue().splitlines()
+
+    def test_partition_statements(self):
+        """ Unit Test: test_partition_statements """
+        statements = self._statements()
+        partitions = [statement for statement in statements if 'PARTITION OF' in statement]
+        self.assertEqual(len(partitions), 4)
+        self.assertIn('FOR VALUES WITH (MODULUS 4, REMAINDER 3)', partitions[-1])
+        self.assertIn('PARTITION BY HASH (user_id)', statements[1])
+        # The partitioned table keeps the change feed's (modified, id) index
+        self.assertIn(
+            'CREATE INDEX milestones_usermilestone_partitioned_modified_id '
+            'ON milestones_usermilestone_partitioned (modified, id);',
+            statements
+        )
+        self.assertEqual(
+            statements[-2],
+            'ALTER TABLE milestones_usermilestone_partitioned RENAME TO milestones_usermilestone;'
+        )
+
+    def test_reverse_statements(self):
+        """ Unit Test: test_reverse_statements """
+        statements = self._statements(reverse=True)
+        self.assertEqual(
+            statements[1],
+            'INSERT INTO milestones_usermilestone_unpartitioned SELECT * FROM milestones_usermilestone;'
+        )
+        self.assertEqual(statements[-1], 'DROP TABLE milestones_usermilestone_partitioned;')
+
+    def test_invalid_options(self):
+        """ Unit Test: test_invalid_options """
+        with self.assertRaises(CommandError):
+            self._statements(partitions=1)
+        with self.assertRaises(CommandError):
+            Command().handle('1', **self.options)  # pylint: disable=star-args
+        # The test database does not support partitioning
+        with self.assertRaises(CommandError):
+            self._statements(sql=False)
@@ -0,0 +1,67 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+purge_inactive_milestone_links Management Command Test Cases
+"""
+import datetime
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+import milestones.api as api
+from milestones.management.commands.purge_inactive_milestone_links import Command
+from milestones.models import CourseContentMilestone, CourseMilestone, MilestoneTombstone
+import milestones.tests.utils as utils
+
+
+class PurgeInactiveMilestoneLinksTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the purge_inactive_milestone_links management command
+    """
+    def setUp(self):
+        """
+        Test case scaffolding
+        """
+        super(PurgeInactiveMilestoneLinksTestCase, self).setUp()
+        self.milestone = api.add_milestone({
+            'name': 'Purged Milestone',
+            'namespace': 'purged.milestones',
+            'description': 'Purged Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', self.milestone)
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', self.milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', self.milestone)
+        api.remove_course_references(self.test_course_key)
+
+    def test_inactive_links_are_purged(self):
+        """ Unit Test: test_inactive_links_are_purged """
+        self.assertEqual(CourseMilestone.objects.filter(active=False).count(), 1)
+        self.assertEqual(CourseContentMilestone.objects.filter(active=False).count(), 1)
+        call_command('purge_inactive_milestone_links', batch_size=1, sleep=0)
+        self.assertEqual(list(CourseMilestone.objects.values_list('course_id', flat=True)),
+                         [unicode(self.test_prerequisite_course_key)])
+        self.assertFalse(CourseContentMilestone.objects.exists())
+        self.assertEqual(MilestoneTombstone.objects.count(), 2)
+
+    def test_old_tombstones_are_purged(self):
+        """ Unit Test: test_old_tombstones_are_purged """
+        call_command('purge_inactive_milestone_links', sleep=0)
+        MilestoneTombstone.objects.filter(entity='course_milestone').update(
+            modified=timezone.now() - datetime.timedelta(days=31)
+        )
+        call_command('purge_inactive_milestone_links', sleep=0, tombstone_days=30)
+        self.assertEqual(
+            list(MilestoneTombstone.objects.values_list('entity', flat=True)),
+            ['course_content_milestone']
+        )
+
+    def test_invalid_options(self):
+        """ Unit Test: test_invalid_options """
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=0, sleep=0, tombstone_days=None)
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=10, sleep=-1, tombstone_days=None)
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=10, sleep=0, tombstone_days=-1)
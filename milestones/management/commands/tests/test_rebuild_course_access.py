@@ -0,0 +1,57 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+rebuild_course_access Management Command Test Cases
+"""
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+
+import milestones.api as api
+from milestones.management.commands.rebuild_course_access import Command
+from milestones.models import UserCourseAccess
+import milestones.tests.utils as utils
+
+
+@override_settings(MILESTONES_COURSE_ACCESS_PROJECTION=True)
+class RebuildCourseAccessTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the rebuild_course_access management command
+    """
+    def setUp(self):
+        """
+        Test case scaffolding
+        """
+        super(RebuildCourseAccessTestCase, self).setUp()
+        self.milestones = [
+            api.add_milestone({
+                'name': 'Access Milestone {}'.format(index),
+                'namespace': 'access.milestones',
+                'description': 'Access Milestone Description',
+            })
+            for index in range(2)
+        ]
+        for milestone in self.milestones:
+            api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_user_milestone(self.serialized_test_user, self.milestones[0])
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, self.serialized_test_user), 1)
+
+    def test_drift_is_repaired(self):
+        """ Unit Test: test_drift_is_repaired """
+        UserCourseAccess.objects.update(unmet_count=5)
+        call_command('rebuild_course_access', batch_size=1)
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, self.serialized_test_user), 1)
+
+    def test_listed_courses_only(self):
+        """ Unit Test: test_listed_courses_only """
+        UserCourseAccess.objects.update(unmet_count=5)
+        call_command('rebuild_course_access', unicode(self.test_prerequisite_course_key))
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, self.serialized_test_user), 5)
+        call_command('rebuild_course_access', unicode(self.test_course_key))
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, self.serialized_test_user), 1)
+
+    def test_invalid_batch_size(self):
+        """ Unit Test: test_invalid_batch_size """
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=0)
@@ -0,0 +1,42 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+rebuild_prerequisite_index Management Command Test Cases
+"""
+from django.core.management import call_command
+from django.test.utils import override_settings
+from opaque_keys.edx.keys import CourseKey
+
+import milestones.api as api
+from milestones.models import CoursePrerequisite
+import milestones.tests.utils as utils
+
+
+class RebuildPrerequisiteIndexTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the rebuild_prerequisite_index management command
+    """
+
+    def test_index_is_built_from_existing_links(self):
+        """ Unit Test: test_index_is_built_from_existing_links """
+        milestone = api.add_milestone({
+            'name': 'Index Milestone',
+            'namespace': 'index.milestones',
+            'description': 'Index Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', milestone)
+        CoursePrerequisite.objects.create(
+            course_id=unicode(CourseKey.from_string('stale/course/key')),
+            prerequisite_course_id=unicode(self.test_course_key),
+            depth=1,
+        )
+
+        with override_settings(MILESTONES_PREREQUISITE_INDEX=True):
+            call_command('rebuild_prerequisite_index')
+            self.assertEqual(
+                api.get_course_prerequisites(self.test_course_key),
+                [{'course_id': unicode(self.test_prerequisite_course_key), 'depth': 1}]
+            )
+        self.assertEqual(CoursePrerequisite.objects.count(), 1)
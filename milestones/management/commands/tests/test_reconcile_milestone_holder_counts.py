@@ -0,0 +1,72 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+reconcile_milestone_holder_counts Management Command Test Cases
+"""
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+
+import milestones.api as api
+from milestones.management.commands.reconcile_milestone_holder_counts import Command
+from milestones.models import MilestoneHolderCount
+import milestones.tests.utils as utils
+
+
+@override_settings(MILESTONES_HOLDER_COUNTS=True)
+class ReconcileMilestoneHolderCountsTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the reconcile_milestone_holder_counts management command
+    """
+    def setUp(self):
+        """
+        Test case scaffolding
+        """
+        super(ReconcileMilestoneHolderCountsTestCase, self).setUp()
+        self.milestones = [
+            api.add_milestone({
+                'name': 'Counted Milestone {}'.format(index),
+                'namespace': 'counted.milestones',
+                'description': 'Counted Milestone Description',
+            })
+            for index in range(2)
+        ]
+        other_user = User.objects.create(username='counted')
+        for milestone in self.milestones:
+            api.add_user_milestone(self.serialized_test_user, milestone)
+        api.add_user_milestone({'id': other_user.id}, self.milestones[0])
+
+    def _counts(self):
+        """
+        The holder counts of the test milestones, in order
+        """
+        counts = api.get_milestones_holder_counts(self.milestones)
+        return [counts[milestone['id']] for milestone in self.milestones]
+
+    def test_drift_is_repaired(self):
+        """ Unit Test: test_drift_is_repaired """
+        MilestoneHolderCount.objects.update(count=7)
+        call_command('reconcile_milestone_holder_counts')
+        self.assertEqual(self._counts(), [2, 1])
+
+    def test_missing_counters_are_rebuilt(self):
+        """ Unit Test: test_missing_counters_are_rebuilt """
+        MilestoneHolderCount.objects.all().delete()
+        self.assertEqual(self._counts(), [0, 0])
+        call_command('reconcile_milestone_holder_counts')
+        self.assertEqual(self._counts(), [2, 1])
+
+    def test_listed_milestones_only(self):
+        """ Unit Test: test_listed_milestones_only """
+        MilestoneHolderCount.objects.update(count=7)
+        call_command('reconcile_milestone_holder_counts', str(self.milestones[1]['id']))
+        self.assertEqual(self._counts(), [7 * MilestoneHolderCount.objects.filter(
+            milestone_id=self.milestones[0]['id']
+        ).count(), 1])
+
+    def test_invalid_milestone_id(self):
+        """ Unit Test: test_invalid_milestone_id """
+        with self.assertRaises(CommandError):
+            Command().handle('first')
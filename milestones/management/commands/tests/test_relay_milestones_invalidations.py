@@ -0,0 +1,42 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+relay_milestones_invalidations Management Command Test Cases
+"""
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+
+import milestones.api as api
+from milestones.management.commands.relay_milestones_invalidations import Command
+from milestones.models import InvalidationRecord
+import milestones.tests.utils as utils
+
+
+@override_settings(MILESTONES_INVALIDATION_OUTBOX=True)
+class RelayMilestonesInvalidationsTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the relay_milestones_invalidations management command
+    """
+
+    def test_outbox_is_drained(self):
+        """ Unit Test: test_outbox_is_drained """
+        milestone = api.add_milestone({
+            'name': 'Relay Milestone',
+            'namespace': 'relay.milestones',
+            'description': 'Relay Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', milestone)
+        self.assertEqual(InvalidationRecord.objects.count(), 3)
+        call_command('relay_milestones_invalidations', batch_size=2)
+        self.assertFalse(InvalidationRecord.objects.exists())
+
+    def test_invalid_options(self):
+        """ Unit Test: test_invalid_options """
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=0, follow=False, interval=1)
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=10, follow=False, interval=-1)
@@ -0,0 +1,87 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+warm_milestones_cache Management Command Test Cases
+"""
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+
+import milestones.api as api
+from milestones.management.commands.warm_milestones_cache import Command, RateLimiter
+import milestones.tests.utils as utils
+
+
+@override_settings(MILESTONES_CACHE_TIMEOUT=60)
+class WarmMilestonesCacheTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the warm_milestones_cache management command
+    """
+    def setUp(self):
+        """
+        Test case scaffolding
+        """
+        super(WarmMilestonesCacheTestCase, self).setUp()
+        self.test_milestone = api.add_milestone({
+            'name': 'Warm Milestone',
+            'namespace': 'warm.milestones',
+            'description': 'Warm Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', self.test_milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', self.test_milestone)
+
+    def _assert_cached(self, course_key):
+        """
+        Course and content lookups must now be served without touching the database
+        """
+        with utils.CountQueries() as queries:
+            api.get_course_milestones(course_key)
+            api.get_course_milestones(course_key, 'requires')
+            api.get_course_milestones(course_key, 'fulfills')
+        self.assertEqual(queries.count, 0)
+
+    def test_warm_all_active_courses(self):
+        """ Unit Test: test_warm_all_active_courses """
+        call_command('warm_milestones_cache', batch_size=1)
+        self._assert_cached(self.test_course_key)
+        self._assert_cached(self.test_prerequisite_course_key)
+        with utils.CountQueries() as queries:
+            milestones = api.get_course_content_milestones(self.test_course_key, self.test_content_key, 'requires')
+        self.assertEqual(queries.count, 0)
+        self.assertEqual(len(milestones), 1)
+
+    def test_warm_listed_courses(self):
+        """ Unit Test: test_warm_listed_courses """
+        call_command('warm_milestones_cache', unicode(self.test_course_key))
+        self._assert_cached(self.test_course_key)
+        with utils.CountQueries() as queries:
+            api.get_course_milestones(self.test_prerequisite_course_key)
+        self.assertEqual(queries.count, 1)
+
+    def test_warmed_entries_are_invalidated(self):
+        """ Unit Test: test_warmed_entries_are_invalidated """
+        call_command('warm_milestones_cache')
+        api.remove_course_milestone(self.test_course_key, self.test_milestone)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 0)
+        self.assertEqual(len(api.get_course_milestones(self.test_prerequisite_course_key, 'fulfills')), 1)
+
+    @override_settings(MILESTONES_CACHE_TIMEOUT=None)
+    def test_caching_disabled(self):
+        """ Unit Test: test_caching_disabled """
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=100, concurrency=1, rate=0)
+
+    def test_invalid_options(self):
+        """ Unit Test: test_invalid_options """
+        with self.assertRaises(CommandError):
+            Command().handle(batch_size=100, concurrency=0, rate=0)
+
+    def test_rate_limiter_spaces_batches(self):
+        """ Unit Test: test_rate_limiter_spaces_batches """
+        rate_limiter = RateLimiter(1000)
+        rate_limiter.wait()
+        first_start = rate_limiter.next_start
+        rate_limiter.wait()
+        self.assertAlmostEqual(rate_limiter.next_start - first_start, 0.001, places=5)
+        self.assertEqual(RateLimiter(0).interval, 0)
@@ -0,0 +1,135 @@
+"""
+Management command which preloads the Milestones cache entries for course
+requirements, course content gates and relationship types, so that the first
+requests after a deploy or cache flush do not all miss at once.
+
+    $ ./manage.py warm_milestones_cache [course_id ...] [--batch-size=100] [--concurrency=4] [--rate=10]
+"""
+import threading
+import time
+from optparse import make_option
+from Queue import Empty, Queue
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from milestones import caching
+from milestones import data
+
+
+class RateLimiter(object):  # pylint: disable=too-few-public-methods
+    """
+    Spaces out batch starts (across every worker) to at most 'rate' per second
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_start = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the caller is allowed to start its next batch
+        """
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class Command(BaseCommand):
+    """
+    Preloads the Milestones cache for all active courses, or the courses provided
+    """
+    args = '<course_id course_id ...>'
+    help = 'Preloads the Milestones cache entries for all active courses, or the courses provided'
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--batch-size',
+            type='int',
+            default=100,
+            help='Number of courses loaded per bulk query'
+        ),
+        make_option(
+            '--concurrency',
+            type='int',
+            default=1,
+            help='Number of worker threads loading batches'
+        ),
+        make_option(
+            '--rate',
+            type='float',
+            default=0,
+            help='Maximum number of batches started per second across all workers (0 for no limit)'
+        ),
+    )
+
+    def __init__(self):
+        super(Command, self).__init__()
+        self.rate_limiter = None
+        self.entries = 0
+        self.errors = []
+        self.lock = threading.Lock()
+
+    def handle(self, *args, **options):
+        if not caching.is_enabled():
+            raise CommandError('Caching is disabled -- set MILESTONES_CACHE_TIMEOUT to enable it')
+        batch_size = options['batch_size']
+        concurrency = options['concurrency']
+        if batch_size < 1 or concurrency < 1:
+            raise CommandError('--batch-size and --concurrency must be positive')
+
+        data.warm_relationship_types()
+        course_ids = list(args) or data.fetch_active_course_ids()
+        batches = Queue()
+        for index in range(0, len(course_ids), batch_size):
+            batches.put(course_ids[index:index + batch_size])
+
+        self.rate_limiter = RateLimiter(options['rate'])
+        if concurrency == 1:
+            self._work(batches)
+        else:
+            workers = [
+                threading.Thread(target=self._work_in_thread, args=(batches,))
+                for __ in range(concurrency)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        if self.errors:
+            raise CommandError('Cache warm-up failed: {}'.format(self.errors[0]))
+        self.stdout.write('Stored {} cache entries for {} courses\n'.format(self.entries, len(course_ids)))
+
+    def _work(self, batches):
+        """
+        Loads batches of courses until the queue is drained
+        """
+        while True:
+            try:
+                batch = batches.get_nowait()
+            except Empty:
+                return
+            self.rate_limiter.wait()
+            try:
+                entries = data.warm_course_caches(batch)
+            except Exception as error:  # pylint: disable=broad-except
+                with self.lock:
+                    self.errors.append(error)
+                return
+            with self.lock:
+                self.entries += entries
+
+    def _work_in_thread(self, batches):
+        """
+        Worker thread entry point -- each thread gets its own database connection
+        """
+        try:
+            self._work(batches)
+        finally:
+            connection.close()
@@ -0,0 +1,125 @@
+"""
+Request-scoped memoization for the Milestones API.
+
+Within a scope, repeated calls to the memoized read functions in api.py with
+the same arguments (a course page asking user_has_milestone from several
+template fragments and XBlocks, say) are answered from the results of the
+first call.  Any write through the API empties the scope, so callers still
+read their own writes.
+
+Scopes are opt-in and per thread: add middleware.RequestMemoizationMiddleware
+to open one around each request, or wrap a block of code in scope().
+Results are copied on the way out, so callers cannot alter the memoized ones.
+"""
+from contextlib import contextmanager
+import copy
+from functools import wraps
+import threading
+
+_STATE = threading.local()
+
+
+def start():
+    """
+    Opens a scope in this thread (scopes nest -- only the outermost one holds results)
+    """
+    if not getattr(_STATE, 'depth', 0):
+        _STATE.results = {}
+    _STATE.depth = getattr(_STATE, 'depth', 0) + 1
+
+
+def end():
+    """
+    Closes a scope, dropping its results once the outermost one is closed
+    """
+    _STATE.depth = max(getattr(_STATE, 'depth', 0) - 1, 0)
+    if not _STATE.depth:
+        _STATE.results = {}
+
+
+def reset():
+    """
+    Closes every scope open in this thread, dropping their results
+    """
+    _STATE.depth = 0
+    _STATE.results = {}
+
+
+def is_active():
+    """
+    Whether this thread is within a scope
+    """
+    return bool(getattr(_STATE, 'depth', 0))
+
+
+def invalidate():
+    """
+    Forgets every result memoized in this thread's scope
+    """
+    if is_active():
+        _STATE.results = {}
+
+
+@contextmanager
+def scope():
+    """
+    Memoizes the API reads made within the block
+    """
+    start()
+    try:
+        yield
+    finally:
+        end()
+
+
+def _freeze(value):
+    """
+    Builds a hashable equivalent of a call argument (raising TypeError if there is none)
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        frozen = tuple(_freeze(item) for item in value)
+        return frozenset(frozen) if isinstance(value, (set, frozenset)) else frozen
+    hash(value)
+    return value
+
+
+def memoized(func):
+    """
+    Marks an API read whose results may be shared within a scope
+    Calls with arguments which cannot be hashed are simply passed through
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        """
+        Serves the call from the scope when the same call has already been made
+        """
+        if not is_active():
+            return func(*args, **kwargs)
+        try:
+            key = (func.__name__, _freeze(args), _freeze(kwargs))
+        except TypeError:
+            return func(*args, **kwargs)
+        if key in _STATE.results:
+            return copy.deepcopy(_STATE.results[key])
+        result = func(*args, **kwargs)
+        _STATE.results[key] = copy.deepcopy(result)
+        return result
+    return wrapper
+
+
+def invalidating(func):
+    """
+    Marks an API write, which empties the scope once it has been made
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        """
+        Runs the write, then forgets the memoized results
+        """
+        try:
+            return func(*args, **kwargs)
+        finally:
+            invalidate()
+    return wrapper
@@ -0,0 +1,38 @@
+"""
+Django middleware for the Milestones app
+"""
+from . import memo
+from . import routers
+
+
+class ReadReplicaPinningMiddleware(object):
+    """
+    Clears the read-your-writes pins (see routers.py) around each request, so a
+    write only keeps the thread handling it on the primary for that request
+    """
+
+    def process_request(self, request):  # pylint: disable=unused-argument,no-self-use
+        """ Start every request reading from the read database """
+        routers.reset_pins()
+
+    def process_response(self, request, response):  # pylint: disable=unused-argument,no-self-use
+        """ Don't let this request's pins leak into the next one """
+        routers.reset_pins()
+        return response
+
+
+class RequestMemoizationMiddleware(object):
+    """
+    Opens a memoization scope (see memo.py) around each request, so repeated
+    Milestones API reads made while handling it only hit the data layer once
+    """
+
+    def process_request(self, request):  # pylint: disable=unused-argument,no-self-use
+        """ Start every request with an empty scope, even if the last one was never closed """
+        memo.reset()
+        memo.start()
+
+    def process_response(self, request, response):  # pylint: disable=unused-argument,no-self-use
+        """ Don't let this request's results leak into the next one """
+        memo.reset()
+        return response
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+from south.utils import datetime_utils as datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+CHANGE_FEED_TABLES = (
+    'milestones_usermilestone',
+    'milestones_coursemilestone',
+    'milestones_coursecontentmilestone',
+    'milestones_milestonetombstone',
+)
+
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        # Adding model 'MilestoneTombstone'
+        db.create_table('milestones_milestonetombstone', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('created', self.gf('model_utils.fields.AutoCreatedField')(default=datetime.datetime.now)),
+            ('modified', self.gf('model_utils.fields.AutoLastModifiedField')(default=datetime.datetime.now)),
+            ('entity', self.gf('django.db.models.fields.CharField')(max_length=32)),
+            ('entity_id', self.gf('django.db.models.fields.IntegerField')()),
+            ('user_id', self.gf('django.db.models.fields.IntegerField')(null=True)),
+            ('course_id', self.gf('django.db.models.fields.CharField')(max_length=255, blank=True)),
+            ('content_id', self.gf('django.db.models.fields.CharField')(max_length=255, blank=True)),
+            ('milestone_id', self.gf('django.db.models.fields.IntegerField')()),
+            ('milestone_relationship_type_id', self.gf('django.db.models.fields.IntegerField')(null=True)),
+        ))
+        db.send_create_signal('milestones', ['MilestoneTombstone'])
+
+        # Adding the (modified, id) indexes the change feed pages through
+        for table in CHANGE_FEED_TABLES:
+            db.create_index(table, ['modified', 'id'])
+
+    def backwards(self, orm):
+        # Removing the change feed indexes
+        for table in CHANGE_FEED_TABLES:
+            db.delete_index(table, ['modified', 'id'])
+
+        # Deleting model 'MilestoneTombstone'
+        db.delete_table('milestones_milestonetombstone')
+
+    models = {
+        'milestones.coursecontentmilestone': {
+            'Meta': {'unique_together': "(('course_id', 'content_id', 'milestone'),)", 'object_name': 'CourseContentMilestone'},
+            'active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'content_id': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'}),
+            'course_id': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'}),
+            'created': ('model_utils.fields.AutoCreatedField', [], {'default': 'datetime.datetime.now'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'milestone': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['milestones.Milestone']"}),
+            'milestone_relationship_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['milestones.MilestoneRelationshipType']"}),
+            'modified': ('model_utils.fields.AutoLastModifiedField', [], {'default': 'datetime.datetime.now'})
+        },
+        'milestones.coursemilestone': {
+            'Meta': {'unique_together': "(('course_id', 'milestone'),)", 'object_name': 'CourseMilestone'},
+            'active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'course_id': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'}),
+            'created': ('model_utils.fields.AutoCreatedField', [], {'default': 'datetime.datetime.now'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'milestone': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['milestones.Milestone']"}),
+            'milestone_relationship_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['milestones.MilestoneRelationshipType']"}),
+            'modified': ('model_utils.fields.AutoLastModifiedField', [], {'default': 'datetime.datetime.now'})
+        },
+        'milestones.courseprerequisite': {
+            'Meta': {'unique_together': "(('course_id', 'prerequisite_course_id'),)", 'object_name': 'CoursePrerequisite'},
+            'course_id': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'}),
+            'depth': ('django.db.models.fields.IntegerField', [], {}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'prerequisite_course_id': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'})
+        },
+        'milestones.milestone': {
+            'Meta': {'object_name': 'Milestone'},
+            'active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'created': ('model_utils.fields.AutoCreatedField', [], {'default': 'datetime.datetime.now'}),
+            'description': ('django.db.models.fields.TextField', [], {}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'modified': ('model_utils.fields.AutoLastModifiedField', [], {'default': 'datetime.datetime.now'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'namespace': ('django.db.models.fields.CharField', [], {'max_length': '255'})
+        },
+        'milestones.milestonerelationshiptype': {
+            'Meta': {'object_name': 'MilestoneRelationshipType'},
+            'active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'created': ('model_utils.fields.AutoCreatedField', [], {'default': 'datetime.datetime.now'}),
+            'description': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'modified': ('model_utils.fields.AutoLastModifiedField', [], {'default': 'datetime.datetime.now'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'})
+        },
+        'milestones.milestonetombstone': {
+            'Meta': {'object_name': 'MilestoneTombstone'},
+            'content_id': ('django.db.models.fields.CharField', [], {'max_length': '255', 'blank': 'True'}),
+            'course_id': ('django.db.models.fields.CharField', [], {'max_length': '255', 'blank': 'True'}),
+            'created': ('model_utils.fields.AutoCreatedField', [], {'default': 'datetime.datetime.now'}),
+            'entity': ('django.db.models.fields.CharField', [], {'max_length': '32'}),
+            'entity_id': ('django.db.models.fields.IntegerField', [], {}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'milestone_id': ('django.db.models.fields.IntegerField', [], {}),
+            'milestone_relationship_type_id': ('django.db.models.fields.IntegerField', [], {'null': 'True'}),
+            'modified': ('model_utils.fields.AutoLastModifiedField', [], {'default': 'datetime.datetime.now'}),
+            'user_id': ('django.db.models.fields.IntegerField', [], {'null': 'True'})
+        },
+        'milestones.usercourseaccess': {
+            'Meta': {'unique_together': "(('user_id', 'course_id'),)", 'object_name': 'UserCourseAccess'},
+            'course_id': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'unmet_count': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'user_id': ('django.db.models.fields.IntegerField', [], {})
+        },
+        'milestones.usermilestone': {
+            'Meta': {'unique_together': "(('user_id', 'milestone'),)", 'object_name': 'UserMilestone'},
+            'active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'created': ('model_utils.fields.AutoCreatedField', [], {'default': 'datetime.datetime.now'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'milestone': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['milestones.Milestone']"}),
+            'modified': ('model_utils.fields.AutoLastModifiedField', [], {'default': 'datetime.datetime.now'}),
+            'source': ('django.db.models.fields.TextField', [], {'blank': 'True'}),
+            'user_id': ('django.db.models.fields.IntegerField', [], {'db_index': 'True'})
+        }
+    }
+
+    complete_apps = ['milestones']
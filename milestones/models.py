@@ -59,12 +59,18 @@ class CourseMilestone(TimeStampedModel):
     of specifying CourseKeyFields in this model, as well as related ones
     below. In addition, a MilestoneRelationshipType specifies the
     particular sort of relationship that exists between the Course and
-    the Milestone, such as "requires".
+    the Milestone, such as "requires".  The milestone_* fields are copies of
+    the Milestone's own, always maintained so that gating reads can skip the
+    join once MILESTONES_DENORMALIZED_LINKS is enabled.
     """
     course_id = models.CharField(max_length=255, db_index=True)
     milestone = models.ForeignKey(Milestone, db_index=True)
     milestone_relationship_type = models.ForeignKey(MilestoneRelationshipType, db_index=True)
     active = models.BooleanField(default=True)
+    milestone_namespace = models.CharField(max_length=255, blank=True)
+    milestone_name = models.CharField(max_length=255, blank=True)
+    milestone_description = models.TextField(blank=True)
+    milestone_active = models.BooleanField(default=True)
 
     class Meta:
         """ Meta class for this Django model """
@@ -80,13 +86,18 @@ class CourseContentMilestone(TimeStampedModel):
     of specifying LocationKeyFields in this model, as well as related
     ones. In addition, a MilestoneRelationshipType specifies the
     particular sort of relationship that exists between the Milestone
-    and the CourseContent, such as "requires" or "fulfills".
+    and the CourseContent, such as "requires" or "fulfills".  As with
+    CourseMilestone, the milestone_* fields are copies of the Milestone's own.
     """
     course_id = models.CharField(max_length=255, db_index=True)
     content_id = models.CharField(max_length=255, db_index=True)
     milestone = models.ForeignKey(Milestone, db_index=True)
     milestone_relationship_type = models.ForeignKey(MilestoneRelationshipType, db_index=True)
     active = models.BooleanField(default=True)
+    milestone_namespace = models.CharField(max_length=255, blank=True)
+    milestone_name = models.CharField(max_length=255, blank=True)
+    milestone_description = models.TextField(blank=True)
+    milestone_active = models.BooleanField(default=True)
 
     class Meta:
         """ Meta class for this Django model """
@@ -111,3 +122,105 @@ class UserMilestone(TimeStampedModel):
     class Meta:
         """ Meta class for this Django model """
         unique_together = ("user_id", "milestone")
+
+
+class ArchivedUserMilestone(TimeStampedModel):
+    """
+    An ArchivedUserMilestone is a UserMilestone moved out of the hot table by
+    archive.archive_user_milestones, typically because it belongs to an inactive
+    user or a retired milestone, so the gating queries and their indexes only
+    cover the rows still in use.  'created' is carried over from the original
+    record, while 'modified' records when it was archived.  'retired' marks the
+    rows archived only because their milestone was retired, which come back
+    when the milestone is reactivated.  Archived rows are only read when
+    explicitly asked for, and can be moved back into the hot table with
+    archive.restore_user_milestones.
+    """
+    user_id = models.IntegerField(db_index=True)
+    milestone_id = models.IntegerField(db_index=True)
+    source = models.TextField(blank=True)
+    active = models.BooleanField(default=True)
+    retired = models.BooleanField(default=False)
+
+
+class UserCourseAccess(models.Model):
+    """
+    A UserCourseAccess is a denormalized projection of the number of Milestones
+    a course requires which the User has not yet collected.  Rows are created
+    on first lookup and then maintained incrementally by the data layer as
+    UserMilestone and 'requires' CourseMilestone records come and go, so
+    course access checks become a single unique-index lookup.  Only used when
+    MILESTONES_COURSE_ACCESS_PROJECTION is enabled.
+    """
+    user_id = models.IntegerField()
+    course_id = models.CharField(max_length=255, db_index=True)
+    unmet_count = models.IntegerField(default=0)
+
+    class Meta:
+        """ Meta class for this Django model """
+        unique_together = (("user_id", "course_id"),)
+
+
+class CoursePrerequisite(models.Model):
+    """
+    A CoursePrerequisite is an entry in the transitive closure of the
+    prerequisite graph: a course requires a Milestone, which is fulfilled by
+    another course, which may in turn require further Milestones.  Each row
+    links a course to one of its direct or indirect prerequisite courses,
+    'depth' being the shortest number of hops between them.  Only maintained
+    when MILESTONES_PREREQUISITE_INDEX is enabled.
+    """
+    course_id = models.CharField(max_length=255, db_index=True)
+    prerequisite_course_id = models.CharField(max_length=255, db_index=True)
+    depth = models.IntegerField()
+
+    class Meta:
+        """ Meta class for this Django model """
+        unique_together = (("course_id", "prerequisite_course_id"),)
+
+
+class MilestoneTombstone(TimeStampedModel):
+    """
+    A MilestoneTombstone records the removal of a UserMilestone,
+    CourseMilestone or CourseContentMilestone record, which are hard
+    deleted, so the change feed can report deletions alongside inserts
+    and updates.  'entity' names the kind of record removed, 'entity_id'
+    its former primary key, and the remaining fields its former values.
+    """
+    entity = models.CharField(max_length=32)
+    entity_id = models.IntegerField()
+    user_id = models.IntegerField(null=True)
+    course_id = models.CharField(max_length=255, blank=True)
+    content_id = models.CharField(max_length=255, blank=True)
+    milestone_id = models.IntegerField()
+    milestone_relationship_type_id = models.IntegerField(null=True)
+
+
+class InvalidationRecord(models.Model):
+    """
+    An InvalidationRecord is an outbox entry describing the cached course
+    and course content entries made stale by a gating write.  Records are
+    written in the same transaction as the write itself, then published to
+    the invalidation handlers and removed by the relay, so invalidations
+    survive a process dying between the commit and the cache deletes.
+    Only written when MILESTONES_INVALIDATION_OUTBOX is enabled.
+    """
+    created = models.DateTimeField(auto_now_add=True)
+    payload = models.TextField()
+
+
+class MilestoneHolderCount(models.Model):
+    """
+    A MilestoneHolderCount is one shard of the running count of Users
+    holding a Milestone.  Each UserMilestone change updates the shard picked
+    by its user id, so concurrent awards of a popular Milestone do not all
+    contend for a single row; the count is the sum over the shards.  Only
+    maintained when MILESTONES_HOLDER_COUNTS is enabled.
+    """
+    milestone_id = models.IntegerField()
+    shard = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        """ Meta class for this Django model """
+        unique_together = (("milestone_id", "shard"),)
@@ -0,0 +1,124 @@
+"""
+Query monitoring for the Milestones data layer.
+
+The monitored decorator logs a structured record (the call's identifiers, its
+duration, the number of rows it returned and the SQL it issued) for data layer
+calls taking longer than MILESTONES_SLOW_CALL_THRESHOLD_MS milliseconds or
+returning more than MILESTONES_LARGE_RESULT_THRESHOLD rows.  Both thresholds
+are disabled by default, in which case the calls run unwrapped.
+"""
+import inspect
+import logging
+import threading
+from functools import wraps
+from time import time
+
+from django.conf import settings
+from django.db import connections
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Per-thread nesting depth of the monitored calls capturing queries (see monitored)
+_QUERY_CAPTURES = threading.local()
+
+
+def _call_identifiers(func, args, kwargs):
+    """
+    Pulls the course/content/user/milestone identifiers out of a data layer call
+    """
+    try:
+        call_args = inspect.getcallargs(func, *args, **kwargs)  # pylint: disable=star-args
+    except TypeError:
+        return {}
+    identifiers = {}
+    if call_args.get('course_key') is not None:
+        identifiers['course_key'] = unicode(call_args['course_key'])
+    if call_args.get('course_keys') is not None:
+        identifiers['course_keys'] = [unicode(course_key) for course_key in call_args['course_keys']]
+    if call_args.get('content_key') is not None:
+        identifiers['content_key'] = unicode(call_args['content_key'])
+    if call_args.get('user'):
+        identifiers['user_id'] = call_args['user'].get('id')
+    if call_args.get('users') is not None:
+        identifiers['user_count'] = len(call_args['users'])
+    if call_args.get('milestone'):
+        identifiers['milestone_id'] = call_args['milestone'].get('id')
+    if call_args.get('milestones'):
+        identifiers['milestone_ids'] = [milestone.get('id') for milestone in call_args['milestones']]
+    return identifiers
+
+
+def _start_capturing_queries():
+    """
+    Switches on query logging for every database (reads may go to a replica)
+    Captures nest: each one sees every query logged since it started, including
+    those of the captures nested in it
+    """
+    captures = []
+    for connection in connections.all():
+        captures.append((connection, connection.use_debug_cursor, len(connection.queries)))
+        connection.use_debug_cursor = True
+    _QUERY_CAPTURES.depth = getattr(_QUERY_CAPTURES, 'depth', 0) + 1
+    return captures
+
+
+def _stop_capturing_queries(captures):
+    """
+    Returns the queries logged since _start_capturing_queries.  Only the outermost
+    capture switches the debug cursors back off and drops the logged queries,
+    so the captures it encloses still get to report them.
+    """
+    _QUERY_CAPTURES.depth -= 1
+    queries = []
+    for connection, old_debug_cursor, starting_query in captures:
+        queries.extend(connection.queries[starting_query:])
+        if _QUERY_CAPTURES.depth:
+            continue
+        connection.use_debug_cursor = old_debug_cursor
+        if not (old_debug_cursor or settings.DEBUG):
+            del connection.queries[starting_query:]
+    return queries
+
+
+def monitored(func):
+    """
+    Decorator which logs a structured record for data layer calls taking longer than
+    MILESTONES_SLOW_CALL_THRESHOLD_MS milliseconds or returning more than
+    MILESTONES_LARGE_RESULT_THRESHOLD rows.  Both thresholds are disabled by default.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        """ Times the call and captures the SQL it issued """
+        slow_call_threshold = getattr(settings, 'MILESTONES_SLOW_CALL_THRESHOLD_MS', None)
+        large_result_threshold = getattr(settings, 'MILESTONES_LARGE_RESULT_THRESHOLD', None)
+        if slow_call_threshold is None and large_result_threshold is None:
+            return func(*args, **kwargs)
+
+        captures = _start_capturing_queries()
+        started = time()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            duration_ms = (time() - started) * 1000
+            queries = _stop_capturing_queries(captures)
+
+        rows = len(result) if isinstance(result, (list, dict)) else None
+        is_slow = slow_call_threshold is not None and duration_ms > slow_call_threshold
+        is_large = large_result_threshold is not None and rows is not None and rows > large_result_threshold
+        if is_slow or is_large:
+            record = {
+                'function': func.__name__,
+                'duration_ms': round(duration_ms, 3),
+                'rows': rows,
+                'slow': is_slow,
+                'large': is_large,
+                'sql': [query['sql'] for query in queries],
+            }
+            record.update(_call_identifiers(func, args, kwargs))
+            log.warning(
+                'Milestones data call %s exceeded thresholds (%.1f ms, %s rows)',
+                func.__name__, duration_ms, rows,
+                extra={'milestones_call': record}
+            )
+        return result
+    return wrapper
@@ -0,0 +1,109 @@
+# pylint: disable=no-member
+"""
+Transactional outbox for cross-node cache invalidation.
+
+With MILESTONES_INVALIDATION_OUTBOX enabled, every gating write appends an
+InvalidationRecord (the course ids and (course id, content id) pairs whose
+cached entries it made stale) in the same transaction as the write.  The
+writing process still invalidates its caches straight away; the relay
+(./manage.py relay_milestones_invalidations) then publishes each committed
+record to the invalidation handlers and removes it.  A process dying after
+the commit therefore cannot lose an invalidation, and an entry refilled from
+pre-commit data is dropped again once the record is relayed.
+
+Handlers are callables taking the decoded record payload.  They are listed
+by dotted path in MILESTONES_INVALIDATION_HANDLERS (by default just
+invalidate_caches, which clears the shared Milestones cache entries and moves
+the gating snapshot version on), and in-process consumers may also
+subscribe() to the bus.  Records are delivered at least once, so handlers
+must be idempotent.
+"""
+import json
+
+from django.conf import settings
+from django.utils.importlib import import_module
+
+from . import caching
+from . import models as internal
+
+DEFAULT_HANDLERS = ('milestones.outbox.invalidate_caches',)
+
+_SUBSCRIBERS = []
+
+
+def is_enabled():
+    """
+    Invalidation records are only written when switched on
+    """
+    return getattr(settings, 'MILESTONES_INVALIDATION_OUTBOX', False)
+
+
+def record(course_ids=(), content_pairs=()):
+    """
+    Appends an invalidation record for the specified courses and (course id, content id) pairs
+    """
+    if not is_enabled() or not (course_ids or content_pairs):
+        return
+    internal.InvalidationRecord.objects.create(payload=json.dumps({
+        'course_ids': sorted(course_ids),
+        'content_pairs': sorted(list(content_pair) for content_pair in content_pairs),
+    }))
+
+
+def invalidate_caches(payload):
+    """
+    Default handler: drops the shared cache entries named by a record
+    """
+    caching.delete_many(
+        caching.course_keys(payload['course_ids']) + caching.course_content_keys(payload['content_pairs'])
+    )
+    caching.bump_gating_version()
+
+
+def subscribe(handler):
+    """
+    Registers an in-process handler, called for every relayed record
+    """
+    if handler not in _SUBSCRIBERS:
+        _SUBSCRIBERS.append(handler)
+
+
+def unsubscribe(handler):
+    """
+    Removes an in-process handler
+    """
+    if handler in _SUBSCRIBERS:
+        _SUBSCRIBERS.remove(handler)
+
+
+def _load_handler(path):
+    """
+    Imports a handler from its dotted path
+    """
+    module_path, name = path.rsplit('.', 1)
+    return getattr(import_module(module_path), name)
+
+
+def publish(payload):
+    """
+    Delivers a record payload to every configured and subscribed handler
+    """
+    handlers = [
+        _load_handler(path) for path in getattr(settings, 'MILESTONES_INVALIDATION_HANDLERS', DEFAULT_HANDLERS)
+    ]
+    for handler in handlers + _SUBSCRIBERS:
+        handler(payload)
+
+
+def relay(batch_size=100):
+    """
+    Publishes the oldest pending records, then removes them
+    A record is only removed once every handler has accepted it
+    Returns the number of records relayed
+    """
+    records = list(internal.InvalidationRecord.objects.order_by('id')[:batch_size])
+    for invalidation_record in records:
+        publish(json.loads(invalidation_record.payload))
+    if records:
+        internal.InvalidationRecord.objects.filter(id__in=[item.id for item in records]).delete()
+    return len(records)
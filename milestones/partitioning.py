@@ -0,0 +1,101 @@
+# pylint: disable=no-member
+"""
+Hash partitioning of the UserMilestone table by user id.
+
+UserMilestone is by far the largest table, and every per-user query goes
+through its user_id index.  On PostgreSQL (11 or later) the table can be
+split into a number of physical partitions by a hash of user_id, behind the
+same model: queries filtering on user_id (user_has_milestone, the gating
+checks, awards and removals -- see storage._delete_user_links) only touch the
+partition holding the user, and each partition can be reindexed or vacuumed
+on its own.  Queries by milestone (such as the removal cascade) visit every
+partition.
+
+The switch is made by the partition_user_milestones management command, in a
+single transaction which blocks UserMilestone writes while the rows are
+copied.  The original table is emptied and kept, renamed to
+<table>_unpartitioned, so the command's --reverse option can copy the rows
+back into it and swap it back in; drop it once the partitioned table has
+proven itself.  Schema migrations altering UserMilestone must be applied to
+the partitioned table by hand.
+
+The test suite runs on sqlite, so these statements have only been checked as
+text and never run against PostgreSQL: review them with the command's --sql
+option and try them on a copy of the database first.
+"""
+from . import models as internal
+
+# Default number of partitions the UserMilestone table is split into
+DEFAULT_PARTITIONS = 16
+
+# Oldest PostgreSQL version (as reported by connection.pg_version) with hash partitioning
+MINIMUM_PG_VERSION = 110000
+
+TABLE = internal.UserMilestone._meta.db_table  # pylint: disable=protected-access
+
+
+def is_supported(connection):
+    """
+    Whether the database behind the connection can hash partition tables
+    """
+    return connection.vendor == 'postgresql' and connection.pg_version >= MINIMUM_PG_VERSION
+
+
+def is_partitioned(connection):
+    """
+    Whether the UserMilestone table has already been partitioned
+    """
+    cursor = connection.cursor()
+    cursor.execute('SELECT COUNT(*) FROM pg_partitioned_table WHERE partrelid = %s::regclass', [TABLE])
+    return bool(cursor.fetchone()[0])
+
+
+def partition_statements(partitions=DEFAULT_PARTITIONS):
+    """
+    The SQL statements replacing the UserMilestone table with one hash partitioned by
+    user id into the specified number of partitions, to be run in a single transaction
+    """
+    partitioned = '{}_partitioned'.format(TABLE)
+    statements = [
+        'LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE'.format(TABLE),
+        'CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY HASH (user_id)'.format(partitioned, TABLE),
+        'ALTER TABLE {} ADD PRIMARY KEY (id, user_id)'.format(partitioned),
+        'ALTER TABLE {} ADD UNIQUE (user_id, milestone_id)'.format(partitioned),
+        'ALTER TABLE {} ADD FOREIGN KEY (milestone_id) REFERENCES {} (id) DEFERRABLE INITIALLY DEFERRED'.format(
+            partitioned, internal.Milestone._meta.db_table  # pylint: disable=protected-access
+        ),
+        'CREATE INDEX {0}_milestone_id ON {0} (milestone_id)'.format(partitioned),
+        # The change feed pages through (modified, id) -- see migration 0004
+        'CREATE INDEX {0}_modified_id ON {0} (modified, id)'.format(partitioned),
+    ]
+    statements.extend(
+        'CREATE TABLE {}_p{} PARTITION OF {} FOR VALUES WITH (MODULUS {}, REMAINDER {})'.format(
+            TABLE, remainder, partitioned, partitions, remainder
+        )
+        for remainder in range(partitions)
+    )
+    statements.extend([
+        'INSERT INTO {} SELECT * FROM {}'.format(partitioned, TABLE),
+        'TRUNCATE {}'.format(TABLE),
+        'ALTER SEQUENCE {}_id_seq OWNED BY NONE'.format(TABLE),
+        'ALTER TABLE {0} RENAME TO {0}_unpartitioned'.format(TABLE),
+        'ALTER TABLE {} RENAME TO {}'.format(partitioned, TABLE),
+        'ALTER SEQUENCE {0}_id_seq OWNED BY {0}.id'.format(TABLE),
+    ])
+    return statements
+
+
+def unpartition_statements():
+    """
+    The SQL statements copying the rows of the partitioned UserMilestone table back into
+    the (emptied) original one and swapping it back in, to be run in a single transaction
+    """
+    return [
+        'LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE'.format(TABLE),
+        'INSERT INTO {0}_unpartitioned SELECT * FROM {0}'.format(TABLE),
+        'ALTER SEQUENCE {}_id_seq OWNED BY NONE'.format(TABLE),
+        'ALTER TABLE {0} RENAME TO {0}_partitioned'.format(TABLE),
+        'ALTER TABLE {0}_unpartitioned RENAME TO {0}'.format(TABLE),
+        'ALTER SEQUENCE {0}_id_seq OWNED BY {0}.id'.format(TABLE),
+        'DROP TABLE {}_partitioned'.format(TABLE),
+    ]
@@ -0,0 +1,496 @@
+# pylint: disable=no-member
+"""
+Derived gating state maintained alongside the Milestones links.
+
+Each of these is switched on by its own setting, kept up to date by the data
+layer writes, and can be rebuilt from the links by a management command:
+
+* MILESTONES_COURSE_ACCESS_PROJECTION: a UserCourseAccess row per user and
+  course holding the number of required milestones the user has not yet
+  collected, created upon the first lookup and adjusted by the awards and
+  course links (see rebuild_course_access).
+* MILESTONES_HOLDER_COUNTS: the number of users holding each milestone, spread
+  across MILESTONES_HOLDER_COUNT_SHARDS MilestoneHolderCount rows so concurrent
+  awards rarely update the same row (see reconcile_holder_counts).
+* MILESTONES_PREREQUISITE_INDEX: the CoursePrerequisite closure of the
+  prerequisite graph, recomputed for the courses a link change affects (see
+  rebuild_prerequisite_index).
+"""
+import logging
+
+from django.conf import settings
+from django.db.models import Count, F, Sum
+
+from . import models as internal
+from . import monitoring
+from . import routers
+from . import storage
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Default number of MilestoneHolderCount rows each milestone's count is spread across
+HOLDER_COUNT_SHARDS = 16
+
+
+def course_access_projection_enabled():
+    """
+    The UserCourseAccess projection is only maintained when switched on
+    """
+    return getattr(settings, 'MILESTONES_COURSE_ACCESS_PROJECTION', False)
+
+
+def requiring_course_ids(milestone_id):
+    """
+    Subquery of the courses which require the specified milestone
+    """
+    return internal.CourseMilestone.objects.filter(
+        milestone=milestone_id,
+        milestone_relationship_type=storage.get_relationship_type('requires').id,
+        active=True,
+        milestone__active=True,
+    ).values('course_id')
+
+
+def courses_requiring(milestone_ids):
+    """
+    The ids of the courses with an active link requiring any of the specified milestones,
+    whether or not those milestones are active themselves
+    """
+    return set(internal.CourseMilestone.objects.filter(
+        milestone__in=milestone_ids,
+        milestone_relationship_type=storage.get_relationship_type('requires').id,
+        active=True,
+    ).values_list('course_id', flat=True))
+
+
+def _holder_user_ids(milestone_id):
+    """
+    Subquery of the users who have collected the specified milestone
+    """
+    return internal.UserMilestone.objects.filter(milestone=milestone_id).values('user_id')
+
+
+def adjust_user_course_access(user_id, milestone_id, delta):
+    """
+    Applies a user-milestone change to that user's UserCourseAccess rows
+    """
+    if not course_access_projection_enabled():
+        return
+    internal.UserCourseAccess.objects.filter(
+        user_id=user_id,
+        course_id__in=requiring_course_ids(milestone_id),
+    ).update(unmet_count=F('unmet_count') + delta)
+
+
+def adjust_course_access(course_id, milestone_id, delta):
+    """
+    Applies a 'requires' course-milestone change to the course's UserCourseAccess rows
+    (users who already hold the milestone are unaffected)
+    """
+    if not course_access_projection_enabled():
+        return
+    internal.UserCourseAccess.objects.filter(
+        course_id=course_id,
+    ).exclude(
+        user_id__in=_holder_user_ids(milestone_id),
+    ).update(unmet_count=F('unmet_count') + delta)
+
+
+def _holder_counts_enabled():
+    """
+    The MilestoneHolderCount counters are only maintained when switched on
+    """
+    return getattr(settings, 'MILESTONES_HOLDER_COUNTS', False)
+
+
+def _add_to_holder_count(milestone_id, shard, delta):
+    """
+    Adds delta to one MilestoneHolderCount shard, creating the shard as required
+    """
+    shard_rows = internal.MilestoneHolderCount.objects.filter(milestone_id=milestone_id, shard=shard)
+    if shard_rows.update(count=F('count') + delta):
+        return
+    created = internal.MilestoneHolderCount.objects.get_or_create(
+        milestone_id=milestone_id,
+        shard=shard,
+        defaults={'count': delta},
+    )[1]
+    if not created:
+        # Another worker created the shard in the meantime
+        shard_rows.update(count=F('count') + delta)
+
+
+def _add_to_holder_counts(deltas):
+    """
+    Applies a dict of (milestone_id, shard) -> delta, with one update for all of the
+    existing shards sharing a shard number and delta (missing shards are created one by one)
+    """
+    grouped = {}
+    for (milestone_id, shard), delta in deltas.items():
+        if delta:
+            grouped.setdefault((shard, delta), set()).add(milestone_id)
+    for (shard, delta), milestone_ids in grouped.items():
+        existing = set(internal.MilestoneHolderCount.objects.filter(
+            milestone_id__in=milestone_ids,
+            shard=shard,
+        ).values_list('milestone_id', flat=True))
+        internal.MilestoneHolderCount.objects.filter(
+            milestone_id__in=existing,
+            shard=shard,
+        ).update(count=F('count') + delta)
+        for milestone_id in milestone_ids - existing:
+            _add_to_holder_count(milestone_id, shard, delta)
+
+
+def _holder_count_shard(user_id):
+    """
+    The MilestoneHolderCount shard a user's awards are counted in
+    """
+    return user_id % getattr(settings, 'MILESTONES_HOLDER_COUNT_SHARDS', HOLDER_COUNT_SHARDS)
+
+
+def adjust_holder_count(user_id, milestone_id, delta):
+    """
+    Applies a user-milestone change to the milestone's holder count, using the
+    shard picked by the user so that concurrent awards rarely update the same row
+    """
+    if not _holder_counts_enabled():
+        return
+    _add_to_holder_count(milestone_id, _holder_count_shard(user_id), delta)
+
+
+def prerequisite_index_enabled():
+    """
+    The CoursePrerequisite closure index is only maintained when switched on
+    """
+    return getattr(settings, 'MILESTONES_PREREQUISITE_INDEX', False)
+
+
+def _direct_prerequisites(course_ids, relationship_types, using=None):
+    """
+    Maps each of the specified courses to the set of courses fulfilling the milestones it requires
+    ('relationship_types' holds the 'requires' and 'fulfills' relationship type objects)
+    """
+    course_ids = set(course_ids)
+    prerequisites = dict((course_id, set()) for course_id in course_ids)
+    required = {}
+    for course_id, milestone_id in internal.CourseMilestone.objects.using(using).filter(
+            course_id__in=course_ids,
+            milestone_relationship_type=relationship_types['requires'].id,
+            milestone__active=True,
+            active=True,
+    ).values_list('course_id', 'milestone'):
+        required.setdefault(milestone_id, set()).add(course_id)
+    if not required:
+        return prerequisites
+    for course_id, milestone_id in internal.CourseMilestone.objects.using(using).filter(
+            milestone__in=required.keys(),
+            milestone_relationship_type=relationship_types['fulfills'].id,
+            active=True,
+    ).values_list('course_id', 'milestone'):
+        for requiring_course_id in required[milestone_id]:
+            prerequisites[requiring_course_id].add(course_id)
+    return prerequisites
+
+
+def _compute_prerequisite_closures(course_ids, using=None):
+    """
+    Walks the prerequisite graph breadth-first from the specified courses, one
+    level per round trip rather than one course at a time
+    Returns {course_id: {prerequisite_course_id: depth}}, depth being the
+    shortest number of hops.  Courses found on a cycle are logged and left out
+    of their own closure.
+    """
+    relationship_types = storage.get_relationship_types(['requires', 'fulfills'])
+    edges = {}
+    frontier = set(course_ids)
+    while frontier:
+        edges.update(_direct_prerequisites(frontier, relationship_types, using))
+        frontier = set().union(*edges.values()) - set(edges)
+
+    closures = {}
+    for course_id in course_ids:
+        depths = {}
+        level = edges[course_id]
+        depth = 1
+        while level:
+            for prerequisite_course_id in level:
+                depths[prerequisite_course_id] = depth
+            level = set().union(*[edges[prerequisite] for prerequisite in level]) - set(depths)
+            depth += 1
+        if depths.pop(course_id, None) is not None:
+            log.warning('Milestone prerequisite cycle detected for course %s', course_id)
+        closures[course_id] = depths
+    return closures
+
+
+def reindex_prerequisites(course_ids):
+    """
+    Recomputes the CoursePrerequisite rows of the specified courses and of
+    every course which (transitively) depends upon them
+    """
+    if not prerequisite_index_enabled() or not course_ids:
+        return
+    course_ids = set(course_ids)
+    course_ids.update(internal.CoursePrerequisite.objects.filter(
+        prerequisite_course_id__in=course_ids,
+    ).values_list('course_id', flat=True))
+    closures = _compute_prerequisite_closures(course_ids)
+    internal.CoursePrerequisite.objects.filter(course_id__in=course_ids).delete()
+    internal.CoursePrerequisite.objects.bulk_create([
+        internal.CoursePrerequisite(course_id=course_id, prerequisite_course_id=prerequisite_course_id, depth=depth)
+        for course_id, depths in closures.items()
+        for prerequisite_course_id, depth in depths.items()
+    ])
+
+
+def reindex_prerequisites_for_link(course_id, milestone_id, relationship):
+    """
+    Recomputes the closure rows affected by adding/removing a course-milestone link
+    ('requires' links change the course's own edges, 'fulfills' links change
+    the edges of every course requiring the milestone)
+    """
+    if not prerequisite_index_enabled():
+        return
+    if relationship == 'requires':
+        reindex_prerequisites([course_id])
+    else:
+        reindex_prerequisites([row['course_id'] for row in requiring_course_ids(milestone_id)])
+
+
+def after_bulk_link_changes(course_links=(), content_links=(), user_links=(), user_delta=1):
+    """
+    Brings the caches, projections and counters up to date with course and course content
+    link records bulk inserted, updated or removed (in their before and after states) and
+    user awards bulk inserted (or, with a 'user_delta' of -1, removed) outside of the
+    create_*/delete_* functions
+    """
+    if course_links or content_links:
+        storage.gating_changed()
+    if storage.tracks_invalidations():
+        storage.invalidate_course_links(
+            course_ids=set(link.course_id for link in course_links),
+            content_pairs=set((link.course_id, link.content_id) for link in content_links),
+        )
+    requires = storage.get_relationship_type('requires').id if course_links else None
+    affected_course_ids = set(
+        link.course_id for link in course_links if link.milestone_relationship_type_id == requires
+    )
+    if course_access_projection_enabled():
+        # Affected rows are simply dropped, and recomputed upon their next lookup
+        internal.UserCourseAccess.objects.filter(course_id__in=affected_course_ids).delete()
+        internal.UserCourseAccess.objects.filter(user_id__in=set(link.user_id for link in user_links)).delete()
+    if prerequisite_index_enabled():
+        fulfilled_ids = set(
+            link.milestone_id for link in course_links if link.milestone_relationship_type_id != requires
+        )
+        if fulfilled_ids:
+            affected_course_ids.update(internal.CourseMilestone.objects.filter(
+                milestone__in=fulfilled_ids,
+                milestone_relationship_type=requires,
+                active=True,
+            ).values_list('course_id', flat=True))
+        reindex_prerequisites(affected_course_ids)
+    if _holder_counts_enabled():
+        deltas = {}
+        for link in user_links:
+            if link.active:
+                shard = (link.milestone_id, _holder_count_shard(link.user_id))
+                deltas[shard] = deltas.get(shard, 0) + user_delta
+        _add_to_holder_counts(deltas)
+
+
+def _required_milestone_ids(course_id, requires=None):
+    """
+    The ids of the active milestones required by a course, read from the primary
+    """
+    if requires is None:
+        requires = storage.get_relationship_type('requires')
+    return set(internal.CourseMilestone.objects.filter(
+        course_id=course_id,
+        milestone_relationship_type=requires.id,
+        active=True,
+        milestone__active=True,
+    ).values_list('milestone', flat=True))
+
+
+def _count_unmet_milestones(user_id, required_ids):
+    """
+    Counts the required milestones which the user has not yet collected, on the primary
+    """
+    if not required_ids:
+        return 0
+    return len(required_ids) - internal.UserMilestone.objects.filter(
+        user_id=user_id,
+        milestone__in=required_ids,
+    ).count()
+
+
+def _recount_course_access(row_id, user_id, required_ids):
+    """
+    Recounts a UserCourseAccess row while holding its lock
+    """
+    row = internal.UserCourseAccess.objects.select_for_update().get(id=row_id)
+    unmet_count = _count_unmet_milestones(user_id, required_ids)
+    if row.unmet_count != unmet_count:
+        internal.UserCourseAccess.objects.filter(id=row_id).update(unmet_count=unmet_count)
+    return unmet_count
+
+
+def create_course_access(course_id, user_id):
+    """
+    Creates a user's UserCourseAccess row for a course, returning its unmet count
+    The seed is counted on the primary rather than through the caches, snapshot or read
+    database, which may lag behind.  An award committed between the count and the row
+    becoming visible would not be applied to it, so once created the row is counted
+    again under its lock: awards either land before the recount (and are counted) or
+    wait for it (and are applied to the recounted value).
+    """
+    required_ids = _required_milestone_ids(course_id)
+    row, __ = internal.UserCourseAccess.objects.get_or_create(  # pylint: disable=invalid-name
+        user_id=user_id,
+        course_id=course_id,
+        defaults={'unmet_count': _count_unmet_milestones(user_id, required_ids)},
+    )
+    return storage.atomically(_recount_course_access, row.id, user_id, required_ids)
+
+
+def _repair_course_access_rows(rows, required_ids):
+    """
+    Recomputes a batch of a course's UserCourseAccess rows, returning the number repaired
+    """
+    collected = {}
+    holders = internal.UserMilestone.objects.filter(
+        user_id__in=[row.user_id for row in rows],
+        milestone__in=required_ids,
+    ).values_list('user_id', flat=True)
+    for user_id in holders:
+        collected[user_id] = collected.get(user_id, 0) + 1
+    repaired = 0
+    for row in rows:
+        unmet_count = len(required_ids) - collected.get(row.user_id, 0)
+        if row.unmet_count != unmet_count:
+            internal.UserCourseAccess.objects.filter(id=row.id).update(unmet_count=unmet_count)
+            repaired += 1
+    return repaired
+
+
+def rebuild_course_access(course_keys=None, batch_size=1000):
+    """
+    Recomputes the UserCourseAccess rows for the specified courses (all of them by default),
+    repairing any drift from the incremental maintenance
+    Returns a (checked, repaired) tuple of row counts
+    """
+    if course_keys is None:
+        course_ids = internal.UserCourseAccess.objects.values_list('course_id', flat=True).distinct()
+    else:
+        course_ids = [unicode(course_key) for course_key in course_keys]
+
+    checked = repaired = 0
+    requires = storage.get_relationship_type('requires')
+    for course_id in course_ids:
+        required_ids = _required_milestone_ids(course_id, requires)
+        last_id = 0
+        while True:
+            rows = list(internal.UserCourseAccess.objects.filter(
+                course_id=course_id,
+                id__gt=last_id,
+            ).order_by('id')[:batch_size])
+            if not rows:
+                break
+            last_id = rows[-1].id
+            checked += len(rows)
+            repaired += _repair_course_access_rows(rows, required_ids)
+    return checked, repaired
+
+
+@monitoring.monitored
+def fetch_milestones_holder_counts(milestones):
+    """
+    Retrieves the number of users who have collected each of the specified milestones
+    With MILESTONES_HOLDER_COUNTS enabled this sums the maintained counters rather
+    than counting UserMilestone rows
+    Returns a dict of milestone id -> count
+    """
+    milestone_ids = [milestone['id'] for milestone in milestones]
+    counts = dict((milestone_id, 0) for milestone_id in milestone_ids)
+    if not milestone_ids:
+        return counts
+    if _holder_counts_enabled():
+        totals = internal.MilestoneHolderCount.objects.using(routers.read_database()).filter(
+            milestone_id__in=milestone_ids,
+        ).values_list('milestone_id').annotate(total=Sum('count'))
+    else:
+        totals = internal.UserMilestone.objects.using(routers.read_database()).filter(
+            milestone__in=milestone_ids,
+            active=True,
+        ).values_list('milestone').annotate(total=Count('id'))
+    counts.update(totals)
+    return counts
+
+
+def reconcile_holder_counts(milestone_ids=None):
+    """
+    Recomputes the holder counts of the specified milestones (all of them by default)
+    from the UserMilestone rows, correcting any drift in the maintained counters
+    Returns a (checked, repaired) tuple of milestone counts
+    """
+    exact = internal.UserMilestone.objects.filter(active=True)
+    counters = internal.MilestoneHolderCount.objects.all()
+    if milestone_ids is not None:
+        exact = exact.filter(milestone__in=milestone_ids)
+        counters = counters.filter(milestone_id__in=milestone_ids)
+    exact = dict(exact.values_list('milestone').annotate(total=Count('id')))
+    maintained = dict(counters.values_list('milestone_id').annotate(total=Sum('count')))
+
+    checked = repaired = 0
+    for milestone_id in sorted(set(exact) | set(maintained)):
+        checked += 1
+        drift = exact.get(milestone_id, 0) - maintained.get(milestone_id, 0)
+        if drift:
+            # Corrections go to the first shard; only the sum over the shards is meaningful
+            _add_to_holder_count(milestone_id, 0, drift)
+            repaired += 1
+    return checked, repaired
+
+
+@monitoring.monitored
+def fetch_course_prerequisites(course_key):
+    """
+    Retrieves every course which the specified course transitively depends upon
+    (courses fulfilling the milestones it requires, the courses fulfilling the
+    milestones those require, and so on), nearest first
+    With MILESTONES_PREREQUISITE_INDEX enabled this is a single CoursePrerequisite lookup
+    Returns a list of {'course_id', 'depth'} dicts
+    """
+    course_id = unicode(course_key)
+    if prerequisite_index_enabled():
+        depths = dict(internal.CoursePrerequisite.objects.using(routers.read_database()).filter(
+            course_id=course_id,
+        ).values_list('prerequisite_course_id', 'depth'))
+    else:
+        depths = _compute_prerequisite_closures([course_id], using=routers.read_database())[course_id]
+    return [
+        {'course_id': prerequisite_course_id, 'depth': depth}
+        for prerequisite_course_id, depth in sorted(depths.items(), key=lambda item: (item[1], item[0]))
+    ]
+
+
+def rebuild_prerequisite_index():
+    """
+    Recomputes the whole CoursePrerequisite index from the active course-milestone links
+    Returns the number of rows written
+    """
+    course_ids = set(internal.CourseMilestone.objects.filter(
+        milestone_relationship_type=storage.get_relationship_type('requires').id,
+        active=True,
+    ).values_list('course_id', flat=True))
+    closures = _compute_prerequisite_closures(course_ids)
+    internal.CoursePrerequisite.objects.all().delete()
+    rows = [
+        internal.CoursePrerequisite(course_id=course_id, prerequisite_course_id=prerequisite_course_id, depth=depth)
+        for course_id, depths in closures.items()
+        for prerequisite_course_id, depth in depths.items()
+    ]
+    internal.CoursePrerequisite.objects.bulk_create(rows)
+    return len(rows)
@@ -0,0 +1,98 @@
+"""
+Database routing for the Milestones app.
+
+Read-only data layer functions send their queries to the alias named by
+MILESTONES_READ_DATABASE (for example a replica), falling back to the primary
+('default') database when no read alias is configured.  Reads stick to the
+primary after a write in the same thread -- for the affected user after a
+user-milestone write, and for everything after a gating (milestone, course or
+content link) write -- so callers always read their own writes.  The pins are
+cleared per request by middleware.ReadReplicaPinningMiddleware.
+
+Everything else, including every write and cascade delete, goes to the primary.
+Installations routing reads to replicas project-wide should list MilestonesRouter
+in DATABASE_ROUTERS ahead of their own router to keep it that way.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_PINS = threading.local()
+
+
+def write_database():
+    """
+    The primary database alias, used for every write
+    """
+    return DEFAULT_DB_ALIAS
+
+
+def read_database(user_id=None):
+    """
+    The database alias read-only queries should use
+    Pass in 'user_id' for queries returning that user's data
+    """
+    read_alias = getattr(settings, 'MILESTONES_READ_DATABASE', None)
+    if not read_alias or getattr(_PINS, 'everything', False):
+        return write_database()
+    if user_id is not None and user_id in getattr(_PINS, 'user_ids', ()):
+        return write_database()
+    return read_alias
+
+
+def pin_user(user_id):
+    """
+    Sends this thread's subsequent reads of the specified user's data to the primary
+    """
+    if not hasattr(_PINS, 'user_ids'):
+        _PINS.user_ids = set()
+    _PINS.user_ids.add(user_id)
+
+
+def pin_everything():
+    """
+    Sends all of this thread's subsequent reads to the primary
+    """
+    _PINS.everything = True
+
+
+def reset_pins():
+    """
+    Lets this thread read from the read database again
+    """
+    _PINS.user_ids = set()
+    _PINS.everything = False
+
+
+class MilestonesRouter(object):
+    """
+    Keeps Milestones models on the primary unless the data layer explicitly
+    routes a read elsewhere (see read_database)
+    """
+    app_label = 'milestones'
+
+    def db_for_read(self, model, **hints):  # pylint: disable=unused-argument
+        """ Implicit reads (such as cascade collection) stay on the primary """
+        if model._meta.app_label == self.app_label:  # pylint: disable=protected-access
+            return write_database()
+        return None
+
+    def db_for_write(self, model, **hints):  # pylint: disable=unused-argument
+        """ Writes always go to the primary """
+        if model._meta.app_label == self.app_label:  # pylint: disable=protected-access
+            return write_database()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):  # pylint: disable=unused-argument
+        """ Relations within the app are always allowed """
+        app_labels = (obj1._meta.app_label, obj2._meta.app_label)  # pylint: disable=protected-access
+        if app_labels == (self.app_label, self.app_label):
+            return True
+        return None
+
+    def allow_syncdb(self, db, model):  # pylint: disable=invalid-name
+        """ The app's tables only live on the primary """
+        if model._meta.app_label == self.app_label:  # pylint: disable=protected-access
+            return db == write_database()
+        return None
@@ -65,3 +65,72 @@ def deserialize_milestone(milestone_dict):
         namespace=milestone_dict.get('namespace'),
         description=milestone_dict.get('description')
     )
+
+
+# Fields reported by the change feed for each kind of link record
+CHANGE_FIELDS = {
+    'user_milestone': ('user_id', 'milestone_id'),
+    'course_milestone': ('course_id', 'milestone_id'),
+    'course_content_milestone': ('course_id', 'content_id', 'milestone_id'),
+}
+
+
+def serialize_change(entity, action, entity_id, record, relationship_names):
+    """
+    Change feed serialization
+    'record' is either the link record itself or the MilestoneTombstone left behind by its removal
+    """
+    change = {
+        'entity': entity,
+        'action': action,
+        'id': entity_id,
+        'modified': record.modified,
+    }
+    for field in CHANGE_FIELDS[entity]:
+        change[field] = getattr(record, field)
+    if entity != 'user_milestone':
+        change['relationship'] = relationship_names.get(record.milestone_relationship_type_id)
+    return change
+
+
+# Fields of each type of milestone graph record (export/import), with the queryset values they are read from
+GRAPH_FIELDS = {
+    'milestone': (
+        ('namespace', 'namespace'),
+        ('name', 'name'),
+        ('description', 'description'),
+    ),
+    'course_milestone': (
+        ('course_id', 'course_id'),
+        ('namespace', 'milestone__namespace'),
+        ('name', 'milestone__name'),
+        ('relationship', 'milestone_relationship_type__name'),
+        ('active', 'active'),
+    ),
+    'course_content_milestone': (
+        ('course_id', 'course_id'),
+        ('content_id', 'content_id'),
+        ('namespace', 'milestone__namespace'),
+        ('name', 'milestone__name'),
+        ('relationship', 'milestone_relationship_type__name'),
+        ('active', 'active'),
+    ),
+    'user_milestone': (
+        ('user_id', 'user_id'),
+        ('namespace', 'milestone__namespace'),
+        ('name', 'milestone__name'),
+        ('source', 'source'),
+        ('active', 'active'),
+    ),
+}
+
+
+def serialize_graph_record(record_type, row):
+    """
+    Milestone graph record serialization -- milestones are referenced by (namespace, name)
+    rather than by id, so records can be imported into another database
+    """
+    record = {'type': record_type}
+    for field, column in GRAPH_FIELDS[record_type]:
+        record[field] = row[column]
+    return record
@@ -0,0 +1,252 @@
+# pylint: disable=no-member
+"""
+In-process gating snapshot for the Milestones data layer.
+
+Gating configuration (the active CourseMilestone and CourseContentMilestone
+links and their relationship types) changes rarely but is read on nearly every
+LMS request.  With MILESTONES_GATING_SNAPSHOT enabled, each worker compiles all
+of it into an immutable GatingSnapshot -- a single array of milestones, plus
+dicts of milestone positions keyed by course and by course content, and of
+the courses and content linked to each milestone -- so course and content gate
+lookups (and the reverse, milestone to fulfilling course/content lookups)
+never leave the process.
+
+Every committed gating write which changed some rows moves a version marker
+held in the Milestones cache (see caching.get_gating_version).  Writes made in
+a transaction managed by the caller cannot tell when it commits, so the
+snapshot requires MILESTONES_INVALIDATION_OUTBOX: the relay moves the marker
+once their outbox record has committed.  Workers compare the marker with their
+snapshot at most once every MILESTONES_GATING_SNAPSHOT_CHECK_INTERVAL seconds
+and, when it has moved, compile a replacement from the primary database and
+swap it in with a single assignment; lookups already running keep the
+snapshot they started with.  Snapshots are also recompiled once they are
+MILESTONES_GATING_SNAPSHOT_MAX_AGE seconds old, which bounds how long a
+missed change can be served.  The writing worker drops its own snapshot
+straight away, so it always reads its own writes.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from . import caching
+from . import models as internal
+from . import outbox
+from . import routers
+from . import serializers
+
+# Seconds between version marker checks
+CHECK_INTERVAL = 1
+
+# Seconds after which a snapshot is recompiled, whether or not the version marker has moved
+MAX_AGE = 300
+
+_STATE = {
+    'snapshot': None,
+    'checked_until': 0,
+    'expires_at': 0,
+}
+_LOAD_LOCK = threading.Lock()
+
+
+class GatingSnapshot(object):
+    """
+    Immutable, compiled view of every active course and course content gate
+    """
+    __slots__ = ('version', '_milestones', '_courses', '_content', '_milestone_courses', '_milestone_content')
+
+    def __init__(self, version, course_links, content_links):
+        """
+        'course_links' and 'content_links' are iterables of CourseMilestone and
+        CourseContentMilestone objects (with their milestone and relationship type)
+        """
+        interned = {}
+        positions = {}
+        milestones = []
+        courses = {}
+        content = {}
+        milestone_courses = {}
+        milestone_content = {}
+
+        def intern_id(value):
+            """ Shares a single string object between every reference to an id """
+            return interned.setdefault(value, value)
+
+        def position(milestone):
+            """ Index of the milestone within the milestones array """
+            if milestone.id not in positions:
+                positions[milestone.id] = len(milestones)
+                milestones.append(serializers.serialize_milestone(milestone))
+            return positions[milestone.id]
+
+        def append(entries, key, relationships, value):
+            """ Appends the value to the lists held under the key for each of the relationships """
+            entry = entries.setdefault(key, {})
+            for relationship in relationships:
+                entry.setdefault(relationship, []).append(value)
+
+        for link in course_links:
+            append(
+                courses, intern_id(link.course_id),
+                (None, link.milestone_relationship_type.name), position(link.milestone)
+            )
+            append(
+                milestone_courses, link.milestone.id,
+                (link.milestone_relationship_type.name,), (position(link.milestone), intern_id(link.course_id))
+            )
+        for link in content_links:
+            append(
+                content, (intern_id(link.course_id), intern_id(link.content_id)),
+                (None, link.milestone_relationship_type.name), position(link.milestone)
+            )
+            append(
+                milestone_content, link.milestone.id,
+                (link.milestone_relationship_type.name,),
+                (position(link.milestone), intern_id(link.course_id), intern_id(link.content_id))
+            )
+
+        self.version = version
+        self._milestones = tuple(milestones)
+        self._courses = _freeze(courses)
+        self._content = _freeze(content)
+        self._milestone_courses = _freeze(milestone_courses)
+        self._milestone_content = _freeze(milestone_content)
+
+    def course_milestones(self, course_id, relationship=None):
+        """
+        Milestones linked to a course, as fetch_courses_milestones returns them
+        """
+        return [
+            dict(self._milestones[index], course_id=course_id)
+            for index in self._courses.get(course_id, {}).get(relationship, ())
+        ]
+
+    def course_content_milestones(self, course_id, content_id, relationship=None):
+        """
+        Milestones linked to a course content module, as fetch_course_content_milestones returns them
+        """
+        return [
+            dict(self._milestones[index])
+            for index in self._content.get((course_id, content_id), {}).get(relationship, ())
+        ]
+
+    def milestone_courses(self, milestone_id, relationship):
+        """
+        Courses linked to a milestone, as fetch_courses_for_milestones returns them
+        """
+        return [
+            dict(self._milestones[index], course_id=course_id)
+            for index, course_id in self._milestone_courses.get(milestone_id, {}).get(relationship, ())
+        ]
+
+    def milestone_course_content(self, milestone_id, relationship):
+        """
+        Course content modules linked to a milestone, as fetch_course_content_for_milestones returns them
+        """
+        return [
+            dict(self._milestones[index], course_id=course_id, content_id=content_id)
+            for index, course_id, content_id in self._milestone_content.get(milestone_id, {}).get(relationship, ())
+        ]
+
+
+def _freeze(entries):
+    """
+    Converts the milestone position lists of a course/content/milestone mapping into tuples
+    """
+    return dict(
+        (key, dict((relationship, tuple(indexes)) for relationship, indexes in relationships.items()))
+        for key, relationships in entries.items()
+    )
+
+
+def is_enabled():
+    """
+    Gate lookups are only served from the snapshot when switched on (along with
+    the invalidation outbox, see above)
+    """
+    if not getattr(settings, 'MILESTONES_GATING_SNAPSHOT', False):
+        return False
+    if not outbox.is_enabled():
+        raise ImproperlyConfigured('MILESTONES_GATING_SNAPSHOT requires MILESTONES_INVALIDATION_OUTBOX')
+    return True
+
+
+def _next_check():
+    """
+    Time at which the version marker should next be checked
+    """
+    return time.time() + getattr(settings, 'MILESTONES_GATING_SNAPSHOT_CHECK_INTERVAL', CHECK_INTERVAL)
+
+
+def load():
+    """
+    Compiles a snapshot of the current gating configuration and swaps it in
+    Call at worker startup to avoid compiling it on the first request
+    """
+    # Read the marker first: a write landing mid-load moves it again, forcing another reload.
+    # A replica could still be behind the marker, so the links are read from the primary.
+    version = caching.get_gating_version()
+    using = routers.write_database()
+    snapshot = GatingSnapshot(
+        version,
+        internal.CourseMilestone.objects.using(using).filter(
+            active=True,
+            milestone__active=True,
+        ).select_related('milestone', 'milestone_relationship_type'),
+        internal.CourseContentMilestone.objects.using(using).filter(
+            active=True,
+            milestone__active=True,
+        ).select_related('milestone', 'milestone_relationship_type'),
+    )
+    _STATE['snapshot'] = snapshot
+    _STATE['checked_until'] = _next_check()
+    _STATE['expires_at'] = time.time() + getattr(settings, 'MILESTONES_GATING_SNAPSHOT_MAX_AGE', MAX_AGE)
+    return snapshot
+
+
+def current():
+    """
+    Returns the current snapshot (None when disabled), reloading it if the
+    gating configuration has changed since it was compiled or it has expired
+    """
+    if not is_enabled():
+        return None
+    snapshot = _STATE['snapshot']
+    now = time.time()
+    if snapshot is not None and now < _STATE['expires_at']:
+        if now < _STATE['checked_until']:
+            return snapshot
+        if snapshot.version == caching.get_gating_version():
+            _STATE['checked_until'] = _next_check()
+            return snapshot
+
+    # Only one thread per worker compiles a replacement; the others keep the one they have
+    if not _LOAD_LOCK.acquire(snapshot is None):
+        return snapshot
+    try:
+        if _STATE['snapshot'] is not snapshot:
+            return _STATE['snapshot']
+        return load()
+    finally:
+        _LOAD_LOCK.release()
+
+
+def invalidate():
+    """
+    Records a gating configuration change: moves the version marker on and
+    drops this worker's snapshot
+    """
+    if not is_enabled():
+        return
+    caching.bump_gating_version()
+    discard()
+
+
+def discard():
+    """
+    Drops this worker's snapshot, leaving the version marker where it is
+    """
+    _STATE['snapshot'] = None
+    _STATE['checked_until'] = 0
+    _STATE['expires_at'] = 0
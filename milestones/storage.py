@@ -0,0 +1,487 @@
+# pylint: disable=no-member
+"""
+Storage primitives shared by the Milestones data layer modules.
+
+* Gating writes: changes_gating runs a write which may change the gating
+  configuration in a transaction, and moves the gating snapshots on once it
+  has committed (see snapshot.py); atomically runs any other write in one.
+* Relationship types, read through the cache (see caching.py).
+* The milestone fields copied onto the course and course content links, which
+  are always maintained but only read when MILESTONES_DENORMALIZED_LINKS is
+  enabled (see load_links and backfill_link_milestone_fields).
+* Invalidation of the cached entries made stale by a write, recorded in the
+  outbox for the other nodes (see outbox.py).
+* Link removal: records are hard deleted, leaving the tombstones the change
+  feed reports the deletes from (see changefeed.py), while course and course
+  content links are first left inactive by the references removals, and only
+  physically removed later by purge_inactive_links.
+"""
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q, sql
+from django.utils import timezone
+
+from . import caching
+from . import exceptions
+from . import models as internal
+from . import outbox
+from . import routers
+from . import snapshot
+
+# Link record types, keyed by the entity names their changes and tombstones are reported under
+# (in the order the change feed reports changes sharing a timestamp)
+LINK_ENTITIES = (
+    ('user_milestone', internal.UserMilestone),
+    ('course_milestone', internal.CourseMilestone),
+    ('course_content_milestone', internal.CourseContentMilestone),
+)
+
+# Default number of rows physically removed per batch by the purge functions
+PURGE_BATCH_SIZE = 1000
+
+# Default number of milestones whose fields are copied onto their links per batch by the backfill
+BACKFILL_BATCH_SIZE = 500
+
+# Number of UserMilestone records removed per statement (their ids and user ids both being
+# listed, this keeps the statement within SQLite's limit of 999 parameters)
+USER_LINK_DELETE_BATCH_SIZE = 400
+
+# Number of link records removed (and tombstoned) per statement when a milestone is deleted
+LINK_DELETE_BATCH_SIZE = 1000
+
+# Per-thread state of the gating write in progress (see changes_gating)
+_GATING_WRITES = threading.local()
+
+
+def gating_changed():
+    """
+    Records that the gating write in progress on this thread changed some rows
+    """
+    _GATING_WRITES.changed = True
+
+
+def changes_gating(func):
+    """
+    Marks a write which may change the gating configuration.  The write runs in a
+    transaction (unless the caller already manages one, or it is nested in another
+    gating write), and the in-process gating snapshots are only moved on once it
+    has committed, and only if it changed any rows (see gating_changed).
+    Within a transaction managed by the caller there is no commit to wait for, so
+    only this worker's snapshot is dropped: the relay moves the others on once the
+    outbox record (which the snapshot requires) has committed.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        """
+        Runs the write, then invalidates the snapshots if it changed anything
+        """
+        if getattr(_GATING_WRITES, 'active', False):
+            return func(*args, **kwargs)
+        managed = transaction.is_managed()
+        write = func if managed else transaction.commit_on_success()(func)
+        _GATING_WRITES.active = True
+        _GATING_WRITES.changed = False
+        try:
+            result = write(*args, **kwargs)
+        finally:
+            _GATING_WRITES.active = False
+        if _GATING_WRITES.changed:
+            if managed:
+                snapshot.discard()
+            else:
+                snapshot.invalidate()
+        return result
+    return wrapper
+
+
+def atomically(func, *args):
+    """
+    Runs func(*args) in a transaction, unless the caller already manages one
+    """
+    if not transaction.is_managed():
+        func = transaction.commit_on_success()(func)
+    return func(*args)  # pylint: disable=star-args
+
+
+def get_relationship_type(relationship):
+    """
+    Retrieves milestone relationship type object from the cache or backend
+    """
+    relationship_type = caching.get_relationship_type(relationship)
+    if relationship_type is not None:
+        return relationship_type
+    try:
+        relationship_type = internal.MilestoneRelationshipType.objects.get(
+            name=relationship,
+            active=True
+        )
+    except internal.MilestoneRelationshipType.DoesNotExist:
+        if relationship in ['requires', 'fulfills']:
+            # Not cached until read back, in case the surrounding transaction rolls back
+            return internal.MilestoneRelationshipType.objects.create(
+                name=relationship,
+                active=True
+            )
+        raise exceptions.InvalidMilestoneRelationshipTypeException()
+    caching.set_relationship_type(relationship_type)
+    return relationship_type
+
+
+def get_relationship_types(relationships):
+    """
+    Retrieves the milestone relationship type objects for a set of relationships from
+    the cache or backend, reading those which are not cached with a single query
+    Returns a dict of relationship type objects keyed by relationship
+    """
+    relationships = set(relationships)
+    relationship_types = {}
+    for relationship in relationships:
+        relationship_type = caching.get_relationship_type(relationship)
+        if relationship_type is not None:
+            relationship_types[relationship] = relationship_type
+    missing = relationships - set(relationship_types)
+    if missing:
+        for relationship_type in internal.MilestoneRelationshipType.objects.filter(name__in=missing, active=True):
+            caching.set_relationship_type(relationship_type)
+            relationship_types[relationship_type.name] = relationship_type
+        for relationship in missing - set(relationship_types):
+            relationship_types[relationship] = get_relationship_type(relationship)
+    return relationship_types
+
+
+def relationship_names(records, using=None):
+    """
+    Maps the relationship type ids used by a set of link records/tombstones onto their names
+    """
+    names = dict(
+        (relationship_type.id, relationship_type.name)
+        for relationship_type in get_relationship_types(['requires', 'fulfills']).values()
+    )
+    unknown = set(getattr(record, 'milestone_relationship_type_id', None) for record in records) - set(names)
+    unknown.discard(None)
+    if unknown:
+        names.update(internal.MilestoneRelationshipType.objects.using(using).filter(
+            id__in=unknown
+        ).values_list('id', 'name'))
+    return names
+
+
+def _denormalized_links_enabled():
+    """
+    The milestone fields copied onto the course and course content links are always maintained,
+    but only read in place of the joined milestones when switched on
+    """
+    return getattr(settings, 'MILESTONES_DENORMALIZED_LINKS', False)
+
+
+def _milestone_fields(milestone):
+    """
+    The values of the copies of a milestone's fields held by its links
+    """
+    return {
+        'milestone_namespace': milestone.namespace,
+        'milestone_name': milestone.name,
+        'milestone_description': milestone.description,
+        'milestone_active': milestone.active,
+    }
+
+
+def copy_milestone_fields(links):
+    """
+    Fills in the milestone fields of a list of unsaved course or course content links
+    """
+    if not links:
+        return
+    milestones = internal.Milestone.objects.in_bulk(set(link.milestone_id for link in links))
+    for link in links:
+        if link.milestone_id in milestones:
+            for field, value in _milestone_fields(milestones[link.milestone_id]).items():
+                setattr(link, field, value)
+
+
+def link_defaults(milestone_id, relationship_type):
+    """
+    The field values to create a course or course content link to a milestone with
+    """
+    defaults = {'milestone_relationship_type': relationship_type}
+    milestone = internal.Milestone.objects.in_bulk([milestone_id]).get(milestone_id)
+    if milestone is not None:
+        defaults.update(_milestone_fields(milestone))
+    return defaults
+
+
+def update_milestone_fields(milestone_ids, **fields):
+    """
+    Brings the copies of milestone fields held by the links of the specified milestones up to date
+    """
+    for queryset in (
+            internal.CourseMilestone.objects.filter(milestone__in=milestone_ids),
+            internal.CourseContentMilestone.objects.filter(milestone__in=milestone_ids),
+    ):
+        queryset.update(**fields)  # pylint: disable=star-args
+
+
+def load_links(queryset):
+    """
+    Reads the course or course content links of the active milestones matched by a queryset,
+    along with their milestones and relationship types -- built from the fields copied onto
+    the links when MILESTONES_DENORMALIZED_LINKS is enabled, or joined in otherwise
+    """
+    if not _denormalized_links_enabled():
+        return list(queryset.filter(milestone__active=True).select_related('milestone', 'milestone_relationship_type'))
+    links = list(queryset.filter(milestone_active=True))
+    names = relationship_names(links, queryset.db)
+    for link in links:
+        link.milestone = internal.Milestone(
+            id=link.milestone_id,
+            namespace=link.milestone_namespace,
+            name=link.milestone_name,
+            description=link.milestone_description,
+            active=link.milestone_active,
+        )
+        link.milestone_relationship_type = internal.MilestoneRelationshipType(
+            id=link.milestone_relationship_type_id,
+            name=names[link.milestone_relationship_type_id],
+        )
+    return links
+
+
+def tracks_invalidations():
+    """
+    Writes only need to work out which entries they invalidate when there is a cache or outbox to tell
+    """
+    return caching.is_enabled() or outbox.is_enabled()
+
+
+def invalidate_course_links(course_ids=(), content_pairs=()):
+    """
+    Drops the cached course and course content entries affected by a write,
+    and records the invalidation in the outbox for the other nodes
+    """
+    caching.delete_many(caching.course_keys(course_ids) + caching.course_content_keys(content_pairs))
+    outbox.record(course_ids, content_pairs)
+
+
+def invalidate_milestone_links(milestone_ids):
+    """
+    Drops every cached course and course content entry which includes the specified milestones
+    """
+    if not tracks_invalidations():
+        return
+    invalidate_course_links(
+        course_ids=set(internal.CourseMilestone.objects.filter(
+            milestone__in=milestone_ids
+        ).values_list('course_id', flat=True)),
+        content_pairs=set(internal.CourseContentMilestone.objects.filter(
+            milestone__in=milestone_ids
+        ).values_list('course_id', 'content_id')),
+    )
+
+
+def invalidate_milestones(milestone_ids=(), namespaces=()):
+    """
+    Drops the cached milestone entries (negative ones included) for the specified ids and namespaces
+    """
+    caching.delete_many(caching.milestone_keys(milestone_ids, namespaces))
+
+
+def cached_namespaces(milestone_ids):
+    """
+    The namespaces whose cached entries may hold the specified milestones (only read when caching)
+    """
+    if not caching.is_enabled():
+        return []
+    return set(internal.Milestone.objects.filter(id__in=milestone_ids).values_list('namespace', flat=True))
+
+
+def _tombstone(link):
+    """
+    Builds the tombstone recording the removal of a UserMilestone, CourseMilestone or
+    CourseContentMilestone record, so the change feed can report it
+    """
+    entities = dict((model, entity) for entity, model in LINK_ENTITIES)
+    return internal.MilestoneTombstone(
+        entity=entities[type(link)],
+        entity_id=link.id,
+        user_id=getattr(link, 'user_id', None),
+        course_id=getattr(link, 'course_id', ''),
+        content_id=getattr(link, 'content_id', ''),
+        milestone_id=link.milestone_id,
+        milestone_relationship_type_id=getattr(link, 'milestone_relationship_type_id', None),
+    )
+
+
+def reactivate_link(link, relationship_type):
+    """
+    Brings back a link record left inactive by a references removal, which has not been purged yet
+    """
+    reactivated = bool(type(link).objects.filter(id=link.id, active=False).update(
+        milestone_relationship_type=relationship_type.id,
+        active=True,
+        modified=timezone.now(),
+    ))
+    if reactivated:
+        gating_changed()
+    return reactivated
+
+
+def reactivate_links(model, links):
+    """
+    Brings back a list of link records left inactive by a references removal, under the
+    relationship types they have been given
+    """
+    for relationship_type_id in set(link.milestone_relationship_type_id for link in links):
+        model.objects.filter(
+            id__in=[link.id for link in links if link.milestone_relationship_type_id == relationship_type_id],
+        ).update(milestone_relationship_type=relationship_type_id, active=True, modified=timezone.now())
+
+
+def _delete_user_links(links):
+    """
+    Hard deletes a list of UserMilestone records by user id as well as by id, so that only the
+    partitions holding them are searched when the table is partitioned (see partitioning.py)
+    """
+    using = routers.write_database()
+    for start in range(0, len(links), USER_LINK_DELETE_BATCH_SIZE):
+        batch = links[start:start + USER_LINK_DELETE_BATCH_SIZE]
+        query = sql.DeleteQuery(internal.UserMilestone)
+        query.add_q(Q(
+            user_id__in=set(link.user_id for link in batch),
+            id__in=[link.id for link in batch],
+        ))
+        query.get_compiler(using).execute_sql(None)
+    transaction.commit_unless_managed(using=using)
+
+
+def delete_link(link):
+    """
+    Hard deletes a link record, leaving a tombstone behind
+    """
+    tombstone = _tombstone(link)
+    if isinstance(link, internal.UserMilestone):
+        _delete_user_links([link])
+    else:
+        link.delete()
+        gating_changed()
+    tombstone.save()
+
+
+def delete_loaded_links(model, links):
+    """
+    Hard deletes a list of link records, returning the tombstones to leave behind
+    """
+    if model is internal.UserMilestone:
+        _delete_user_links(links)
+    else:
+        model.objects.filter(id__in=[link.id for link in links]).delete()
+        gating_changed()
+    return [_tombstone(link) for link in links]
+
+
+def delete_links(*querysets):
+    """
+    Hard deletes the link records matched by the specified querysets, leaving tombstones behind
+    The records are loaded and removed a batch at a time, so only one batch is held in memory
+    """
+    for queryset in querysets:
+        while True:
+            links = list(queryset.order_by('id')[:LINK_DELETE_BATCH_SIZE])
+            if not links:
+                break
+            internal.MilestoneTombstone.objects.bulk_create(delete_loaded_links(queryset.model, links))
+
+
+def purge_inactive_links(batch_size=PURGE_BATCH_SIZE):
+    """
+    Physically removes up to 'batch_size' of the course and course content links left inactive
+    by data.delete_course_references/delete_content_references, leaving change feed tombstones behind
+    Returns the number of links removed
+    """
+    routers.pin_everything()
+
+    def purge():
+        """
+        Removes the batch along with its tombstones -- the links are read and locked within
+        the transaction, so none can be reactivated before it is removed
+        """
+        course_milestones = list(internal.CourseMilestone.objects.select_for_update().filter(
+            active=False
+        ).order_by('id')[:batch_size])
+        course_content_milestones = []
+        if len(course_milestones) < batch_size:
+            course_content_milestones = list(internal.CourseContentMilestone.objects.select_for_update().filter(
+                active=False
+            ).order_by('id')[:batch_size - len(course_milestones)])
+        tombstones = []
+        for model, links in (
+                (internal.CourseMilestone, course_milestones),
+                (internal.CourseContentMilestone, course_content_milestones),
+        ):
+            if links:
+                tombstones.extend(delete_loaded_links(model, links))
+        internal.MilestoneTombstone.objects.bulk_create(tombstones)
+        return len(tombstones)
+    return atomically(purge)
+
+
+def purge_tombstones(before, batch_size=PURGE_BATCH_SIZE):
+    """
+    Removes up to 'batch_size' of the change feed tombstones recorded before the specified time
+    (change feed readers further behind than that will no longer see those deletes)
+    Returns the number of tombstones removed
+    """
+    tombstone_ids = list(internal.MilestoneTombstone.objects.filter(
+        modified__lt=before,
+    ).order_by('id').values_list('id', flat=True)[:batch_size])
+    if tombstone_ids:
+        internal.MilestoneTombstone.objects.filter(id__in=tombstone_ids).delete()
+    return len(tombstone_ids)
+
+
+def _backfill_milestone_fields(model, first_id, last_id, using):
+    """
+    Copies the fields of the milestones with ids from 'first_id' to 'last_id' onto their links
+    in the specified link table, with a single UPDATE reading them from the milestones table
+    """
+    quote_name = connections[using].ops.quote_name
+    link_table = quote_name(model._meta.db_table)  # pylint: disable=protected-access
+    milestone_table = quote_name(internal.Milestone._meta.db_table)  # pylint: disable=protected-access
+    assignments = ', '.join(
+        '{0} = (SELECT {1}.{2} FROM {1} WHERE {1}.{3} = {4}.{5})'.format(
+            quote_name(field), milestone_table, quote_name(field[len('milestone_'):]),
+            quote_name('id'), link_table, quote_name('milestone_id')
+        )
+        for field in sorted(_milestone_fields(internal.Milestone()))
+    )
+    connections[using].cursor().execute(
+        'UPDATE {0} SET {1} WHERE {2} >= %s AND {2} <= %s'.format(link_table, assignments, quote_name('milestone_id')),
+        [first_id, last_id]
+    )
+    transaction.commit_unless_managed(using=using)
+
+
+def backfill_link_milestone_fields(batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Copies the fields of every milestone onto its course and course content links, 'batch_size'
+    milestones at a time with one UPDATE per link table -- run it once on the links created
+    before the copies were maintained, before enabling MILESTONES_DENORMALIZED_LINKS, or to
+    repair the copies should they have drifted
+    Returns the number of milestones whose links were brought up to date
+    """
+    using = routers.write_database()
+    backfilled = 0
+    last_id = 0
+    while True:
+        milestone_ids = list(internal.Milestone.objects.using(using).filter(
+            id__gt=last_id
+        ).order_by('id').values_list('id', flat=True)[:batch_size])
+        if milestone_ids:
+            for model in (internal.CourseMilestone, internal.CourseContentMilestone):
+                _backfill_milestone_fields(model, milestone_ids[0], milestone_ids[-1], using)
+        backfilled += len(milestone_ids)
+        if len(milestone_ids) < batch_size:
+            return backfilled
+        last_id = milestone_ids[-1]
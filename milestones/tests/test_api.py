@@ -59,6 +59,7 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseBase):
         """ Unit Test: test_edit_milestone"""
         self.test_milestone['name'] = 'Edited Milestone'
         api.edit_milestone(self.test_milestone)
+        self.assertEqual(api.get_milestone(self.test_milestone['id'])['name'], 'Edited Milestone')
 
     def test_edit_milestone_missing_namespace(self):
         """ Unit Test: test_edit_milestone_missing_namespace """
@@ -122,6 +123,43 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseBase):
         milestone = api.get_milestone(self.test_milestone['id'])
         self.assertIsNone(milestone)
 
+    def test_deactivate_and_reactivate_namespace_milestones(self):
+        """ Unit Test: test_deactivate_and_reactivate_namespace_milestones """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_user_milestone(self.serialized_test_user, self.test_milestone)
+        self.assertEqual(api.deactivate_namespace_milestones(self.test_milestone['namespace']), 1)
+        self.assertEqual(api.deactivate_namespace_milestones(self.test_milestone['namespace']), 0)
+        self.assertEqual(api.get_milestones(self.test_milestone['namespace']), [])
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        self.assertEqual(api.get_user_milestones(self.serialized_test_user), [])
+
+        self.assertEqual(api.reactivate_namespace_milestones(self.test_milestone['namespace']), 1)
+        self.assertEqual(len(api.get_milestones(self.test_milestone['namespace'])), 1)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+        self.assertEqual(len(api.get_user_milestones(self.serialized_test_user)), 1)
+
+    def test_remove_namespace_milestones(self):
+        """ Unit Test: test_remove_namespace_milestones """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', self.test_milestone)
+        api.add_user_milestone(self.serialized_test_user, self.test_milestone)
+        self.assertEqual(api.remove_namespace_milestones(self.test_milestone['namespace']), 1)
+        self.assertIsNone(api.get_milestone(self.test_milestone['id']))
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        self.assertEqual(api.get_course_content_milestones(self.test_course_key, self.test_content_key), [])
+        self.assertEqual(api.get_user_milestones(self.serialized_test_user), [])
+        self.assertEqual(api.remove_namespace_milestones(self.test_milestone['namespace']), 0)
+
+    def test_namespace_milestones_invalid_namespace(self):
+        """ Unit Test: test_namespace_milestones_invalid_namespace """
+        for function in (
+                api.deactivate_namespace_milestones,
+                api.reactivate_namespace_milestones,
+                api.remove_namespace_milestones,
+        ):
+            with self.assertRaises(exceptions.InvalidMilestoneException):
+                function('')
+
     def test_add_course_milestone(self):
         """ Unit Test: test_add_course_milestone """
         api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
@@ -354,6 +392,60 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseBase):
         )
         self.assertEqual(len(requirer_milestones), 1)
 
+    def test_get_course_content_milestones_relationship_filter(self):
+        """ Unit Test: test_get_course_content_milestones_relationship_filter """
+        api.add_course_content_milestone(
+            self.test_course_key,
+            self.test_content_key,
+            'requires',
+            self.test_milestone
+        )
+        other_content_key = UsageKey.from_string('i4x://the/content/key/87654321')
+        self.assertEqual(
+            len(api.get_course_content_milestones(self.test_course_key, other_content_key, 'requires')),
+            0
+        )
+        self.assertEqual(
+            len(api.get_course_content_milestones(
+                self.test_prerequisite_course_key,
+                self.test_content_key,
+                'requires'
+            )),
+            0
+        )
+
+    def test_get_course_contents_milestones(self):
+        """ Unit Test: test_get_course_contents_milestones """
+        other_content_key = UsageKey.from_string('i4x://the/content/key/87654321')
+        other_milestone = api.add_milestone({
+            'name': 'Other Content Milestone',
+            'namespace': self.test_milestone['namespace'],
+            'description': 'Other Content Milestone Description',
+        })
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', self.test_milestone)
+        api.add_course_content_milestone(self.test_course_key, other_content_key, 'fulfills', self.test_milestone)
+        api.add_course_content_milestone(
+            self.test_prerequisite_course_key,
+            other_content_key,
+            'requires',
+            other_milestone
+        )
+        content_pairs = [
+            (self.test_course_key, self.test_content_key),
+            (self.test_course_key, other_content_key),
+        ]
+        with self.assertNumQueries(2):
+            content_milestones = api.get_course_contents_milestones(content_pairs, 'requires')
+        self.assertEqual(
+            dict((content_key, [milestone['id'] for milestone in milestones])
+                 for content_key, milestones in content_milestones.items()),
+            {self.test_content_key: [self.test_milestone['id']], other_content_key: []}
+        )
+        self.assertEqual(len(api.get_course_contents_milestones(content_pairs)[other_content_key]), 1)
+        self.assertEqual(api.get_course_contents_milestones([]), {})
+        with self.assertRaises(exceptions.InvalidContentKeyException):
+            api.get_course_contents_milestones([(self.test_course_key, None)])
+
     def test_remove_course_content_milestone(self):
         """ Unit Test: test_remove_course_content_milestone """
         api.add_course_content_milestone(
@@ -434,6 +526,88 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseBase):
         api.remove_user_milestone(self.serialized_test_user, self.test_milestone)
         self.assertFalse(api.user_has_milestone(self.serialized_test_user, self.test_milestone))
 
+    def test_get_course_blocked_users(self):
+        """ Unit Test: test_get_course_blocked_users """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_user_milestone(self.serialized_test_user, self.test_milestone)
+        self.assertEqual(
+            list(api.get_course_blocked_users(self.test_course_key, [self.serialized_test_user['id'], 0])),
+            [(0, [self.test_milestone['id']])]
+        )
+        with self.assertRaises(exceptions.InvalidCourseKeyException):
+            api.get_course_blocked_users('not a course key', [])
+
+    def test_milestone_graph_round_trip(self):
+        """ Unit Test: test_milestone_graph_round_trip """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        records = list(api.export_milestone_graph())
+        self.assertEqual([record['type'] for record in records], ['milestone', 'course_milestone'])
+        records[1]['course_id'] = unicode(self.test_prerequisite_course_key)
+        api.import_milestone_graph(records)
+        self.assertEqual(len(api.get_course_milestones(self.test_prerequisite_course_key)), 1)
+        for record in ({}, {'type': 'milestone', 'namespace': 'test'}, dict(records[1], relationship='unlocks')):
+            with self.assertRaises(exceptions.InvalidGraphRecordException):
+                api.import_milestone_graph([record])
+
+    def test_clone_course_milestones(self):
+        """ Unit Test: test_clone_course_milestones """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.clone_course_milestones(self.test_course_key, self.test_prerequisite_course_key)
+        self.assertEqual(len(api.get_course_milestones(self.test_prerequisite_course_key, 'requires')), 1)
+        with self.assertRaises(exceptions.InvalidCourseKeyException):
+            api.clone_course_milestones(self.test_course_key, 'not a course key')
+
+    def test_sync_course_milestones(self):
+        """ Unit Test: test_sync_course_milestones """
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'fulfills', self.test_milestone)
+        content_links = [(self.test_content_key, 'requires', self.test_milestone)]
+        self.assertEqual(
+            api.sync_course_milestones(self.test_course_key, content_links, []),
+            {'created': 0, 'updated': 1, 'deleted': 0}
+        )
+        self.assertEqual(
+            len(api.get_course_content_milestones(self.test_course_key, self.test_content_key, 'requires')),
+            1
+        )
+        with self.assertRaises(exceptions.InvalidContentKeyException):
+            api.sync_course_milestones(self.test_course_key, [('not a content key', 'requires', self.test_milestone)])
+        with self.assertRaises(exceptions.InvalidMilestoneRelationshipTypeException):
+            api.sync_course_milestones(self.test_course_key, [], [('unlocks', self.test_milestone)])
+
+    def test_get_milestones_holder_counts(self):
+        """ Unit Test: test_get_milestones_holder_counts """
+        self.assertEqual(api.get_milestones_holder_counts([self.test_milestone]), {self.test_milestone['id']: 0})
+        api.add_user_milestone(self.serialized_test_user, self.test_milestone)
+        self.assertEqual(api.get_milestones_holder_counts([self.test_milestone]), {self.test_milestone['id']: 1})
+        with self.assertRaises(exceptions.InvalidMilestoneException):
+            api.get_milestones_holder_counts([self.test_milestone, {}])
+
+    def test_get_milestones_fulfillers(self):
+        """ Unit Test: test_get_milestones_fulfillers """
+        other_milestone = api.add_milestone({
+            'name': 'Unfulfilled Milestone',
+            'namespace': self.test_milestone['namespace'],
+            'description': 'Unfulfilled Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', self.test_milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'fulfills', self.test_milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', other_milestone)
+        with self.assertNumQueries(3):
+            fulfillers = api.get_milestones_fulfillers([self.test_milestone, other_milestone])
+        self.assertEqual(fulfillers[other_milestone['id']], {'courses': [], 'content': []})
+        self.assertEqual(
+            [course['course_id'] for course in fulfillers[self.test_milestone['id']]['courses']],
+            [unicode(self.test_prerequisite_course_key)]
+        )
+        self.assertEqual(
+            [content['content_id'] for content in fulfillers[self.test_milestone['id']]['content']],
+            [unicode(self.test_content_key)]
+        )
+        self.assertEqual(api.get_milestones_fulfillers([]), {})
+        with self.assertRaises(exceptions.InvalidMilestoneException):
+            api.get_milestones_fulfillers([self.test_milestone, {}])
+
     def test_remove_course_references(self):
         """ Unit Test: test_remove_course_references """
         # Add a course dependency on the test milestone
@@ -475,6 +649,25 @@ class MilestonesApiTestCase(utils.MilestonesTestCaseBase):
         self.assertEqual(
             len(api.get_course_content_milestones(self.test_course_key, self.test_content_key)), 0)
 
+    def test_add_links_after_references_removal(self):
+        """ Unit Test: test_add_links_after_references_removal """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', self.test_milestone)
+        api.remove_course_references(self.test_course_key)
+
+        # The removed links have not been purged yet, so they are brought back
+        api.add_course_milestone(self.test_course_key, 'fulfills', self.test_milestone)
+        api.add_course_content_milestone(
+            self.test_course_key,
+            self.test_content_key,
+            'fulfills',
+            self.test_milestone
+        )
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key, 'fulfills')), 1)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key, 'requires')), 0)
+        self.assertEqual(
+            len(api.get_course_content_milestones(self.test_course_key, self.test_content_key, 'fulfills')), 1)
+
     def test_get_course_milestones_fulfillment_paths(self):  # pylint: disable=too-many-statements
         """
         Unit Test: test_get_course_milestones_fulfillment_paths
@@ -0,0 +1,40 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+Milestones Bitsets Module Test Cases
+"""
+from django.test import SimpleTestCase
+
+import milestones.bitsets as bitsets
+
+
+class MilestonesBitsetsTestCase(SimpleTestCase):
+    """
+    Test suite for the milestone id bitset helpers
+    """
+    def setUp(self):
+        """
+        Bitsets Test Case scaffolding
+        """
+        self.universe = bitsets.MilestoneUniverse([900000, 7, 42, 7])
+
+    def test_universe(self):
+        """ Unit Test: test_universe """
+        self.assertEqual(len(self.universe), 3)
+        self.assertEqual(self.universe.milestone_ids, (7, 42, 900000))
+        self.assertEqual(self.universe.bits([7, 900000, 13]), 0b101)
+        self.assertEqual(self.universe.ids(0b101), [7, 900000])
+        self.assertEqual(self.universe.ids(0), [])
+
+    def test_set_operations(self):
+        """ Unit Test: test_set_operations """
+        required = self.universe.bits([7, 42, 900000])
+        earned = self.universe.bits([42])
+        self.assertEqual(self.universe.ids(bitsets.difference(required, earned)), [7, 900000])
+        self.assertEqual(self.universe.ids(bitsets.intersection(required, earned)), [42])
+        self.assertEqual(bitsets.count(required), 3)
+        self.assertEqual(bitsets.count(0), 0)
+        self.assertEqual(
+            bitsets.differences(required, {1: earned, 2: required, 3: 0}),
+            {1: 0b101, 2: 0, 3: required}
+        )
@@ -0,0 +1,145 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+Milestones Caching Module Test Cases
+"""
+from django.core.cache import cache
+from django.test.utils import override_settings
+import mock
+
+import milestones.caching as caching
+from milestones.models import MilestoneRelationshipType
+import milestones.tests.utils as utils
+
+
+@override_settings(MILESTONES_CACHE_TIMEOUT=60, MILESTONES_CACHE_LOCK_WAIT=0)
+class MilestonesCachingTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the single-flight/stale-while-revalidate cache filling
+    """
+    def setUp(self):
+        """
+        Caching Test Case scaffolding
+        """
+        super(MilestonesCachingTestCase, self).setUp()
+        self.key = caching.course_milestones_key(self.test_course_key, 'requires')
+        self.built = []
+
+    def _build(self, keys):
+        """
+        Records which keys had to be rebuilt
+        """
+        self.built.extend(keys)
+        return dict((key, 'rebuilt') for key in keys)
+
+    def _expire(self, value):
+        """
+        Leaves an expired (stale) entry in the cache
+        """
+        cache.set(self.key, {'value': value, 'fresh_until': 0}, 60)
+
+    def test_fresh_entry_is_served(self):
+        """ Unit Test: test_fresh_entry_is_served """
+        caching.set_many({self.key: 'cached'})
+        self.assertEqual(caching.get_or_build([self.key], self._build), {self.key: 'cached'})
+        self.assertEqual(self.built, [])
+
+    def test_missing_entry_is_built_and_stored(self):
+        """ Unit Test: test_missing_entry_is_built_and_stored """
+        self.assertEqual(caching.get_or_build([self.key], self._build), {self.key: 'rebuilt'})
+        self.assertEqual(caching.get_or_build([self.key], self._build), {self.key: 'rebuilt'})
+        self.assertEqual(self.built, [self.key])
+        self.assertIsNone(cache.get('{}.lock'.format(self.key)))
+
+    def test_stale_entry_is_rebuilt_by_lock_holder(self):
+        """ Unit Test: test_stale_entry_is_rebuilt_by_lock_holder """
+        self._expire('stale')
+        self.assertEqual(caching.get_or_build([self.key], self._build), {self.key: 'rebuilt'})
+        self.assertEqual(self.built, [self.key])
+
+    def test_stale_entry_is_served_while_another_worker_rebuilds(self):
+        """ Unit Test: test_stale_entry_is_served_while_another_worker_rebuilds """
+        self._expire('stale')
+        cache.add('{}.lock'.format(self.key), True, 60)
+        self.assertEqual(caching.get_or_build([self.key], self._build), {self.key: 'stale'})
+        self.assertEqual(self.built, [])
+
+    def test_missing_entry_is_built_when_lock_holder_is_slow(self):
+        """ Unit Test: test_missing_entry_is_built_when_lock_holder_is_slow """
+        cache.add('{}.lock'.format(self.key), True, 60)
+        self.assertEqual(caching.get_or_build([self.key], self._build), {self.key: 'rebuilt'})
+        self.assertEqual(self.built, [self.key])
+
+    def test_lock_is_released_when_build_fails(self):
+        """ Unit Test: test_lock_is_released_when_build_fails """
+        def failing_build(keys):
+            """ Simulates a failed recomputation """
+            raise ValueError(keys)
+        with self.assertRaises(ValueError):
+            caching.get_or_build([self.key], failing_build)
+        self.assertIsNone(cache.get('{}.lock'.format(self.key)))
+
+    def test_invalidated_entry_is_not_served_stale(self):
+        """ Unit Test: test_invalidated_entry_is_not_served_stale """
+        caching.set_many({self.key: 'cached'})
+        caching.delete_many([self.key])
+        cache.add('{}.lock'.format(self.key), True, 60)
+        self.assertEqual(caching.get_or_build([self.key], self._build), {self.key: 'rebuilt'})
+
+    @override_settings(MILESTONES_CACHE_TIMEOUT=None)
+    def test_caching_disabled(self):
+        """ Unit Test: test_caching_disabled """
+        caching.get_or_build([self.key], self._build)
+        caching.get_or_build([self.key], self._build)
+        self.assertEqual(self.built, [self.key, self.key])
+        relationship_type = MilestoneRelationshipType.objects.create(name='unlocks', active=True)
+        caching.set_relationship_type(relationship_type)
+        self.assertIsNone(caching.get_relationship_type('unlocks'))
+        self.assertIsNone(cache.get(caching.relationship_type_key('unlocks')))
+
+    def test_backend_is_built_once(self):
+        """ Unit Test: test_backend_is_built_once """
+        with mock.patch('milestones.caching.get_cache', wraps=caching.get_cache) as get_cache:
+            caching._BACKENDS.clear()  # pylint: disable=protected-access
+            for __ in range(3):
+                caching.set_many({self.key: 'cached'})
+                caching.get_or_build([self.key], self._build)
+        self.assertEqual(get_cache.call_count, 1)
+
+    def test_local_entry_is_served_without_shared_cache(self):
+        """ Unit Test: test_local_entry_is_served_without_shared_cache """
+        key = caching.milestone_key(1)
+        self.assertEqual(caching.get_or_build_local([key], self._build), {key: 'rebuilt'})
+        cache.clear()
+        self.assertEqual(caching.get_or_build_local([key], self._build), {key: 'rebuilt'})
+        self.assertEqual(self.built, [key])
+        caching.delete_many([key])
+        caching.get_or_build_local([key], self._build)
+        self.assertEqual(self.built, [key, key])
+
+    @override_settings(MILESTONES_LOCAL_CACHE_SIZE=2)
+    def test_least_recently_used_local_entry_is_evicted(self):
+        """ Unit Test: test_least_recently_used_local_entry_is_evicted """
+        keys = [caching.milestone_key(milestone_id) for milestone_id in range(3)]
+        caching.get_or_build_local(keys[:2], self._build)
+        caching.get_or_build_local(keys[:1], self._build)
+        caching.get_or_build_local(keys[2:], self._build)
+        cache.clear()
+        caching.get_or_build_local(keys, self._build)
+        self.assertEqual(self.built, keys + keys[1:2])
+
+    def test_local_entries_expire(self):
+        """ Unit Test: test_local_entries_expire """
+        key = caching.namespace_milestones_key('expiring.milestones')
+        with override_settings(MILESTONES_LOCAL_CACHE_TIMEOUT=-1):
+            caching.get_or_build_local([key], self._build)
+        cache.clear()
+        caching.get_or_build_local([key], self._build)
+        self.assertEqual(self.built, [key, key])
+
+    def test_local_values_are_copies(self):
+        """ Unit Test: test_local_values_are_copies """
+        key = caching.milestone_key(1)
+        caching.get_or_build_local([key], lambda keys: {key: [{'name': 'Cached'}]})[key][0]['name'] = 'Changed'
+        self.assertEqual(caching.get_or_build_local([key], self._build), {key: [{'name': 'Cached'}]})
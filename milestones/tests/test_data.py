@@ -1,11 +1,27 @@
+# pylint: disable=no-member,too-many-lines
 # pylint: disable=invalid-name
 # pylint: disable=too-many-public-methods
 """
 Milestones Data Module Test Cases
 """
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+import mock
+from opaque_keys.edx.keys import CourseKey, UsageKey
+
 import milestones.api as api
+import milestones.archive as archive
+import milestones.changefeed as changefeed
 import milestones.data as data
 import milestones.exceptions as exceptions
+import milestones.graph as graph
+from milestones.models import (
+    ArchivedUserMilestone, CourseContentMilestone, CourseMilestone, InvalidationRecord, Milestone,
+    MilestoneHolderCount, MilestoneTombstone, UserMilestone
+)
+import milestones.monitoring as monitoring
+import milestones.projections as projections
+import milestones.storage as storage
 import milestones.tests.utils as utils
 
 
@@ -142,3 +158,1084 @@ class MilestonesDataTestCase(utils.MilestonesTestCaseBase):
             milestone1
         )
         self.assertEqual(len(data.fetch_milestone_course_content(milestone1)), 1)
+
+    @override_settings(MILESTONES_LARGE_RESULT_THRESHOLD=1)
+    def test_fetch_courses_milestones_large_result_logged(self):
+        """ Unit Test: test_fetch_courses_milestones_large_result_logged"""
+        for index in range(2):
+            milestone = api.add_milestone({
+                'name': 'Test Milestone {}'.format(index),
+                'namespace': unicode(self.test_course_key),
+                'description': 'Test Milestone Description',
+            })
+            api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        with mock.patch('milestones.monitoring.log') as mock_log:
+            data.fetch_courses_milestones([self.test_course_key], 'requires', self.serialized_test_user)
+        self.assertEqual(mock_log.warning.call_count, 1)
+        record = mock_log.warning.call_args[1]['extra']['milestones_call']
+        self.assertEqual(record['function'], 'fetch_courses_milestones')
+        self.assertEqual(record['rows'], 2)
+        self.assertTrue(record['large'])
+        self.assertEqual(record['course_keys'], [unicode(self.test_course_key)])
+        self.assertEqual(record['user_id'], self.serialized_test_user['id'])
+        self.assertTrue(record['sql'])
+
+    @override_settings(MILESTONES_SLOW_CALL_THRESHOLD_MS=0)
+    def test_fetch_user_milestones_slow_call_logged(self):
+        """ Unit Test: test_fetch_user_milestones_slow_call_logged"""
+        with mock.patch('milestones.monitoring.log') as mock_log:
+            data.fetch_user_milestones(self.serialized_test_user)
+        record = mock_log.warning.call_args[1]['extra']['milestones_call']
+        self.assertEqual(record['function'], 'fetch_user_milestones')
+        self.assertTrue(record['slow'])
+        self.assertFalse(record['large'])
+        self.assertEqual(record['user_id'], self.serialized_test_user['id'])
+
+    @override_settings(MILESTONES_SLOW_CALL_THRESHOLD_MS=0)
+    def test_nested_calls_report_their_own_queries(self):
+        """ Unit Test: test_nested_calls_report_their_own_queries"""
+        def outer(user):
+            """ Makes a query of its own around the monitored fetch_user_milestones """
+            data.fetch_user_milestones(user)
+            return list(Milestone.objects.values_list('id', flat=True))
+
+        with mock.patch('milestones.monitoring.log') as mock_log:
+            monitoring.monitored(outer)(self.serialized_test_user)
+        records = [call[1]['extra']['milestones_call'] for call in mock_log.warning.call_args_list]
+        self.assertEqual([record['function'] for record in records], ['fetch_user_milestones', 'outer'])
+        self.assertTrue(records[0]['sql'])
+        self.assertEqual(records[1]['sql'][:len(records[0]['sql'])], records[0]['sql'])
+        self.assertEqual(len(records[1]['sql']), len(records[0]['sql']) + 1)
+
+    def test_fetch_user_milestones_thresholds_disabled(self):
+        """ Unit Test: test_fetch_user_milestones_thresholds_disabled"""
+        with mock.patch('milestones.monitoring.log') as mock_log:
+            data.fetch_user_milestones(self.serialized_test_user)
+        self.assertFalse(mock_log.warning.called)
+
+    @override_settings(MILESTONES_CACHE_TIMEOUT=60)
+    def test_cached_course_milestones_invalidated_by_writes(self):
+        """ Unit Test: test_cached_course_milestones_invalidated_by_writes"""
+        milestone = api.add_milestone({
+            'name': 'Test Milestone',
+            'namespace': unicode(self.test_course_key),
+            'description': 'Test Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', milestone)
+        self.assertEqual(len(data.fetch_courses_milestones([self.test_course_key], 'requires')), 1)
+        self.assertEqual(len(data.fetch_course_content_milestones(self.test_course_key, self.test_content_key)), 1)
+
+        milestone['name'] = 'Edited Milestone'
+        api.edit_milestone(milestone)
+        self.assertEqual(
+            data.fetch_courses_milestones([self.test_course_key], 'requires')[0]['name'],
+            'Edited Milestone'
+        )
+        self.assertEqual(
+            data.fetch_course_content_milestones(self.test_course_key, self.test_content_key)[0]['name'],
+            'Edited Milestone'
+        )
+
+        api.add_user_milestone(self.serialized_test_user, milestone)
+        self.assertEqual(
+            len(data.fetch_courses_milestones([self.test_course_key], 'requires', self.serialized_test_user)),
+            0
+        )
+
+        api.remove_content_references(self.test_content_key)
+        self.assertEqual(len(data.fetch_course_content_milestones(self.test_course_key, self.test_content_key)), 0)
+        api.remove_milestone(milestone['id'])
+        self.assertEqual(len(data.fetch_courses_milestones([self.test_course_key])), 0)
+
+    @override_settings(MILESTONES_CACHE_TIMEOUT=60)
+    def test_cached_milestones_invalidated_by_writes(self):
+        """ Unit Test: test_cached_milestones_invalidated_by_writes"""
+        namespace = 'cached.milestones'
+        with self.assertNumQueries(2):
+            self.assertIsNone(api.get_milestone(12345))
+            self.assertEqual(api.get_milestones(namespace), [])
+        with self.assertNumQueries(0):
+            self.assertIsNone(api.get_milestone(12345))
+            self.assertEqual(api.get_milestones(namespace), [])
+        milestone = api.add_milestone({
+            'name': 'Cached Milestone',
+            'namespace': namespace,
+            'description': 'Cached Milestone Description',
+        })
+        with self.assertNumQueries(2):
+            self.assertEqual(api.get_milestone(milestone['id'])['name'], 'Cached Milestone')
+            self.assertEqual(len(api.get_milestones(namespace)), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(api.get_milestone(milestone['id'])['name'], 'Cached Milestone')
+            self.assertEqual(len(api.get_milestones(namespace)), 1)
+
+        milestone['namespace'] = 'moved.milestones'
+        api.edit_milestone(milestone)
+        self.assertEqual(api.get_milestone(milestone['id'])['namespace'], 'moved.milestones')
+        self.assertEqual(api.get_milestones(namespace), [])
+        self.assertEqual(len(api.get_milestones('moved.milestones')), 1)
+
+        api.deactivate_namespace_milestones('moved.milestones')
+        self.assertIsNone(api.get_milestone(milestone['id']))
+        api.reactivate_namespace_milestones('moved.milestones')
+        self.assertEqual(len(api.get_milestones('moved.milestones')), 1)
+        api.remove_milestone(milestone['id'])
+        self.assertIsNone(api.get_milestone(milestone['id']))
+        self.assertEqual(api.get_milestones('moved.milestones'), [])
+
+    @override_settings(MILESTONES_COURSE_ACCESS_PROJECTION=True)
+    def test_course_access_projection_maintained_incrementally(self):
+        """ Unit Test: test_course_access_projection_maintained_incrementally"""
+        user = self.serialized_test_user
+        milestone1 = api.add_milestone({
+            'name': 'Test Milestone',
+            'namespace': unicode(self.test_course_key),
+            'description': 'Test Milestone Description',
+        })
+        milestone2 = api.add_milestone({
+            'name': 'Test Milestone 2',
+            'namespace': unicode(self.test_course_key),
+            'description': 'Test Milestone Description 2',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone1)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 1)
+
+        # Served from the projection from here on
+        with utils.CountQueries() as queries:
+            self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 1)
+        self.assertEqual(queries.count, 1)
+
+        api.add_course_milestone(self.test_course_key, 'requires', milestone2)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 2)
+        api.add_user_milestone(user, milestone1)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 1)
+        api.remove_course_milestone(self.test_course_key, milestone1)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 1)
+        api.remove_user_milestone(user, milestone1)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 1)
+        api.add_course_milestone(self.test_course_key, 'fulfills', milestone1)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 1)
+        api.remove_course_milestone(self.test_course_key, milestone2)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 0)
+
+        api.add_course_milestone(self.test_course_key, 'requires', milestone2)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 1)
+        api.remove_milestone(milestone2['id'])
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 0)
+        api.add_course_milestone(self.test_course_key, 'requires', milestone2)
+        api.remove_course_references(self.test_course_key)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 0)
+
+    @override_settings(MILESTONES_COURSE_ACCESS_PROJECTION=True, MILESTONES_CACHE_TIMEOUT=60)
+    def test_course_access_projection_seeded_from_primary(self):
+        """ Unit Test: test_course_access_projection_seeded_from_primary"""
+        user = self.serialized_test_user
+        milestones = [
+            api.add_milestone({
+                'name': 'Seeded Milestone {}'.format(index),
+                'namespace': 'seeded.milestones',
+                'description': 'Seeded Milestone Description',
+            })
+            for index in range(2)
+        ]
+        for milestone in milestones:
+            api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        self.assertEqual(len(api.get_course_required_milestones(self.test_course_key, user)), 2)
+
+        # Cached lookups, which may be stale, are not trusted for the seed
+        Milestone.objects.filter(id=milestones[1]['id']).update(active=False)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(self.test_course_key, user), 1)
+
+        # An award landing once the seed has been counted is picked up by the recount
+        count_unmet_milestones = projections._count_unmet_milestones  # pylint: disable=protected-access
+
+        def award_after_counting(user_id, required_ids):
+            """ Simulates an award committing between the seed count and the row insert """
+            unmet_count = count_unmet_milestones(user_id, required_ids)
+            UserMilestone.objects.get_or_create(user_id=user_id, milestone_id=milestones[0]['id'])
+            return unmet_count
+        other_course_key = CourseKey.from_string('the/other/key')
+        api.add_course_milestone(other_course_key, 'requires', milestones[0])
+        with mock.patch('milestones.projections._count_unmet_milestones', side_effect=award_after_counting):
+            data.fetch_course_unmet_milestones_count(other_course_key, user)
+        self.assertEqual(data.fetch_course_unmet_milestones_count(other_course_key, user), 0)
+
+    def _assert_prerequisite_chains(self, expected):
+        """
+        Checks the prerequisite chains, both computed live and from the index
+        """
+        for course_key, chain in expected.items():
+            chain = [{'course_id': unicode(course_id), 'depth': depth} for course_id, depth in chain]
+            self.assertEqual(projections.fetch_course_prerequisites(course_key), chain)
+            with override_settings(MILESTONES_PREREQUISITE_INDEX=False):
+                self.assertEqual(projections.fetch_course_prerequisites(course_key), chain)
+
+    @override_settings(MILESTONES_PREREQUISITE_INDEX=True)
+    def test_prerequisite_index_maintained_incrementally(self):
+        """ Unit Test: test_prerequisite_index_maintained_incrementally"""
+        course_a, course_b, course_c = [CourseKey.from_string('chain/course/{}'.format(name)) for name in 'abc']
+        milestones = [
+            api.add_milestone({
+                'name': 'Chain Milestone {}'.format(index),
+                'namespace': 'chain.milestones',
+                'description': 'Chain Milestone Description',
+            })
+            for index in range(3)
+        ]
+        api.add_course_milestone(course_a, 'requires', milestones[0])
+        api.add_course_milestone(course_b, 'fulfills', milestones[0])
+        api.add_course_milestone(course_c, 'fulfills', milestones[1])
+        self._assert_prerequisite_chains({course_a: [(course_b, 1)], course_b: [], course_c: []})
+
+        # Extending the chain reaches every dependent course
+        api.add_course_milestone(course_b, 'requires', milestones[1])
+        self._assert_prerequisite_chains({course_a: [(course_b, 1), (course_c, 2)], course_b: [(course_c, 1)]})
+
+        # Cycles are detected and reported, without looping
+        with mock.patch('milestones.projections.log') as mock_log:
+            api.add_course_milestone(course_c, 'requires', milestones[2])
+            api.add_course_milestone(course_a, 'fulfills', milestones[2])
+        self.assertTrue(mock_log.warning.called)
+        self._assert_prerequisite_chains({
+            course_a: [(course_b, 1), (course_c, 2)],
+            course_c: [(course_a, 1), (course_b, 2)],
+        })
+
+        api.remove_course_milestone(course_a, milestones[2])
+        api.remove_course_milestone(course_b, milestones[1])
+        self._assert_prerequisite_chains({course_a: [(course_b, 1)], course_b: [], course_c: []})
+
+        api.add_course_milestone(course_b, 'requires', milestones[1])
+        api.remove_milestone(milestones[1]['id'])
+        self._assert_prerequisite_chains({course_a: [(course_b, 1)], course_b: []})
+
+        api.remove_course_references(course_b)
+        self._assert_prerequisite_chains({course_a: []})
+
+    def test_batch_gating_checks(self):
+        """ Unit Test: test_batch_gating_checks"""
+        milestones = [
+            api.add_milestone({
+                'name': 'Batch Milestone {}'.format(index),
+                'namespace': 'batch.milestones',
+                'description': 'Batch Milestone Description',
+            })
+            for index in range(3)
+        ]
+        for milestone in milestones:
+            api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_milestone(self.test_prerequisite_course_key, 'requires', milestones[0])
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', milestones[1])
+
+        users = [{'id': user_id} for user_id in range(1, data.EARNED_BITSETS_BATCH_SIZE * 2 + 2)]
+        for user in users[::2]:
+            api.add_user_milestone(user, milestones[0])
+        for user in users[::3]:
+            api.add_user_milestone(user, milestones[2])
+
+        with utils.CountQueries() as queries:
+            counts = data.fetch_users_unmet_milestones_counts(self.test_course_key, users)
+        # One query for the relationship type, one for the course requirements, then one per batch of users
+        self.assertEqual(queries.count, 5)
+        self.assertEqual(len(counts), len(users))
+        self.assertEqual(counts[1], 1)
+        self.assertEqual(counts[2], 3)
+        self.assertEqual(counts[3], 2)
+        self.assertEqual(counts[4], 2)
+
+        ungated_course_key = CourseKey.from_string('the/ungated/key')
+        self.assertEqual(
+            data.fetch_courses_unmet_milestone_ids(
+                [self.test_course_key, self.test_prerequisite_course_key, ungated_course_key], users[3]
+            ),
+            {
+                unicode(self.test_course_key): [milestones[0]['id'], milestones[1]['id']],
+                unicode(self.test_prerequisite_course_key): [milestones[0]['id']],
+                unicode(ungated_course_key): [],
+            }
+        )
+        self.assertEqual(data.fetch_users_unmet_milestones_counts(ungated_course_key, users[:2]), {1: 0, 2: 0})
+
+    @override_settings(MILESTONES_CHANGE_FEED_LAG=0)
+    def test_change_feed(self):
+        """ Unit Test: test_change_feed"""
+        milestone = api.add_milestone({
+            'name': 'Feed Milestone',
+            'namespace': 'feed.milestones',
+            'description': 'Feed Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'fulfills', milestone)
+        api.add_user_milestone(self.serialized_test_user, milestone)
+
+        # Page through one change at a time
+        changes = []
+        cursor = None
+        with utils.CountQueries() as queries:
+            for __ in range(4):
+                page = changefeed.fetch_changes(cursor, limit=1)
+                changes.extend(page['changes'])
+                cursor = page['cursor']
+        self.assertEqual(queries.count, 20)
+        self.assertEqual(
+            [(change['entity'], change['action']) for change in changes],
+            [('course_milestone', 'insert'), ('course_content_milestone', 'insert'), ('user_milestone', 'insert')]
+        )
+        self.assertEqual(changes[0]['course_id'], unicode(self.test_course_key))
+        self.assertEqual(changes[0]['relationship'], 'requires')
+        self.assertEqual(changes[1]['content_id'], unicode(self.test_content_key))
+        self.assertEqual(changes[2]['user_id'], self.serialized_test_user['id'])
+        self.assertTrue(changes[2]['active'])
+
+        # Resuming from the cursor only reports what happened since
+        user_milestone = UserMilestone.objects.get(user_id=self.serialized_test_user['id'])
+        user_milestone.source = 'Updated'
+        user_milestone.save()
+        api.remove_course_references(self.test_course_key)
+        page = changefeed.fetch_changes(cursor)
+        self.assertEqual(
+            [(change['entity'], change['action'], change['milestone_id']) for change in page['changes']],
+            [
+                ('user_milestone', 'update', milestone['id']),
+                ('course_milestone', 'update', milestone['id']),
+                ('course_content_milestone', 'update', milestone['id']),
+            ]
+        )
+        self.assertFalse(page['changes'][1]['active'])
+        self.assertFalse(page['changes'][2]['active'])
+        self.assertEqual(changefeed.fetch_changes(page['cursor']), {'changes': [], 'cursor': page['cursor']})
+
+        # The deactivated links are only reported deleted once they have been purged
+        self.assertEqual(storage.purge_inactive_links(), 2)
+        page = changefeed.fetch_changes(page['cursor'])
+        self.assertEqual(
+            [(change['entity'], change['action'], change['milestone_id']) for change in page['changes']],
+            [
+                ('course_milestone', 'delete', milestone['id']),
+                ('course_content_milestone', 'delete', milestone['id']),
+            ]
+        )
+        self.assertEqual(page['changes'][0]['relationship'], 'requires')
+        self.assertEqual(page['changes'][1]['relationship'], 'fulfills')
+
+        api.remove_milestone(milestone['id'])
+        self.assertEqual(
+            [(change['entity'], change['action']) for change in changefeed.fetch_changes(page['cursor'])['changes']],
+            [('user_milestone', 'delete')]
+        )
+
+    @override_settings(MILESTONES_CHANGE_FEED_LAG=0)
+    def test_change_feed_reports_restored_links_as_inserts(self):
+        """ Unit Test: test_change_feed_reports_restored_links_as_inserts"""
+        milestone = api.add_milestone({
+            'name': 'Feed Milestone',
+            'namespace': 'feed.milestones',
+            'description': 'Feed Milestone Description',
+        })
+        api.add_user_milestone(self.serialized_test_user, milestone)
+        archived_id = UserMilestone.objects.get().id
+        cursor = changefeed.fetch_changes()['cursor']
+
+        archive.archive_user_milestones([self.serialized_test_user['id']])
+        archive.restore_user_milestones(self.serialized_test_user)
+        restored_id = UserMilestone.objects.get().id
+        self.assertEqual(
+            [
+                (change['entity'], change['action'], change['id'])
+                for change in changefeed.fetch_changes(cursor)['changes']
+            ],
+            [('user_milestone', 'delete', archived_id), ('user_milestone', 'insert', restored_id)]
+        )
+
+    def test_purge_keeps_reactivated_links(self):
+        """ Unit Test: test_purge_keeps_reactivated_links"""
+        milestone = api.add_milestone({
+            'name': 'Purged Milestone',
+            'namespace': 'purged.milestones',
+            'description': 'Purged Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', milestone)
+        api.remove_course_references(self.test_course_key)
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+
+        # The batch is read and locked within the purge's transaction
+        with mock.patch(
+            'django.db.models.query.QuerySet.select_for_update',
+            autospec=True,
+            side_effect=lambda queryset: queryset,
+        ) as select_for_update:
+            self.assertEqual(storage.purge_inactive_links(), 1)
+        self.assertEqual(select_for_update.call_count, 2)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+        self.assertFalse(CourseContentMilestone.objects.exists())
+        self.assertEqual(
+            list(MilestoneTombstone.objects.values_list('entity', flat=True)),
+            ['course_content_milestone']
+        )
+
+    def test_change_feed_waits_for_changes_to_settle(self):
+        """ Unit Test: test_change_feed_waits_for_changes_to_settle"""
+        api.add_user_milestone(self.serialized_test_user, api.add_milestone({
+            'name': 'Feed Milestone',
+            'namespace': 'feed.milestones',
+            'description': 'Feed Milestone Description',
+        }))
+        self.assertEqual(changefeed.fetch_changes(), {'changes': [], 'cursor': None})
+
+    def test_change_feed_invalid_cursor(self):
+        """ Unit Test: test_change_feed_invalid_cursor"""
+        for cursor in ('', 'garbage', '20140101T000000000000_x_1', 12):
+            with self.assertRaises(exceptions.InvalidChangeCursorException):
+                changefeed.fetch_changes(cursor)
+
+    @override_settings(MILESTONES_HOLDER_COUNTS=True, MILESTONES_HOLDER_COUNT_SHARDS=4)
+    def test_holder_counts_are_maintained(self):
+        """ Unit Test: test_holder_counts_are_maintained"""
+        milestones = [
+            api.add_milestone({
+                'name': 'Holder Milestone {}'.format(index),
+                'namespace': 'holder.milestones',
+                'description': 'Holder Milestone {} Description'.format(index),
+            })
+            for index in range(2)
+        ]
+        users = [{'id': user_id} for user_id in range(1, 11)]
+        for user in users:
+            api.add_user_milestone(user, milestones[0])
+            api.add_user_milestone(user, milestones[0])
+        api.add_user_milestone(users[0], milestones[1])
+        api.remove_user_milestone(users[1], milestones[0])
+        api.remove_user_milestone(users[1], milestones[1])
+
+        expected = {milestones[0]['id']: 9, milestones[1]['id']: 1}
+        self.assertEqual(projections.fetch_milestones_holder_counts(milestones), expected)
+        self.assertEqual(MilestoneHolderCount.objects.filter(milestone_id=milestones[0]['id']).count(), 4)
+        with override_settings(MILESTONES_HOLDER_COUNTS=False):
+            self.assertEqual(projections.fetch_milestones_holder_counts(milestones), expected)
+        self.assertEqual(projections.reconcile_holder_counts(), (2, 0))
+
+        api.remove_milestone(milestones[0]['id'])
+        self.assertFalse(MilestoneHolderCount.objects.filter(milestone_id=milestones[0]['id']).exists())
+        self.assertEqual(projections.fetch_milestones_holder_counts(milestones), {
+            milestones[0]['id']: 0,
+            milestones[1]['id']: 1,
+        })
+        self.assertEqual(projections.fetch_milestones_holder_counts([]), {})
+
+    def test_iter_course_blocked_users(self):
+        """ Unit Test: test_iter_course_blocked_users"""
+        milestones = [
+            api.add_milestone({
+                'name': 'Blocking Milestone {}'.format(index),
+                'namespace': 'blocking.milestones',
+                'description': 'Blocking Milestone {} Description'.format(index),
+            })
+            for index in range(3)
+        ]
+        for milestone in milestones:
+            api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        for user_id in range(1, 8):
+            for milestone in milestones[:user_id % 4]:
+                api.add_user_milestone({'id': user_id}, milestone)
+        milestone_ids = [milestone['id'] for milestone in milestones]
+
+        # The user ids are consumed lazily, a chunk at a time
+        user_ids = iter(range(7, 0, -1))
+        blocked_users = data.iter_course_blocked_users(self.test_course_key, user_ids, chunk_size=2)
+        self.assertEqual(next(blocked_users), (6, milestone_ids[2:]))
+        self.assertEqual(list(user_ids), [5, 4, 3, 2, 1])
+        self.assertEqual(
+            list(data.iter_course_blocked_users(self.test_course_key, range(7, 0, -1), chunk_size=2)),
+            [(6, milestone_ids[2:]), (5, milestone_ids[1:]), (4, milestone_ids), (2, milestone_ids[2:]),
+             (1, milestone_ids[1:])]
+        )
+        self.assertEqual(list(data.iter_course_blocked_users(self.test_prerequisite_course_key, [1])), [])
+
+    @override_settings(
+        MILESTONES_HOLDER_COUNTS=True,
+        MILESTONES_PREREQUISITE_INDEX=True,
+        MILESTONES_COURSE_ACCESS_PROJECTION=True,
+    )
+    def test_graph_round_trip(self):
+        """ Unit Test: test_graph_round_trip"""
+        milestone = api.add_milestone({
+            'name': 'Graph Milestone',
+            'namespace': 'graph.milestones',
+            'description': 'Graph Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', milestone)
+        api.add_user_milestone(self.serialized_test_user, milestone)
+        records = list(graph.iter_graph_records(include_users=True, batch_size=2))
+        self.assertEqual(len(records), 5)
+        self.assertEqual(list(graph.iter_graph_records()), records[:-1])
+
+        # The milestone is recreated with a new id, and every link remapped to it
+        api.remove_milestone(milestone['id'])
+        api.add_milestone({'name': 'Other Milestone', 'namespace': 'other.milestones', 'description': 'Other'})
+        user = {'id': self.serialized_test_user['id'] + 1}
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, user), 0)
+        inserted = graph.import_graph_records(records, batch_size=2)
+        self.assertEqual(inserted, {
+            'milestone': 1,
+            'course_milestone': 2,
+            'course_content_milestone': 1,
+            'user_milestone': 1,
+        })
+        imported = api.get_milestones('graph.milestones')
+        self.assertNotEqual(imported[0]['id'], milestone['id'])
+        self.assertEqual(len(api.get_course_content_milestones(self.test_course_key, self.test_content_key)), 1)
+        self.assertEqual(api.get_course_required_milestones(self.test_course_key, self.serialized_test_user), [])
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, user), 1)
+        self.assertEqual(projections.fetch_milestones_holder_counts(imported), {imported[0]['id']: 1})
+        self.assertEqual(
+            projections.fetch_course_prerequisites(self.test_course_key),
+            [{'course_id': unicode(self.test_prerequisite_course_key), 'depth': 1}]
+        )
+
+        # Existing records are skipped
+        self.assertEqual(graph.import_graph_records(records), dict((key, 0) for key in inserted))
+        self.assertEqual(projections.reconcile_holder_counts(), (1, 0))
+
+    def test_graph_import_unknown_milestone(self):
+        """ Unit Test: test_graph_import_unknown_milestone"""
+        with self.assertRaises(exceptions.InvalidMilestoneException):
+            graph.import_graph_records([{
+                'type': 'user_milestone',
+                'user_id': self.serialized_test_user['id'],
+                'namespace': 'missing.milestones',
+                'name': 'Missing Milestone',
+            }])
+
+    def test_graph_import_reactivates_links(self):
+        """ Unit Test: test_graph_import_reactivates_links"""
+        milestone = api.add_milestone({
+            'name': 'Graph Milestone',
+            'namespace': 'graph.milestones',
+            'description': 'Graph Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', milestone)
+        records = list(graph.iter_graph_records())
+        api.remove_course_references(self.test_course_key)
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        self.assertEqual(graph.import_graph_records(records), {
+            'milestone': 0,
+            'course_milestone': 1,
+            'course_content_milestone': 1,
+            'user_milestone': 0,
+        })
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key, 'requires')), 1)
+        self.assertEqual(len(api.get_course_content_milestones(self.test_course_key, self.test_content_key)), 1)
+        self.assertEqual(graph.import_graph_records(records)['course_milestone'], 0)
+
+    def test_clone_course_milestones(self):
+        """ Unit Test: test_clone_course_milestones"""
+        source_key = CourseKey.from_string('course-v1:the+course+2014')
+        target_key = CourseKey.from_string('course-v1:the+course+2015')
+        milestones = [
+            api.add_milestone({
+                'name': 'Rerun Milestone {}'.format(index),
+                'namespace': 'rerun.milestones',
+                'description': 'Rerun Milestone {} Description'.format(index),
+            })
+            for index in range(3)
+        ]
+        self.assertEqual(graph.clone_course_milestones(source_key, target_key), {
+            'course_milestone': 0,
+            'course_content_milestone': 0,
+        })
+
+        # The number of queries does not depend upon the number of links
+        small_key = CourseKey.from_string('course-v1:the+small+2014')
+        api.add_course_milestone(small_key, 'requires', milestones[0])
+        api.add_course_content_milestone(
+            small_key, small_key.make_usage_key('problem', 'exam'), 'requires', milestones[0]
+        )
+        for milestone in milestones:
+            api.add_course_milestone(source_key, 'requires', milestone)
+            api.add_course_content_milestone(
+                source_key, source_key.make_usage_key('problem', 'exam'), 'requires', milestone
+            )
+            api.add_course_content_milestone(
+                source_key, source_key.make_usage_key('problem', milestone['name'][-1]), 'fulfills', milestone
+            )
+        api.add_course_milestone(target_key, 'fulfills', milestones[2])
+        data.warm_relationship_types()
+        with utils.CountQueries() as small_queries:
+            graph.clone_course_milestones(small_key, CourseKey.from_string('course-v1:the+small+2015'))
+        with utils.CountQueries() as queries:
+            self.assertEqual(graph.clone_course_milestones(source_key, target_key), {
+                'course_milestone': 2,
+                'course_content_milestone': 6,
+            })
+        self.assertEqual(queries.count, small_queries.count)
+        self.assertEqual(
+            [milestone['id'] for milestone in api.get_course_milestones(target_key, 'requires')],
+            [milestone['id'] for milestone in milestones[:2]]
+        )
+        self.assertEqual(
+            len(api.get_course_content_milestones(target_key, target_key.make_usage_key('problem', 'exam'))),
+            3
+        )
+
+        # Content keys can be remapped, or left out
+        other_key = CourseKey.from_string('course-v1:the+course+2016')
+        exam_key = source_key.make_usage_key('problem', 'exam')
+        cloned = graph.clone_course_milestones(
+            source_key,
+            other_key,
+            lambda content_key: exam_key.map_into_course(self.test_course_key) if content_key == exam_key else None
+        )
+        self.assertEqual(cloned, {'course_milestone': 3, 'course_content_milestone': 3})
+        self.assertEqual(
+            CourseContentMilestone.objects.filter(course_id=unicode(other_key)).values_list('content_id').distinct()[0],
+            (unicode(exam_key.map_into_course(self.test_course_key)),)
+        )
+
+    def test_clone_course_milestones_skips_inactive_links(self):
+        """ Unit Test: test_clone_course_milestones_skips_inactive_links"""
+        source_key = CourseKey.from_string('course-v1:the+course+2014')
+        target_key = CourseKey.from_string('course-v1:the+course+2015')
+        milestones = [
+            api.add_milestone({
+                'name': 'Rerun Milestone {}'.format(index),
+                'namespace': 'rerun.milestones',
+                'description': 'Rerun Milestone {} Description'.format(index),
+            })
+            for index in range(3)
+        ]
+        exam_key = source_key.make_usage_key('problem', 'exam')
+        for milestone in milestones:
+            api.add_course_milestone(target_key, 'requires', milestone)
+            api.add_course_content_milestone(target_key, exam_key.map_into_course(target_key), 'requires', milestone)
+        api.remove_course_references(target_key)
+        api.add_course_content_milestone(source_key, exam_key, 'requires', milestones[2])
+        api.remove_content_references(exam_key)
+        for milestone in milestones[:2]:
+            api.add_course_milestone(source_key, 'requires', milestone)
+            api.add_course_content_milestone(source_key, exam_key, 'requires', milestone)
+        Milestone.objects.filter(id=milestones[1]['id']).update(active=False)
+
+        self.assertEqual(graph.clone_course_milestones(source_key, target_key), {
+            'course_milestone': 1,
+            'course_content_milestone': 1,
+        })
+        self.assertEqual(
+            [milestone['id'] for milestone in api.get_course_milestones(target_key, 'requires')],
+            [milestones[0]['id']]
+        )
+        self.assertEqual(
+            set(CourseMilestone.objects.filter(course_id=unicode(target_key)).values_list('milestone', 'active')),
+            set([(milestones[0]['id'], True), (milestones[1]['id'], False), (milestones[2]['id'], False)])
+        )
+        self.assertEqual(
+            CourseContentMilestone.objects.filter(course_id=unicode(target_key), active=True).count(),
+            1
+        )
+
+    @override_settings(MILESTONES_INVALIDATION_OUTBOX=True, MILESTONES_PREREQUISITE_INDEX=True)
+    def test_sync_course_milestones(self):
+        """ Unit Test: test_sync_course_milestones"""
+        milestones = [
+            api.add_milestone({
+                'name': 'Synced Milestone {}'.format(index),
+                'namespace': 'synced.milestones',
+                'description': 'Synced Milestone {} Description'.format(index),
+            })
+            for index in range(3)
+        ]
+        exam_key = UsageKey.from_string('i4x://the/course/problem/exam')
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', milestones[2])
+        api.add_course_milestone(self.test_course_key, 'requires', milestones[0])
+        api.add_course_content_milestone(self.test_course_key, exam_key, 'requires', milestones[0])
+        api.add_course_content_milestone(self.test_course_key, exam_key, 'requires', milestones[1])
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', milestones[1])
+        content_links = [
+            (exam_key, 'requires', milestones[0]),
+            (exam_key, 'fulfills', milestones[1]),
+            (exam_key, 'requires', milestones[2]),
+        ]
+        course_links = [('requires', milestones[0]), ('requires', milestones[2])]
+        self.assertEqual(graph.sync_course_milestones(self.test_course_key, content_links, course_links), {
+            'created': 2,
+            'updated': 1,
+            'deleted': 1,
+        })
+        self.assertEqual(
+            [milestone['id'] for milestone in api.get_course_content_milestones(self.test_course_key, exam_key)],
+            [milestone['id'] for milestone in milestones]
+        )
+        self.assertEqual(
+            len(api.get_course_content_milestones(self.test_course_key, exam_key, 'fulfills')),
+            1
+        )
+        self.assertEqual(api.get_course_content_milestones(self.test_course_key, self.test_content_key), [])
+        self.assertEqual(
+            projections.fetch_course_prerequisites(self.test_course_key),
+            [{'course_id': unicode(self.test_prerequisite_course_key), 'depth': 1}]
+        )
+
+        # Syncing to the current state only reads the relationship types and the links
+        outbox_records = InvalidationRecord.objects.count()
+        with self.assertNumQueries(3):
+            self.assertEqual(graph.sync_course_milestones(self.test_course_key, content_links, course_links), {
+                'created': 0,
+                'updated': 0,
+                'deleted': 0,
+            })
+        self.assertEqual(InvalidationRecord.objects.count(), outbox_records)
+
+        # Course links are left alone unless they are provided
+        self.assertEqual(graph.sync_course_milestones(self.test_course_key, []), {
+            'created': 0,
+            'updated': 0,
+            'deleted': 3,
+        })
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 2)
+
+    @override_settings(MILESTONES_HOLDER_COUNTS=True, MILESTONES_COURSE_ACCESS_PROJECTION=True)
+    def test_archive_user_milestones(self):
+        """ Unit Test: test_archive_user_milestones"""
+        milestones = [
+            api.add_milestone({
+                'name': 'Archived Milestone {}'.format(index),
+                'namespace': 'archived.milestones',
+                'description': 'Archived Milestone {} Description'.format(index),
+            })
+            for index in range(3)
+        ]
+        api.add_course_milestone(self.test_course_key, 'requires', milestones[0])
+        inactive_user, active_user = {'id': 1}, {'id': 2}
+        for milestone in milestones:
+            api.add_user_milestone(inactive_user, milestone)
+            api.add_user_milestone(active_user, milestone)
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, inactive_user), 0)
+        Milestone.objects.filter(id=milestones[2]['id']).update(active=False)
+
+        # Inactive users' rows and retired milestones' rows move to the archive a batch at a time
+        self.assertEqual(archive.archive_user_milestones([inactive_user['id']], batch_size=3), 3)
+        self.assertEqual(archive.archive_user_milestones([inactive_user['id']], batch_size=3), 1)
+        self.assertEqual(archive.archive_user_milestones([inactive_user['id']], batch_size=3), 0)
+        self.assertEqual(
+            sorted(UserMilestone.objects.values_list('user_id', 'milestone')),
+            [(active_user['id'], milestones[0]['id']), (active_user['id'], milestones[1]['id'])]
+        )
+        self.assertEqual(ArchivedUserMilestone.objects.count(), 4)
+        self.assertEqual(projections.fetch_milestones_holder_counts(milestones[:2]), {
+            milestones[0]['id']: 1,
+            milestones[1]['id']: 1,
+        })
+        self.assertEqual(projections.reconcile_holder_counts(), (3, 0))
+
+        # Archived rows are only read when asked for
+        self.assertEqual(api.get_user_milestones(inactive_user), [])
+        self.assertEqual(
+            [milestone['id'] for milestone in api.get_user_milestones(inactive_user, include_archived=True)],
+            [milestones[0]['id'], milestones[1]['id']]
+        )
+        self.assertFalse(api.user_has_milestone(inactive_user, milestones[0]))
+        self.assertTrue(api.user_has_milestone(inactive_user, milestones[0], include_archived=True))
+        self.assertFalse(api.user_has_milestone(inactive_user, milestones[2], include_archived=True))
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, inactive_user), 1)
+
+        # Restoring skips the milestones collected again in the meantime
+        api.add_user_milestone(inactive_user, milestones[1])
+        self.assertEqual(archive.restore_user_milestones(inactive_user), 2)
+        self.assertEqual(archive.restore_user_milestones(inactive_user), 0)
+        self.assertEqual(ArchivedUserMilestone.objects.filter(user_id=inactive_user['id']).count(), 0)
+        self.assertEqual(len(api.get_user_milestones(inactive_user)), 2)
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, inactive_user), 0)
+        self.assertEqual(projections.fetch_milestones_holder_counts(milestones[:2]), {
+            milestones[0]['id']: 2,
+            milestones[1]['id']: 2,
+        })
+        self.assertEqual(projections.reconcile_holder_counts(), (3, 0))
+
+        api.remove_milestone(milestones[2]['id'])
+        self.assertFalse(ArchivedUserMilestone.objects.exists())
+
+    @override_settings(MILESTONES_HOLDER_COUNTS=True)
+    def test_reactivation_restores_retired_awards(self):
+        """ Unit Test: test_reactivation_restores_retired_awards"""
+        milestones = [
+            api.add_milestone({
+                'name': 'Retired Milestone {}'.format(index),
+                'namespace': 'retired.milestones',
+                'description': 'Retired Milestone {} Description'.format(index),
+            })
+            for index in range(2)
+        ]
+        active_user, inactive_user = {'id': 1}, {'id': 2}
+        for user in (active_user, inactive_user):
+            for milestone in milestones:
+                api.add_user_milestone(user, milestone)
+        data.deactivate_namespace_milestones('retired.milestones')
+        self.assertEqual(archive.archive_user_milestones([inactive_user['id']]), 4)
+        self.assertFalse(UserMilestone.objects.exists())
+
+        # Reactivating brings back the awards archived for the retired milestones alone,
+        # skipping those collected again in the meantime
+        api.add_user_milestone(active_user, milestones[0])
+        self.assertEqual(data.reactivate_namespace_milestones('retired.milestones', batch_size=1), 2)
+        self.assertEqual(
+            sorted(UserMilestone.objects.values_list('user_id', 'milestone')),
+            [(active_user['id'], milestones[0]['id']), (active_user['id'], milestones[1]['id'])]
+        )
+        self.assertEqual(
+            sorted(ArchivedUserMilestone.objects.values_list('user_id', flat=True)),
+            [inactive_user['id'], inactive_user['id']]
+        )
+        self.assertEqual(projections.reconcile_holder_counts(), (2, 0))
+
+        # As does reactivating a milestone through update_milestone
+        api.remove_user_milestone(active_user, milestones[1])
+        data.update_milestone({'id': milestones[1]['id'], 'active': False})
+        archive.archive_user_milestones()
+        self.assertEqual(ArchivedUserMilestone.objects.filter(user_id=active_user['id']).count(), 0)
+        data.update_milestone({'id': milestones[0]['id'], 'active': False})
+        self.assertEqual(archive.archive_user_milestones(), 1)
+        data.update_milestone({'id': milestones[0]['id'], 'active': True})
+        self.assertTrue(api.user_has_milestone(active_user, milestones[0]))
+
+    @override_settings(MILESTONES_PREREQUISITE_INDEX=True, MILESTONES_HOLDER_COUNTS=True)
+    def test_namespace_operations_run_in_batches(self):
+        """ Unit Test: test_namespace_operations_run_in_batches"""
+        milestones = [
+            api.add_milestone({
+                'name': 'Namespaced Milestone {}'.format(index),
+                'namespace': 'namespaced.milestones',
+                'description': 'Namespaced Milestone {} Description'.format(index),
+            })
+            for index in range(3)
+        ]
+        kept = api.add_milestone({
+            'name': 'Kept Milestone',
+            'namespace': 'kept.milestones',
+            'description': 'Kept Milestone Description',
+        })
+        for milestone in milestones + [kept]:
+            api.add_course_milestone(self.test_course_key, 'requires', milestone)
+            api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', milestone)
+            api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', milestone)
+            api.add_user_milestone(self.serialized_test_user, milestone)
+        archive.archive_user_milestones([self.serialized_test_user['id']])
+        archive.restore_user_milestones(self.serialized_test_user)
+        ArchivedUserMilestone.objects.create(user_id=2, milestone_id=milestones[0]['id'])
+        prerequisites = [{'course_id': unicode(self.test_prerequisite_course_key), 'depth': 1}]
+
+        # Each batch drops the snapshot (the test case manages the transaction, so the relay moves the marker)
+        with mock.patch('milestones.snapshot.discard') as discard:
+            self.assertEqual(data.deactivate_namespace_milestones('namespaced.milestones', batch_size=2), 3)
+        self.assertEqual(discard.call_count, 2)
+        self.assertEqual(
+            [milestone['id'] for milestone in api.get_course_milestones(self.test_course_key)],
+            [kept['id']]
+        )
+        self.assertEqual(projections.fetch_course_prerequisites(self.test_course_key), prerequisites)
+        self.assertEqual(data.reactivate_namespace_milestones('namespaced.milestones', batch_size=2), 3)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 4)
+
+        tombstones = MilestoneTombstone.objects.count()
+        self.assertEqual(data.delete_namespace_milestones('namespaced.milestones', batch_size=4), 3)
+        self.assertEqual(Milestone.objects.get().id, kept['id'])
+        self.assertEqual(CourseMilestone.objects.count(), 2)
+        self.assertEqual(CourseContentMilestone.objects.count(), 1)
+        self.assertEqual(UserMilestone.objects.count(), 1)
+        self.assertFalse(ArchivedUserMilestone.objects.exists())
+        self.assertEqual(
+            set(MilestoneHolderCount.objects.values_list('milestone_id', flat=True)),
+            set([kept['id']])
+        )
+        self.assertEqual(projections.fetch_course_prerequisites(self.test_course_key), prerequisites)
+        self.assertEqual(MilestoneTombstone.objects.count() - tombstones, 12)
+
+    @override_settings(MILESTONES_DENORMALIZED_LINKS=True)
+    def test_denormalized_link_fields_are_maintained(self):
+        """ Unit Test: test_denormalized_link_fields_are_maintained"""
+        milestone = api.add_milestone({
+            'name': 'Denormalized Milestone',
+            'namespace': 'denormalized.milestones',
+            'description': 'Denormalized Milestone Description',
+        })
+        rerun_course_key = CourseKey.from_string('the/rerun/key')
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'fulfills', milestone)
+        graph.clone_course_milestones(self.test_course_key, rerun_course_key)
+        graph.sync_course_milestones(
+            self.test_prerequisite_course_key,
+            [(self.test_prerequisite_course_key.make_usage_key('problem', 'exam'), 'requires', milestone)],
+        )
+        for model in (CourseMilestone, CourseContentMilestone):
+            self.assertEqual(
+                set(model.objects.values_list('milestone_name', 'milestone_namespace', 'milestone_active')),
+                set([('Denormalized Milestone', 'denormalized.milestones', True)])
+            )
+
+        # Reads are served from the copies held by the links (and the relationship type names)
+        milestone['name'] = 'Renamed Milestone'
+        api.edit_milestone(milestone)
+        Milestone.objects.filter(id=milestone['id']).update(name='Not Read Milestone')
+        with self.assertNumQueries(2):
+            self.assertEqual(api.get_course_milestones(rerun_course_key)[0]['name'], 'Renamed Milestone')
+        self.assertEqual(
+            api.get_course_content_milestones(self.test_course_key, self.test_content_key)[0]['description'],
+            'Denormalized Milestone Description'
+        )
+        fulfillers = api.get_milestones_fulfillers([milestone])[milestone['id']]
+        self.assertEqual(fulfillers['courses'][0]['name'], 'Renamed Milestone')
+        self.assertEqual(fulfillers['content'][0]['content_id'], unicode(self.test_content_key))
+
+        self.assertEqual(data.deactivate_namespace_milestones('denormalized.milestones'), 1)
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        self.assertEqual(api.get_milestones_fulfillers([milestone])[milestone['id']]['courses'], [])
+        self.assertEqual(data.reactivate_namespace_milestones('denormalized.milestones'), 1)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+
+    def test_user_links_are_deleted_in_batches(self):
+        """ Unit Test: test_user_links_are_deleted_in_batches"""
+        milestone = api.add_milestone({
+            'name': 'Deleted Milestone',
+            'namespace': 'deleted.milestones',
+            'description': 'Deleted Milestone Description',
+        })
+        kept = api.add_milestone({
+            'name': 'Kept Milestone',
+            'namespace': 'deleted.milestones',
+            'description': 'Kept Milestone Description',
+        })
+        for user_id in range(1, 6):
+            api.add_user_milestone({'id': user_id}, milestone)
+            api.add_user_milestone({'id': user_id}, kept)
+        api.remove_user_milestone({'id': 1}, milestone)
+        self.assertEqual(
+            sorted(UserMilestone.objects.filter(milestone=milestone['id']).values_list('user_id', flat=True)),
+            [2, 3, 4, 5]
+        )
+        # The rows are also loaded and tombstoned a batch at a time
+        delete_loaded_links = storage.delete_loaded_links
+        with mock.patch('milestones.storage.USER_LINK_DELETE_BATCH_SIZE', 3), \
+                mock.patch('milestones.storage.LINK_DELETE_BATCH_SIZE', 3), \
+                mock.patch('milestones.storage.delete_loaded_links', wraps=delete_loaded_links) as delete:
+            api.remove_milestone(milestone['id'])
+        self.assertEqual([len(call[0][1]) for call in delete.call_args_list], [3, 1])
+        self.assertEqual(UserMilestone.objects.count(), 5)
+        self.assertEqual(MilestoneTombstone.objects.filter(entity='user_milestone').count(), 5)
+
+    @override_settings(MILESTONES_COURSE_ACCESS_PROJECTION=True)
+    def test_update_milestone_active_drops_course_access(self):
+        """ Unit Test: test_update_milestone_active_drops_course_access"""
+        milestone = api.add_milestone({
+            'name': 'Updated Milestone',
+            'namespace': 'updated.milestones',
+            'description': 'Updated Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        user = self.serialized_test_user
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, user), 1)
+        data.update_milestone({'id': milestone['id'], 'active': False})
+        self.assertEqual(api.get_course_required_milestones(self.test_course_key, user), [])
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, user), 0)
+        data.update_milestone({'id': milestone['id'], 'active': True})
+        self.assertEqual(len(api.get_course_required_milestones(self.test_course_key, user)), 1)
+        self.assertEqual(api.get_course_required_milestones_count(self.test_course_key, user), 1)
+
+    @override_settings(MILESTONES_PREREQUISITE_INDEX=True)
+    def test_update_milestone_active_reindexes_prerequisites(self):
+        """ Unit Test: test_update_milestone_active_reindexes_prerequisites"""
+        milestone = api.add_milestone({
+            'name': 'Updated Milestone',
+            'namespace': 'updated.milestones',
+            'description': 'Updated Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', milestone)
+        prerequisites = [{'course_id': unicode(self.test_prerequisite_course_key), 'depth': 1}]
+        self.assertEqual(projections.fetch_course_prerequisites(self.test_course_key), prerequisites)
+        data.update_milestone({'id': milestone['id'], 'active': False})
+        self.assertEqual(projections.fetch_course_prerequisites(self.test_course_key), [])
+        data.update_milestone({'id': milestone['id'], 'active': True})
+        self.assertEqual(projections.fetch_course_prerequisites(self.test_course_key), prerequisites)
+
+    def test_link_copies_maintained_while_switched_off(self):
+        """ Unit Test: test_link_copies_maintained_while_switched_off"""
+        milestone = api.add_milestone({
+            'name': 'Copied Milestone',
+            'namespace': 'copied.milestones',
+            'description': 'Copied Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', milestone)
+        data.update_milestone({'id': milestone['id'], 'name': 'Renamed Milestone'})
+        with override_settings(MILESTONES_DENORMALIZED_LINKS=True):
+            self.assertEqual(api.get_course_milestones(self.test_course_key)[0]['name'], 'Renamed Milestone')
+            self.assertEqual(
+                api.get_course_content_milestones(self.test_course_key, self.test_content_key)[0]['name'],
+                'Renamed Milestone'
+            )
+        data.deactivate_namespace_milestones('copied.milestones')
+        with override_settings(MILESTONES_DENORMALIZED_LINKS=True):
+            self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+
+    @override_settings(MILESTONES_DENORMALIZED_LINKS=True)
+    def test_update_milestone_only_changes_supplied_fields(self):
+        """ Unit Test: test_update_milestone_only_changes_supplied_fields"""
+        milestone = api.add_milestone({
+            'name': 'Updated Milestone',
+            'namespace': 'updated.milestones',
+            'description': 'Updated Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', milestone)
+        data.deactivate_namespace_milestones('updated.milestones')
+        self.assertEqual(
+            data.update_milestone({'id': milestone['id'], 'name': 'Renamed Milestone'}),
+            dict(milestone, name='Renamed Milestone')
+        )
+        updated = Milestone.objects.get(id=milestone['id'])
+        self.assertEqual(updated.description, 'Updated Milestone Description')
+        self.assertFalse(updated.active)
+        self.assertEqual(
+            list(CourseMilestone.objects.values_list('milestone_name', 'milestone_description', 'milestone_active')),
+            [('Renamed Milestone', 'Updated Milestone Description', False)]
+        )
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        data.update_milestone({'id': milestone['id'], 'active': True})
+        self.assertEqual(api.get_course_milestones(self.test_course_key)[0]['name'], 'Renamed Milestone')
+        with self.assertRaises(exceptions.InvalidMilestoneException):
+            data.update_milestone({'id': milestone['id'] + 100, 'name': 'Missing Milestone'})
+
+
+class MilestonesDataTransactionTestCase(TransactionTestCase):
+    """
+    Test suite for the atomicity of the bulk data operations
+    """
+
+    def test_clone_course_milestones_rolls_back(self):
+        """ Unit Test: test_clone_course_milestones_rolls_back """
+        milestone = api.add_milestone({
+            'name': 'Rerun Milestone',
+            'namespace': 'rerun.milestones',
+            'description': 'Rerun Milestone Description',
+        })
+        source_key = CourseKey.from_string('the/course/key')
+        api.add_course_milestone(source_key, 'requires', milestone)
+        api.add_course_content_milestone(source_key, UsageKey.from_string('i4x://the/course/problem/exam'),
+                                         'fulfills', milestone)
+        with mock.patch('milestones.projections.after_bulk_link_changes', side_effect=IOError):
+            with self.assertRaises(IOError):
+                api.clone_course_milestones(source_key, CourseKey.from_string('the/course/rerun'))
+        self.assertEqual(CourseMilestone.objects.count(), 1)
+        self.assertEqual(CourseContentMilestone.objects.count(), 1)
+
+    def test_graph_import_chunk_rolls_back(self):
+        """ Unit Test: test_graph_import_chunk_rolls_back """
+        with self.assertRaises(exceptions.InvalidMilestoneException):
+            graph.import_graph_records([
+                {'type': 'milestone', 'namespace': 'graph.milestones', 'name': 'Graph Milestone'},
+                {'type': 'user_milestone', 'user_id': 1, 'namespace': 'missing.milestones', 'name': 'Missing'},
+            ])
+        self.assertEqual(Milestone.objects.count(), 0)
@@ -0,0 +1,112 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+Milestones Request-Scoped Memoization Test Cases
+"""
+import milestones.api as api
+import milestones.memo as memo
+from milestones.middleware import RequestMemoizationMiddleware
+import milestones.tests.utils as utils
+
+
+class MilestonesMemoTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the memoization of API reads within a scope
+    """
+    def setUp(self):
+        """
+        Memoization Test Case scaffolding
+        """
+        super(MilestonesMemoTestCase, self).setUp()
+        self.test_milestone = api.add_milestone({
+            'name': 'Memoized Milestone',
+            'namespace': 'memoized.milestones',
+            'description': 'Memoized Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+
+    def tearDown(self):
+        """
+        Don't leak scopes into other test cases
+        """
+        while memo.is_active():
+            memo.end()
+        super(MilestonesMemoTestCase, self).tearDown()
+
+    def test_duplicate_reads_are_collapsed(self):
+        """ Unit Test: test_duplicate_reads_are_collapsed """
+        user = self.serialized_test_user
+        api.get_course_required_milestones(self.test_course_key, user)
+        with utils.CountQueries() as single_round:
+            api.get_course_required_milestones(self.test_course_key, user)
+            api.user_has_milestone(user, self.test_milestone)
+        with memo.scope():
+            with self.assertNumQueries(single_round.count):
+                for __ in range(3):
+                    self.assertEqual(len(api.get_course_required_milestones(self.test_course_key, user)), 1)
+                    self.assertFalse(api.user_has_milestone(user, self.test_milestone))
+        self.assertFalse(memo.is_active())
+        with self.assertNumQueries(1):
+            api.user_has_milestone(user, self.test_milestone)
+
+    def test_writes_invalidate_the_scope(self):
+        """ Unit Test: test_writes_invalidate_the_scope """
+        user = self.serialized_test_user
+        with memo.scope():
+            self.assertEqual(len(api.get_course_required_milestones(self.test_course_key, user)), 1)
+            api.add_user_milestone(user, self.test_milestone)
+            self.assertEqual(api.get_course_required_milestones(self.test_course_key, user), [])
+            self.assertTrue(api.user_has_milestone(user, self.test_milestone))
+
+    def test_memoized_results_are_copies(self):
+        """ Unit Test: test_memoized_results_are_copies """
+        with memo.scope():
+            api.get_course_milestones(self.test_course_key)[0]['name'] = 'Changed'
+            self.assertEqual(api.get_course_milestones(self.test_course_key)[0]['name'], 'Memoized Milestone')
+
+    def test_unhashable_arguments_are_passed_through(self):
+        """ Unit Test: test_unhashable_arguments_are_passed_through """
+        user = dict(self.serialized_test_user, groups=[{'name': 'staff', 'permissions': {'view': [1]}}])
+        user['unhashable'] = bytearray('value')
+        with memo.scope():
+            with self.assertNumQueries(2):
+                api.get_user_milestones(user)
+                api.get_user_milestones(user)
+
+    def test_nested_scopes(self):
+        """ Unit Test: test_nested_scopes """
+        with memo.scope():
+            api.get_milestones('memoized.milestones')
+            with memo.scope():
+                with self.assertNumQueries(0):
+                    api.get_milestones('memoized.milestones')
+            with self.assertNumQueries(0):
+                api.get_milestones('memoized.milestones')
+        memo.invalidate()
+        self.assertFalse(memo.is_active())
+
+    def test_middleware_opens_and_closes_scope(self):
+        """ Unit Test: test_middleware_opens_and_closes_scope """
+        middleware = RequestMemoizationMiddleware()
+        middleware.process_request(None)
+        self.assertTrue(memo.is_active())
+        api.get_milestone(self.test_milestone['id'])
+        with self.assertNumQueries(0):
+            api.get_milestone(self.test_milestone['id'])
+        response = object()
+        self.assertIs(middleware.process_response(None, response), response)
+        self.assertFalse(memo.is_active())
+        with self.assertNumQueries(1):
+            api.get_milestone(self.test_milestone['id'])
+
+    def test_middleware_resets_scope_left_open(self):
+        """ Unit Test: test_middleware_resets_scope_left_open """
+        middleware = RequestMemoizationMiddleware()
+        middleware.process_request(None)
+        api.get_milestone(self.test_milestone['id'])
+        # An earlier response middleware raised, so process_response was skipped
+        middleware.process_request(None)
+        with self.assertNumQueries(1):
+            api.get_milestone(self.test_milestone['id'])
+        middleware.process_response(None, object())
+        self.assertFalse(memo.is_active())
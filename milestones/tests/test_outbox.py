@@ -0,0 +1,146 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+Milestones Invalidation Outbox Test Cases
+"""
+import json
+
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+import mock
+from opaque_keys.edx.keys import CourseKey
+
+import milestones.api as api
+import milestones.caching as caching
+from milestones.models import CourseMilestone, InvalidationRecord
+import milestones.outbox as outbox
+import milestones.tests.utils as utils
+
+
+@override_settings(MILESTONES_INVALIDATION_OUTBOX=True, MILESTONES_CACHE_TIMEOUT=60)
+class MilestonesOutboxTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the cache invalidation outbox and its relay
+    """
+    def setUp(self):
+        """
+        Outbox Test Case scaffolding
+        """
+        super(MilestonesOutboxTestCase, self).setUp()
+        self.test_milestone = api.add_milestone({
+            'name': 'Outbox Milestone',
+            'namespace': 'outbox.milestones',
+            'description': 'Outbox Milestone Description',
+        })
+        self.published = []
+        outbox.subscribe(self.published.append)
+
+    def tearDown(self):
+        """
+        Don't leak subscribers into other test cases
+        """
+        outbox.unsubscribe(self.published.append)
+        super(MilestonesOutboxTestCase, self).tearDown()
+
+    @staticmethod
+    def _payloads():
+        """
+        Pending record payloads, oldest first
+        """
+        return [json.loads(record.payload) for record in InvalidationRecord.objects.order_by('id')]
+
+    def test_gating_writes_append_records(self):
+        """ Unit Test: test_gating_writes_append_records """
+        course_id = unicode(self.test_course_key)
+        content_pair = [course_id, unicode(self.test_content_key)]
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', self.test_milestone)
+        api.edit_milestone(self.test_milestone)
+        api.remove_course_references(self.test_course_key)
+        api.add_user_milestone(self.serialized_test_user, self.test_milestone)
+        self.assertEqual(self._payloads(), [
+            {'course_ids': [course_id], 'content_pairs': []},
+            {'course_ids': [], 'content_pairs': [content_pair]},
+            {'course_ids': [course_id], 'content_pairs': [content_pair]},
+            {'course_ids': [course_id], 'content_pairs': [content_pair]},
+        ])
+
+    def test_unchanged_links_append_no_records(self):
+        """ Unit Test: test_unchanged_links_append_no_records """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_course_content_milestone(self.test_course_key, self.test_content_key, 'requires', self.test_milestone)
+        InvalidationRecord.objects.all().delete()
+        with mock.patch('milestones.caching.delete_many') as delete_many:
+            api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+            api.add_course_content_milestone(
+                self.test_course_key, self.test_content_key, 'requires', self.test_milestone
+            )
+        self.assertFalse(delete_many.called)
+        self.assertFalse(InvalidationRecord.objects.exists())
+
+    @override_settings(MILESTONES_INVALIDATION_OUTBOX=False)
+    def test_outbox_disabled(self):
+        """ Unit Test: test_outbox_disabled """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        self.assertFalse(InvalidationRecord.objects.exists())
+
+    def test_relay_publishes_and_removes_records(self):
+        """ Unit Test: test_relay_publishes_and_removes_records """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', self.test_milestone)
+
+        # An entry refilled with pre-commit data by another process is dropped by the relay
+        key = caching.course_milestones_key(unicode(self.test_course_key), 'requires')
+        caching.set_many({key: ['stale']})
+        version = caching.get_gating_version()
+        self.assertEqual(outbox.relay(batch_size=1), 1)
+        self.assertEqual(caching.get_or_build([key], lambda keys: dict((k, 'rebuilt') for k in keys)), {key: 'rebuilt'})
+        self.assertNotEqual(caching.get_gating_version(), version)
+
+        self.assertEqual(outbox.relay(batch_size=10), 1)
+        self.assertEqual(outbox.relay(batch_size=10), 0)
+        self.assertEqual(
+            [payload['course_ids'] for payload in self.published],
+            [[unicode(self.test_course_key)], [unicode(self.test_prerequisite_course_key)]]
+        )
+
+    def test_records_are_kept_when_a_handler_fails(self):
+        """ Unit Test: test_records_are_kept_when_a_handler_fails """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+
+        def failing_handler(payload):
+            """ Simulates an unavailable bus """
+            raise IOError(payload)
+        outbox.subscribe(failing_handler)
+        try:
+            with self.assertRaises(IOError):
+                outbox.relay()
+        finally:
+            outbox.unsubscribe(failing_handler)
+        self.assertEqual(InvalidationRecord.objects.count(), 1)
+
+
+@override_settings(MILESTONES_INVALIDATION_OUTBOX=True)
+class MilestonesOutboxTransactionTestCase(TransactionTestCase):
+    """
+    Test suite for the atomicity of gating writes and their outbox records
+    """
+
+    def test_write_and_record_commit_together(self):
+        """ Unit Test: test_write_and_record_commit_together """
+        milestone = api.add_milestone({
+            'name': 'Outbox Milestone',
+            'namespace': 'outbox.milestones',
+            'description': 'Outbox Milestone Description',
+        })
+        course_key = CourseKey.from_string('the/course/key')
+        with mock.patch('milestones.projections.reindex_prerequisites_for_link', side_effect=IOError):
+            with self.assertRaises(IOError):
+                api.add_course_milestone(course_key, 'requires', milestone)
+        self.assertFalse(CourseMilestone.objects.exists())
+        self.assertFalse(InvalidationRecord.objects.exists())
+
+        api.add_course_milestone(course_key, 'requires', milestone)
+        self.assertTrue(CourseMilestone.objects.exists())
+        self.assertEqual(InvalidationRecord.objects.count(), 1)
@@ -0,0 +1,266 @@
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+Milestones API Query Budget Test Cases
+
+Each public API function declares the maximum number of database queries it
+may issue in QUERY_BUDGETS.  The budgets are enforced at several data scales,
+so a change which makes the query count grow with the size of the result set
+(N+1 lookups, per-row follow-up queries, etc.) fails the suite.
+"""
+import inspect
+
+from django.test.utils import override_settings
+from opaque_keys.edx.keys import CourseKey, UsageKey
+
+import milestones.api as api
+import milestones.archive as archive
+import milestones.snapshot as snapshot
+import milestones.tests.utils as utils
+
+
+# Maximum number of queries each API function may issue, regardless of data size
+# (covering the extra work done by writes when the optional caches and projections are enabled)
+QUERY_BUDGETS = {
+    'add_milestone': 2,
+    'edit_milestone': 6,
+    'get_milestone': 1,
+    'get_milestones': 1,
+    'remove_milestone': 16,
+    'deactivate_namespace_milestones': 17,
+    'reactivate_namespace_milestones': 17,
+    'remove_namespace_milestones': 37,
+    'add_course_milestone': 12,
+    'get_course_milestones': 2,
+    'get_course_required_milestones': 3,
+    'get_course_required_milestones_count': 7,
+    'get_course_milestones_fulfillment_paths': 6,
+    'get_course_prerequisites': 4,
+    'get_courses_milestones': 3,
+    'get_courses_unmet_milestone_ids': 3,
+    'get_users_required_milestones_counts': 3,
+    'get_course_blocked_users': 3,
+    'get_milestone_changes': 5,
+    'export_milestone_graph': 4,
+    'import_milestone_graph': 10,
+    'remove_course_milestone': 12,
+    'clone_course_milestones': 15,
+    'sync_course_milestones': 8,
+    'add_course_content_milestone': 4,
+    'get_course_content_milestones': 2,
+    'get_course_contents_milestones': 1,
+    'remove_course_content_milestone': 4,
+    'add_user_milestone': 6,
+    'get_user_milestones': 1,
+    'remove_user_milestone': 5,
+    'restore_user_milestones': 8,
+    'user_has_milestone': 1,
+    'get_milestones_holder_counts': 1,
+    'get_milestones_fulfillers': 3,
+    'remove_course_references': 10,
+    'remove_content_references': 3,
+}
+
+# Number of milestones/links seeded for each pass over the budgets
+DATA_SCALES = (1, 5, 25)
+
+
+class MilestonesQueryBudgetTestCase(utils.MilestonesTestCaseBase):
+    """
+    Enforces QUERY_BUDGETS for the Milestones API
+    """
+
+    def _seed(self, scale):
+        """
+        Builds a course which requires 'scale' milestones, each of which is
+        fulfilled by a prerequisite course and a content module.  The test
+        user has collected every other milestone, and an archived user every
+        milestone.  A second namespace holds 'scale' milestones, each with
+        every kind of link, for the namespace operations.
+        """
+        archived_user = {'id': self.serialized_test_user['id'] + 2}
+        course_key = CourseKey.from_string('scale{}/course/key'.format(scale))
+        prerequisite_course_key = CourseKey.from_string('scale{}/prerequisite/key'.format(scale))
+        gated_content_key = UsageKey.from_string('i4x://scale{}/content/gated/key'.format(scale))
+        namespace = 'scale{}.milestones'.format(scale)
+        milestones = []
+        content_keys = []
+        for index in range(scale):
+            milestone = api.add_milestone({
+                'name': 'Scale Milestone {}'.format(index),
+                'namespace': namespace,
+                'description': 'Scale Milestone {} Description'.format(index),
+            })
+            api.add_course_milestone(course_key, 'requires', milestone)
+            api.add_course_milestone(prerequisite_course_key, 'fulfills', milestone)
+            api.add_course_content_milestone(course_key, gated_content_key, 'requires', milestone)
+            content_keys.append(UsageKey.from_string('i4x://scale{}/content/key/{}'.format(scale, index)))
+            api.add_course_content_milestone(course_key, content_keys[-1], 'fulfills', milestone)
+            if index % 2:
+                api.add_user_milestone(self.serialized_test_user, milestone)
+            api.add_user_milestone(archived_user, milestone)
+            milestones.append(milestone)
+        archive.archive_user_milestones([archived_user['id']])
+        retired_namespace = 'scale{}.retired.milestones'.format(scale)
+        for index in range(scale):
+            milestone = api.add_milestone({
+                'name': 'Retired Milestone {}'.format(index),
+                'namespace': retired_namespace,
+                'description': 'Retired Milestone {} Description'.format(index),
+            })
+            api.add_course_milestone(course_key, 'requires', milestone)
+            api.add_course_milestone(prerequisite_course_key, 'fulfills', milestone)
+            api.add_course_content_milestone(course_key, gated_content_key, 'requires', milestone)
+            api.add_user_milestone(self.serialized_test_user, milestone)
+        return {
+            'course_key': course_key,
+            'prerequisite_course_key': prerequisite_course_key,
+            'rerun_course_key': CourseKey.from_string('scale{}/course/rerun'.format(scale)),
+            'synced_content_key': UsageKey.from_string('i4x://scale{}/content/synced/key'.format(scale)),
+            'content_key': gated_content_key,
+            'content_keys': content_keys,
+            'namespace': namespace,
+            'retired_namespace': retired_namespace,
+            'milestones': milestones,
+            'archived_user': archived_user,
+        }
+
+    def _budgeted_calls(self, seed):
+        """
+        Returns (function name, callable) pairs exercising every budgeted API
+        function against the seeded data, in a safe execution order
+        """
+        user = self.serialized_test_user
+        course_key = seed['course_key']
+        content_key = seed['content_key']
+        milestone = seed['milestones'][0]
+        scratch = {
+            'name': 'Scratch Milestone',
+            'namespace': seed['namespace'],
+            'description': 'Scratch Milestone Description',
+        }
+
+        def add_milestone():
+            """ Creates the scratch milestone used by the write calls """
+            scratch.update(api.add_milestone(scratch))
+
+        return [
+            ('get_milestone', lambda: api.get_milestone(milestone['id'])),
+            ('get_milestones', lambda: api.get_milestones(seed['namespace'])),
+            ('get_course_milestones', lambda: api.get_course_milestones(course_key, 'requires')),
+            ('get_course_required_milestones', lambda: api.get_course_required_milestones(course_key, user)),
+            ('get_course_required_milestones_count',
+             lambda: api.get_course_required_milestones_count(course_key, user)),
+            ('get_course_milestones_fulfillment_paths',
+             lambda: api.get_course_milestones_fulfillment_paths(course_key, user)),
+            ('get_course_prerequisites', lambda: api.get_course_prerequisites(course_key)),
+            ('get_courses_milestones',
+             lambda: api.get_courses_milestones([course_key, seed['prerequisite_course_key']], 'requires', user)),
+            ('get_courses_unmet_milestone_ids',
+             lambda: api.get_courses_unmet_milestone_ids([course_key, seed['prerequisite_course_key']], user)),
+            ('get_users_required_milestones_counts',
+             lambda: api.get_users_required_milestones_counts(course_key, [user])),
+            ('get_course_blocked_users',
+             lambda: list(api.get_course_blocked_users(course_key, [user['id'], user['id'] + 1]))),
+            ('get_course_content_milestones',
+             lambda: api.get_course_content_milestones(course_key, content_key, 'requires')),
+            ('get_course_contents_milestones', lambda: api.get_course_contents_milestones(
+                [(course_key, content_key)] + [(course_key, seed_key) for seed_key in seed['content_keys']]
+            )),
+            ('get_user_milestones', lambda: api.get_user_milestones(user)),
+            ('get_milestone_changes', lambda: api.get_milestone_changes(limit=10)),
+            ('export_milestone_graph', lambda: scratch.update(graph=list(api.export_milestone_graph(True)))),
+            ('import_milestone_graph', lambda: api.import_milestone_graph(scratch['graph'] + [{
+                'type': 'user_milestone',
+                'user_id': user['id'] + 1,
+                'namespace': milestone['namespace'],
+                'name': milestone['name'],
+            }])),
+            ('user_has_milestone', lambda: api.user_has_milestone(user, milestone)),
+            ('get_milestones_holder_counts', lambda: api.get_milestones_holder_counts(seed['milestones'])),
+            ('get_milestones_fulfillers', lambda: api.get_milestones_fulfillers(seed['milestones'])),
+            ('add_milestone', add_milestone),
+            ('edit_milestone', lambda: api.edit_milestone(scratch)),
+            ('add_course_milestone', lambda: api.add_course_milestone(course_key, 'requires', scratch)),
+            ('remove_course_milestone', lambda: api.remove_course_milestone(course_key, scratch)),
+            ('add_course_content_milestone',
+             lambda: api.add_course_content_milestone(course_key, content_key, 'requires', scratch)),
+            ('remove_course_content_milestone',
+             lambda: api.remove_course_content_milestone(course_key, content_key, scratch)),
+            ('add_user_milestone', lambda: api.add_user_milestone(user, scratch)),
+            ('remove_user_milestone', lambda: api.remove_user_milestone(user, scratch)),
+            ('restore_user_milestones', lambda: api.restore_user_milestones(seed['archived_user'])),
+            ('remove_milestone', lambda: api.remove_milestone(scratch['id'])),
+            ('deactivate_namespace_milestones',
+             lambda: api.deactivate_namespace_milestones(seed['retired_namespace'])),
+            ('reactivate_namespace_milestones',
+             lambda: api.reactivate_namespace_milestones(seed['retired_namespace'])),
+            ('remove_namespace_milestones', lambda: api.remove_namespace_milestones(seed['retired_namespace'])),
+            ('clone_course_milestones', lambda: api.clone_course_milestones(course_key, seed['rerun_course_key'])),
+            ('sync_course_milestones', lambda: api.sync_course_milestones(
+                course_key,
+                [(content_key, 'requires', seed_milestone) for seed_milestone in seed['milestones']] +
+                [(seed['synced_content_key'], 'fulfills', milestone)],
+                [('requires', seed_milestone) for seed_milestone in seed['milestones']],
+            )),
+            ('remove_content_references', lambda: api.remove_content_references(content_key)),
+            ('remove_course_references', lambda: api.remove_course_references(course_key)),
+        ]
+
+    def test_every_api_function_has_a_budget(self):
+        """ Unit Test: test_every_api_function_has_a_budget """
+        public_functions = set(
+            name for name, member in inspect.getmembers(api, inspect.isfunction)
+            if not name.startswith('_') and member.__module__ == api.__name__
+        )
+        self.assertEqual(public_functions - set(QUERY_BUDGETS), set())
+
+    def test_every_budget_is_exercised(self):
+        """ Unit Test: test_every_budget_is_exercised """
+        exercised = set(name for name, __ in self._budgeted_calls(self._seed(1)))
+        self.assertEqual(set(QUERY_BUDGETS) - exercised, set())
+
+    def test_query_budgets_hold_at_every_scale(self):
+        """ Unit Test: test_query_budgets_hold_at_every_scale """
+        self._assert_query_budgets()
+
+    @override_settings(
+        MILESTONES_CACHE_TIMEOUT=60,
+        MILESTONES_COURSE_ACCESS_PROJECTION=True,
+        MILESTONES_PREREQUISITE_INDEX=True,
+        MILESTONES_GATING_SNAPSHOT=True,
+        MILESTONES_GATING_SNAPSHOT_CHECK_INTERVAL=0,
+        MILESTONES_INVALIDATION_OUTBOX=True,
+        MILESTONES_HOLDER_COUNTS=True,
+        MILESTONES_DENORMALIZED_LINKS=True,
+    )
+    def test_query_budgets_hold_with_optional_features_enabled(self):
+        """ Unit Test: test_query_budgets_hold_with_optional_features_enabled """
+        # The gating snapshot is compiled at worker startup, outside of any request
+        self._assert_query_budgets(warm_up=snapshot.load)
+
+    def _assert_query_budgets(self, warm_up=None):
+        """
+        Runs every budgeted call at each data scale, checking the budget and
+        that the query count does not vary with the size of the data set
+        """
+        counts = {}
+        for scale in DATA_SCALES:
+            seed = self._seed(scale)
+            if warm_up is not None:
+                warm_up()
+            for name, call in self._budgeted_calls(seed):
+                with utils.CountQueries() as queries:
+                    call()
+                self.assertLessEqual(
+                    queries.count,
+                    QUERY_BUDGETS[name],
+                    '{} issued {} queries at scale {} (budget: {})'.format(
+                        name, queries.count, scale, QUERY_BUDGETS[name]
+                    )
+                )
+                counts.setdefault(name, set()).add(queries.count)
+
+        # Query counts must not depend upon the size of the data set
+        growing = dict((name, sorted(seen)) for name, seen in counts.items() if len(seen) > 1)
+        self.assertEqual(growing, {})
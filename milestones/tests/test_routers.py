@@ -0,0 +1,118 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+Milestones Database Routing Test Cases
+"""
+from django.contrib.auth.models import User
+from django.db.utils import ConnectionDoesNotExist
+from django.test.utils import override_settings
+
+import milestones.api as api
+import milestones.data as data
+from milestones.middleware import ReadReplicaPinningMiddleware
+from milestones.models import Milestone
+import milestones.routers as routers
+import milestones.tests.utils as utils
+
+
+@override_settings(MILESTONES_READ_DATABASE='replica')
+class MilestonesRoutersTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for read replica routing and read-your-writes pinning
+    The 'replica' alias is deliberately left unconfigured, so any query routed
+    to it fails with ConnectionDoesNotExist.
+    """
+    def setUp(self):
+        """
+        Routing Test Case scaffolding
+        """
+        super(MilestonesRoutersTestCase, self).setUp()
+        self.test_milestone = api.add_milestone({
+            'name': 'Routed Milestone',
+            'namespace': 'routed.milestones',
+            'description': 'Routed Milestone Description',
+        })
+        routers.reset_pins()
+
+    def tearDown(self):
+        """
+        Don't leak pins into other test cases
+        """
+        routers.reset_pins()
+        super(MilestonesRoutersTestCase, self).tearDown()
+
+    def test_read_database(self):
+        """ Unit Test: test_read_database """
+        self.assertEqual(routers.read_database(), 'replica')
+        routers.pin_user(1)
+        self.assertEqual(routers.read_database(1), 'default')
+        self.assertEqual(routers.read_database(2), 'replica')
+        self.assertEqual(routers.read_database(), 'replica')
+        routers.pin_everything()
+        self.assertEqual(routers.read_database(2), 'default')
+        routers.reset_pins()
+        self.assertEqual(routers.read_database(1), 'replica')
+
+    @override_settings(MILESTONES_READ_DATABASE=None)
+    def test_read_database_not_configured(self):
+        """ Unit Test: test_read_database_not_configured """
+        self.assertEqual(routers.read_database(), 'default')
+
+    def test_reads_use_read_database(self):
+        """ Unit Test: test_reads_use_read_database """
+        with self.assertRaises(ConnectionDoesNotExist):
+            data.fetch_user_milestones(self.serialized_test_user)
+        with self.assertRaises(ConnectionDoesNotExist):
+            data.fetch_courses_milestones([self.test_course_key])
+        with self.assertRaises(ConnectionDoesNotExist):
+            data.fetch_milestones(self.test_milestone)
+
+    def test_user_reads_stick_to_primary_after_user_write(self):
+        """ Unit Test: test_user_reads_stick_to_primary_after_user_write """
+        api.add_user_milestone(self.serialized_test_user, self.test_milestone)
+        self.assertEqual(len(data.fetch_user_milestones(self.serialized_test_user)), 1)
+        with self.assertRaises(ConnectionDoesNotExist):
+            data.fetch_user_milestones({'id': self.serialized_test_user['id'] + 1})
+        with self.assertRaises(ConnectionDoesNotExist):
+            data.fetch_courses_milestones([self.test_course_key])
+
+    def test_reads_stick_to_primary_after_gating_write(self):
+        """ Unit Test: test_reads_stick_to_primary_after_gating_write """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        self.assertEqual(len(data.fetch_courses_milestones([self.test_course_key])), 1)
+
+    def test_writes_use_primary(self):
+        """ Unit Test: test_writes_use_primary """
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_user_milestone(self.serialized_test_user, self.test_milestone)
+        routers.reset_pins()
+        api.remove_user_milestone(self.serialized_test_user, self.test_milestone)
+        routers.reset_pins()
+        api.remove_milestone(self.test_milestone['id'])
+        self.assertFalse(Milestone.objects.filter(id=self.test_milestone['id']).exists())
+
+    def test_router(self):
+        """ Unit Test: test_router """
+        router = routers.MilestonesRouter()
+        self.assertEqual(router.db_for_read(Milestone), 'default')
+        self.assertEqual(router.db_for_write(Milestone), 'default')
+        self.assertIsNone(router.db_for_read(User))
+        self.assertIsNone(router.db_for_write(User))
+        milestone = Milestone.objects.get(id=self.test_milestone['id'])
+        self.assertTrue(router.allow_relation(milestone, milestone))
+        self.assertIsNone(router.allow_relation(milestone, self.test_user))
+        self.assertTrue(router.allow_syncdb('default', Milestone))
+        self.assertFalse(router.allow_syncdb('replica', Milestone))
+        self.assertIsNone(router.allow_syncdb('replica', User))
+
+    def test_middleware_resets_pins(self):
+        """ Unit Test: test_middleware_resets_pins """
+        middleware = ReadReplicaPinningMiddleware()
+        routers.pin_everything()
+        middleware.process_request(None)
+        self.assertEqual(routers.read_database(), 'replica')
+        routers.pin_everything()
+        response = object()
+        self.assertIs(middleware.process_response(None, response), response)
+        self.assertEqual(routers.read_database(), 'replica')
@@ -0,0 +1,155 @@
+# pylint: disable=no-member
+# pylint: disable=invalid-name
+# pylint: disable=too-many-public-methods
+"""
+Milestones Gating Snapshot Test Cases
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.test.utils import override_settings
+import mock
+
+import milestones.api as api
+import milestones.caching as caching
+import milestones.data as data
+from milestones.models import CourseMilestone
+import milestones.outbox as outbox
+import milestones.snapshot as snapshot
+import milestones.tests.utils as utils
+
+
+@override_settings(
+    MILESTONES_GATING_SNAPSHOT=True,
+    MILESTONES_GATING_SNAPSHOT_CHECK_INTERVAL=0,
+    MILESTONES_INVALIDATION_OUTBOX=True,
+)
+class MilestonesSnapshotTestCase(utils.MilestonesTestCaseBase):
+    """
+    Test suite for the in-process gating snapshot
+    """
+    def setUp(self):
+        """
+        Snapshot Test Case scaffolding
+        """
+        super(MilestonesSnapshotTestCase, self).setUp()
+        self.test_milestone = api.add_milestone({
+            'name': 'Snapshot Milestone',
+            'namespace': 'snapshot.milestones',
+            'description': 'Snapshot Milestone Description',
+        })
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.add_course_content_milestone(
+            self.test_course_key, self.test_content_key, 'fulfills', self.test_milestone
+        )
+
+    @override_settings(MILESTONES_CACHE_TIMEOUT=60)
+    def test_lookups_are_served_in_memory(self):
+        """ Unit Test: test_lookups_are_served_in_memory """
+        data.warm_relationship_types()
+        snapshot.load()
+        with utils.CountQueries() as queries:
+            course_milestones = api.get_course_milestones(self.test_course_key)
+            required = api.get_course_milestones(self.test_course_key, 'requires')
+            fulfilled = api.get_course_milestones(self.test_course_key, 'fulfills')
+            content_milestones = api.get_course_content_milestones(
+                self.test_course_key, self.test_content_key, 'fulfills'
+            )
+            ungated = api.get_course_content_milestones(self.test_prerequisite_course_key, self.test_content_key)
+            fulfillers = api.get_milestones_fulfillers([self.test_milestone])
+        self.assertEqual(queries.count, 0)
+        self.assertEqual(course_milestones, required)
+        self.assertEqual(course_milestones[0]['course_id'], unicode(self.test_course_key))
+        self.assertEqual(course_milestones[0]['id'], self.test_milestone['id'])
+        self.assertEqual(fulfilled, [])
+        self.assertEqual(content_milestones, [self.test_milestone])
+        self.assertEqual(ungated, [])
+        self.assertEqual(fulfillers[self.test_milestone['id']]['courses'], [])
+        self.assertEqual(
+            fulfillers[self.test_milestone['id']]['content'],
+            [dict(
+                self.test_milestone,
+                course_id=unicode(self.test_course_key),
+                content_id=unicode(self.test_content_key)
+            )]
+        )
+
+    def test_snapshot_is_not_mutated_by_callers(self):
+        """ Unit Test: test_snapshot_is_not_mutated_by_callers """
+        api.get_course_milestones(self.test_course_key)[0]['name'] = 'Changed'
+        self.assertEqual(api.get_course_milestones(self.test_course_key)[0]['name'], 'Snapshot Milestone')
+
+    def test_writes_are_visible_to_the_writer(self):
+        """ Unit Test: test_writes_are_visible_to_the_writer """
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+        api.remove_course_milestone(self.test_course_key, self.test_milestone)
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+        self.test_milestone['name'] = 'Renamed Milestone'
+        api.edit_milestone(self.test_milestone)
+        self.assertEqual(
+            api.get_course_content_milestones(self.test_course_key, self.test_content_key)[0]['name'],
+            'Renamed Milestone'
+        )
+
+    def test_other_workers_changes_are_picked_up(self):
+        """ Unit Test: test_other_workers_changes_are_picked_up """
+        loaded = snapshot.load()
+        CourseMilestone.objects.all().delete()
+        self.assertIs(snapshot.current(), loaded)
+        self.assertEqual(len(api.get_course_milestones(self.test_course_key)), 1)
+        caching.bump_gating_version()
+        self.assertIsNot(snapshot.current(), loaded)
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+
+    def test_only_committed_changes_move_the_version_marker(self):
+        """ Unit Test: test_only_committed_changes_move_the_version_marker """
+        version = caching.get_gating_version()
+        api.remove_course_milestone(self.test_prerequisite_course_key, self.test_milestone)
+        api.add_course_milestone(self.test_course_key, 'requires', self.test_milestone)
+        api.remove_course_references(self.test_prerequisite_course_key)
+        self.assertEqual(caching.get_gating_version(), version)
+
+        with mock.patch('milestones.projections.reindex_prerequisites_for_link', side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                api.add_course_milestone(self.test_prerequisite_course_key, 'fulfills', self.test_milestone)
+        self.assertEqual(caching.get_gating_version(), version)
+
+        # The test case manages the transaction, so the marker waits for the relay
+        api.remove_course_milestone(self.test_course_key, self.test_milestone)
+        self.assertEqual(caching.get_gating_version(), version)
+        outbox.relay()
+        self.assertNotEqual(caching.get_gating_version(), version)
+
+    @override_settings(MILESTONES_GATING_SNAPSHOT_CHECK_INTERVAL=60, MILESTONES_GATING_SNAPSHOT_MAX_AGE=60)
+    def test_expired_snapshots_are_recompiled(self):
+        """ Unit Test: test_expired_snapshots_are_recompiled """
+        loaded = snapshot.load()
+        CourseMilestone.objects.all().delete()
+        self.assertIs(snapshot.current(), loaded)
+        with mock.patch('time.time', return_value=snapshot.time.time() + 61):
+            self.assertIsNot(snapshot.current(), loaded)
+        self.assertEqual(api.get_course_milestones(self.test_course_key), [])
+
+    def test_snapshot_is_compiled_from_the_primary(self):
+        """ Unit Test: test_snapshot_is_compiled_from_the_primary """
+        with mock.patch('milestones.routers.read_database', return_value='lagging_replica'):
+            self.assertEqual(len(snapshot.load().course_milestones(unicode(self.test_course_key))), 1)
+
+    @override_settings(MILESTONES_INVALIDATION_OUTBOX=False)
+    def test_snapshot_requires_the_outbox(self):
+        """ Unit Test: test_snapshot_requires_the_outbox """
+        with self.assertRaises(ImproperlyConfigured):
+            api.get_course_milestones(self.test_course_key)
+
+    @override_settings(MILESTONES_GATING_SNAPSHOT_CHECK_INTERVAL=60)
+    def test_version_marker_checks_are_spaced_out(self):
+        """ Unit Test: test_version_marker_checks_are_spaced_out """
+        loaded = snapshot.load()
+        caching.bump_gating_version()
+        self.assertIs(snapshot.current(), loaded)
+
+    @override_settings(MILESTONES_GATING_SNAPSHOT=False)
+    def test_snapshot_disabled(self):
+        """ Unit Test: test_snapshot_disabled """
+        self.assertIsNone(snapshot.current())
+        with utils.CountQueries() as queries:
+            api.get_course_milestones(self.test_course_key)
+        self.assertEqual(queries.count, 1)
@@ -3,10 +3,14 @@
 Utility module for Milestones test cases
 """
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.test import TestCase
 
 from opaque_keys.edx.keys import CourseKey, UsageKey
 
+import milestones.caching as caching
+
 
 class MilestonesTestCaseBase(TestCase):
     """
@@ -17,6 +21,8 @@ class MilestonesTestCaseBase(TestCase):
         """
         Helper method for test case scaffolding
         """
+        cache.clear()
+        caching.clear_local()
         self.test_course_key = CourseKey.from_string('the/course/key')
         self.test_prerequisite_course_key = CourseKey.from_string('the/prerequisite/key')
         self.test_content_key = UsageKey.from_string('i4x://the/content/key/12345678')
@@ -28,3 +34,26 @@ class MilestonesTestCaseBase(TestCase):
             password='ABcd12!@'
         )
         self.serialized_test_user = self.test_user.__dict__
+
+
+class CountQueries(object):  # pylint: disable=too-few-public-methods
+    """
+    Context manager which records the number of database queries issued
+    within its block (see MilestonesQueryBudgetTestCase)
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.count = 0
+        self.starting_count = 0
+        self.old_debug_cursor = None
+
+    def __enter__(self):
+        self.old_debug_cursor = self.connection.use_debug_cursor
+        self.connection.use_debug_cursor = True
+        self.starting_count = len(self.connection.queries)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.count = len(self.connection.queries) - self.starting_count
+        self.connection.use_debug_cursor = self.old_debug_cursor
@@ -66,3 +66,28 @@ def user_is_valid(user):
     if not user.get('id', 0):
         return False
     return True
+
+
+# Fields which must be present in each type of milestone graph record
+GRAPH_RECORD_REQUIRED_FIELDS = {
+    'milestone': ('namespace', 'name'),
+    'course_milestone': ('course_id', 'namespace', 'name', 'relationship'),
+    'course_content_milestone': ('course_id', 'content_id', 'namespace', 'name', 'relationship'),
+    'user_milestone': ('user_id', 'namespace', 'name'),
+}
+
+
+def graph_record_is_valid(record):
+    """
+    Milestone graph import record validation
+    """
+    if not isinstance(record, dict):
+        return False
+    required_fields = GRAPH_RECORD_REQUIRED_FIELDS.get(record.get('type'))
+    if required_fields is None:
+        return False
+    if not all(record.get(field) for field in required_fields):
+        return False
+    if 'relationship' in required_fields and not milestone_relationship_type_is_valid(record['relationship']):
+        return False
+    return True